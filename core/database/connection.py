@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+# 每个线程当前活动的跨仓储事务，按数据库路径区分
+_local = threading.local()
+
+# 等待数据库锁的最长时间（毫秒），连接池等待空闲连接也使用同一上限
+BUSY_TIMEOUT_MS = 5000
+
+
+class TransactionConnection:
+    """
+    事务期间交给各仓储使用的连接代理。
+
+    仓储内部的 `with conn:` 块会被映射为一个 SAVEPOINT：块内出错只回滚该块并继续抛出异常，
+    块正常结束则释放保存点。仓储自身的 commit() / rollback() 被忽略，
+    由最外层的 transaction() 统一提交或回滚。
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self._depth = 0
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self) -> "TransactionConnection":
+        self._depth += 1
+        self._conn.execute(f"SAVEPOINT repo_sp_{self._depth}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        name = f"repo_sp_{self._depth}"
+        self._depth -= 1
+        if exc_type is not None:
+            self._conn.execute(f"ROLLBACK TO {name}")
+        self._conn.execute(f"RELEASE {name}")
+        return False
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+
+def apply_pragmas(conn: sqlite3.Connection) -> None:
+    """为新建连接设置统一的性能相关PRAGMA（journal_mode 会持久化到数据库文件，其余仅对当前连接生效）。"""
+    # WAL 模式下提交无需每次 fsync，读操作也不会被写操作阻塞
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    conn.execute("PRAGMA cache_size = -20000;")  # 约 20 MB 页缓存
+    conn.execute("PRAGMA mmap_size = 268435456;")  # 256 MB 内存映射
+
+
+def get_transaction_connection(db_path: str) -> Optional[TransactionConnection]:
+    """返回当前线程在该数据库上的活动事务连接，没有活动事务时返回 None。"""
+    active: Optional[Dict[str, TransactionConnection]] = getattr(_local, "active", None)
+    if not active:
+        return None
+    return active.get(db_path)
+
+
+def _get_thread_connection(db_path: str) -> sqlite3.Connection:
+    """获取当前线程专用于跨仓储事务的连接，首次使用时创建。"""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                               cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON;")
+        apply_pragmas(conn)
+        connections[db_path] = conn
+    return conn
+
+
+@contextmanager
+def transaction(db_path: str) -> Iterator[TransactionConnection]:
+    """
+    开启一个跨仓储的数据库事务。
+
+    在 with 块内，所有基于同一 db_path 的仓储都会复用同一个连接，
+    块正常结束时一次性提交，抛出异常时整体回滚。嵌套调用会复用外层事务。
+    """
+    existing = get_transaction_connection(db_path)
+    if existing is not None:
+        yield existing
+        return
+
+    conn = _get_thread_connection(db_path)
+    proxy = TransactionConnection(conn)
+    active = getattr(_local, "active", None)
+    if active is None:
+        active = _local.active = {}
+
+    # 立即获取写锁，避免事务中途升级时遇到 SQLITE_BUSY
+    conn.execute("BEGIN IMMEDIATE")
+    active[db_path] = proxy
+    try:
+        yield proxy
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        active.pop(db_path, None)
@@ -2,6 +2,7 @@ import sqlite3
 import os
 import re
 import importlib
+from contextlib import closing
 
 from astrbot.api import logger
 
@@ -25,8 +26,25 @@ def run_migrations(db_path: str, migrations_dir: str):
     运行所有待处理的数据库迁移脚本。
     """
 
+    try:
+        migration_files = sorted(
+            [f for f in os.listdir(migrations_dir) if f.endswith(".py") and re.match(r"^\d{3}_", f)],
+            key=lambda f: int(f.split("_")[0])
+        )
+    except FileNotFoundError:
+        print(f"迁移目录 '{migrations_dir}' 不存在，跳过迁移。")
+        return
+
+    # 快速路径：只读地查询一次版本号，已是最新版本时直接返回，不开启任何写事务
+    head_version = int(migration_files[-1].split("_")[0]) if migration_files else 0
+    with closing(sqlite3.connect(db_path)) as conn:
+        current_version = get_current_version(conn.cursor())
+    if migration_files and current_version >= head_version:
+        logger.info(f"当前数据库版本: {current_version}，已是最新，无需迁移。")
+        return
+
     # 确保版本表存在
-    with sqlite3.connect(db_path) as conn:
+    with closing(sqlite3.connect(db_path)) as conn:
         cursor = conn.cursor()
         cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL PRIMARY KEY)")
         cursor.execute("SELECT COUNT(*) FROM schema_version")
@@ -34,21 +52,9 @@ def run_migrations(db_path: str, migrations_dir: str):
             cursor.execute("INSERT INTO schema_version (version) VALUES (0)")
             logger.info("schema_version 表已初始化。")
         conn.commit()
-
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
         current_version = get_current_version(cursor)
         logger.info(f"当前数据库版本: {current_version}")
 
-    try:
-        migration_files = sorted(
-            [f for f in os.listdir(migrations_dir) if f.endswith(".py") and re.match(r"^\d{3}_", f)],
-            key=lambda f: int(f.split("_")[0])
-        )
-    except FileNotFoundError:
-        print(f"迁移目录 '{migrations_dir}' 不存在，跳过迁移。")
-        return
-
     for filename in migration_files:
         version = int(filename.split("_")[0])
         if version > current_version:
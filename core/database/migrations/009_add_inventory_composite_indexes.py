@@ -0,0 +1,13 @@
+import sqlite3
+
+def up(cursor: sqlite3.Cursor):
+    """为库存查询的热点过滤条件添加复合索引"""
+    # 装备查询：WHERE user_id = ? AND is_equipped = 1
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_rods_user_equipped ON user_rods(user_id, is_equipped)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_accessories_user_equipped ON user_accessories(user_id, is_equipped)")
+    # 同类实例查询：WHERE user_id = ? AND rod_id / accessory_id = ?
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_rods_user_rod ON user_rods(user_id, rod_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_accessories_user_accessory ON user_accessories(user_id, accessory_id)")
+    # 可用库存查询：WHERE user_id = ? AND quantity > 0
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_bait_inventory_user_quantity ON user_bait_inventory(user_id, quantity)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_fish_inventory_user_quantity ON user_fish_inventory(user_id, quantity)")
@@ -0,0 +1,21 @@
+import sqlite3
+
+# 由 get_now() 写入的用户时间字段，统一带上 UTC+8 时区偏移
+_USER_TIME_COLUMNS = (
+    "bait_start_time",
+    "last_fishing_time",
+    "last_wipe_bomb_time",
+    "last_steal_time",
+    "last_login_time",
+)
+
+def up(cursor: sqlite3.Cursor):
+    """为历史遗留的无时区用户时间补上 +08:00 偏移，读取后即为带时区的时间"""
+    for column in _USER_TIME_COLUMNS:
+        cursor.execute(f"""
+            UPDATE users SET {column} = {column} || '+08:00'
+            WHERE {column} IS NOT NULL
+              AND typeof({column}) = 'text'
+              AND {column} NOT LIKE '%+__:__'
+              AND {column} NOT LIKE '%Z'
+        """)
@@ -0,0 +1,11 @@
+import sqlite3
+
+def up(cursor: sqlite3.Cursor):
+    """为“我的上架”查询添加覆盖索引：WHERE user_id = ? ORDER BY listed_at DESC"""
+    # SQLite 不支持 INCLUDE，把查询用到的 market 列全部放进索引即可只扫描索引、无需回表和额外排序
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_market_user_listed
+        ON market(user_id, listed_at, item_type, item_id, quantity, price, refine_level)
+    """)
+    # 新索引以 user_id 开头，原有的单列索引已是其前缀，不再需要
+    cursor.execute("DROP INDEX IF EXISTS idx_market_user")
@@ -1,7 +1,10 @@
 from dataclasses import dataclass, field
-from typing import Optional, List
+from itertools import accumulate
+from typing import Optional, List, Tuple, Dict, Any
 from datetime import datetime
 
+from ..sampling import AliasTable
+
 # ---------------------------------
 # 游戏配置实体 (Configuration Entities)
 # ---------------------------------
@@ -112,16 +115,51 @@ class GachaPool:
     cost_premium_currency: int = 0
     # 这个字段让模型更丰富，可以在服务层组装，存放该池的所有奖品
     items: List[GachaPoolItem] = field(default_factory=list)
+    # 由 items 的权重派生的抽奖数据缓存，以权重序列为键，items 被替换、增删或奖品权重被原地修改时都会失效
+    _derived: Optional[Tuple[Tuple[int, ...], Dict[str, Any]]] = field(default=None, init=False, repr=False, compare=False)
 
     def __getitem__(self, item):
         """允许通过属性名访问字段"""
         return getattr(self, item)
 
+    def _derived_data(self) -> Dict[str, Any]:
+        key = tuple(item.weight for item in self.items)
+        if self._derived is None or self._derived[0] != key:
+            self._derived = (key, {})
+        return self._derived[1]
+
+    @property
+    def total_weight(self) -> int:
+        """所有奖品的权重之和"""
+        data = self._derived_data()
+        if "total_weight" not in data:
+            data["total_weight"] = sum(item.weight for item in self.items)
+        return data["total_weight"]
+
+    @property
+    def cum_weights(self) -> List[int]:
+        """累积权重，供 random.choices 二分查找"""
+        data = self._derived_data()
+        if "cum_weights" not in data:
+            data["cum_weights"] = list(accumulate(item.weight for item in self.items))
+        return data["cum_weights"]
+
+    @property
+    def alias_table(self) -> AliasTable:
+        """Vose 别名表，O(1) 加权抽样"""
+        data = self._derived_data()
+        if "alias_table" not in data:
+            data["alias_table"] = AliasTable([item.weight for item in self.items])
+        return data["alias_table"]
+
+    def is_alias_table_built(self) -> bool:
+        return "alias_table" in self._derived_data()
+
 # ---------------------------------
 # 用户数据实体 (User Data Entities)
 # ---------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class UserRodInstance:
     """代表用户拥有的一个具体的鱼竿实例"""
     rod_instance_id: int
@@ -132,7 +170,7 @@ class UserRodInstance:
     refine_level: int = 1  # 精炼等级，默认为1
     current_durability: Optional[int] = None
 
-@dataclass
+@dataclass(slots=True)
 class UserAccessoryInstance:
     """代表用户拥有的一个具体的饰品实例"""
     accessory_instance_id: int
@@ -183,7 +221,7 @@ class User:
 # 关联与日志实体 (Association & Log Entities)
 # ---------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class UserFishInventoryItem:
     """用户鱼塘中的一项"""
     user_id: str
@@ -264,7 +302,7 @@ class TaxRecord:
     timestamp: datetime
     tax_type: str = "daily"
 
-@dataclass
+@dataclass(slots=True)
 class FishingZone:
     id: int
     name: str
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any,Tuple
+from typing import List, Optional, Dict, Any,Tuple, ContextManager, Set
 from datetime import date, datetime
 
 # 从领域模型导入所有需要的实体
@@ -15,6 +15,9 @@ UserAchievementProgress = Dict[int, Dict[str, Any]] # {achievement_id: {progress
 
 class AbstractUserRepository(ABC):
     """用户数据仓储接口"""
+    # 开启跨仓储事务，块内所有仓储写操作一次性提交，出错整体回滚
+    @abstractmethod
+    def transaction(self) -> ContextManager[Any]: pass
     # 根据ID获取用户
     @abstractmethod
     def get_by_id(self, user_id: str) -> Optional[User]: pass
@@ -27,6 +30,9 @@ class AbstractUserRepository(ABC):
     # 更新用户信息
     @abstractmethod
     def update(self, user: User) -> None: pass
+    # 原子地增减用户金币，返回调整后的金币数，用户不存在或金币不足时返回None
+    @abstractmethod
+    def adjust_coins(self, user_id: str, delta: int) -> Optional[int]: pass
     # 获取所有用户ID
     @abstractmethod
     def get_all_user_ids(self, auto_fishing_only: bool = False) -> List[str]: pass
@@ -39,6 +45,9 @@ class AbstractUserRepository(ABC):
 
 class AbstractItemTemplateRepository(ABC):
     """物品模板数据仓储接口"""
+    # 获取模板版本号（鱼竿/鱼饵/饰品/称号模板变化后递增）
+    @abstractmethod
+    def get_version(self) -> int: pass
     # 获取鱼类模板
     @abstractmethod
     def get_fish_by_id(self, fish_id: int) -> Optional[Fish]: pass
@@ -72,12 +81,33 @@ class AbstractItemTemplateRepository(ABC):
     # 获取所有称号模板
     @abstractmethod
     def get_all_titles(self) -> List[Title]: pass
+    # 批量获取鱼竿模板，返回 {rod_id: Rod}
+    @abstractmethod
+    def get_rods_by_ids(self, rod_ids: List[int]) -> Dict[int, Rod]: pass
+    # 批量获取饰品模板，返回 {accessory_id: Accessory}
+    @abstractmethod
+    def get_accessories_by_ids(self, accessory_ids: List[int]) -> Dict[int, Accessory]: pass
+    # 批量获取鱼饵模板，返回 {bait_id: Bait}
+    @abstractmethod
+    def get_baits_by_ids(self, bait_ids: List[int]) -> Dict[int, Bait]: pass
+    # 批量获取称号模板，返回 {title_id: Title}
+    @abstractmethod
+    def get_titles_by_ids(self, title_ids: List[int]) -> Dict[int, Title]: pass
+    # 使模板缓存失效（item_type: rod/accessory/bait/title，item_id 为空时清空该类型）
+    @abstractmethod
+    def invalidate(self, item_type: str, item_id: Optional[int] = None) -> None: pass
+    # 返回 names 中已存在的模板名称（item_type: fish/rod/bait/accessory）
+    @abstractmethod
+    def get_existing_template_names(self, item_type: str, names: List[str]) -> Set[str]: pass
     # 随机获取一条鱼的模板
     @abstractmethod
     def get_random_fish(self, rarity: Optional[int] = None) -> Optional[Fish]: pass
     # 添加鱼类模板
     @abstractmethod
     def add_fish_template(self, fish_data: Dict[str, Any]) -> Fish: pass
+    # 在同一个事务中批量添加鱼类模板
+    @abstractmethod
+    def add_fish_templates(self, fish_data_list: List[Dict[str, Any]]) -> None: pass
     # 更新鱼类模板
     @abstractmethod
     def update_fish_template(self, fish_id: int, fish_data: Dict[str, Any]) -> None: pass
@@ -87,6 +117,9 @@ class AbstractItemTemplateRepository(ABC):
     # 添加鱼饵模板
     @abstractmethod
     def add_bait_template(self, bait_data: Dict[str, Any]) -> Bait: pass
+    # 在同一个事务中批量添加鱼饵模板
+    @abstractmethod
+    def add_bait_templates(self, bait_data_list: List[Dict[str, Any]]) -> None: pass
     # 更新鱼饵模板
     @abstractmethod
     def update_bait_template(self, bait_id: int, bait_data: Dict[str, Any]) -> None: pass
@@ -96,6 +129,9 @@ class AbstractItemTemplateRepository(ABC):
     # 添加鱼竿模板
     @abstractmethod
     def add_rod_template(self, rod_data: Dict[str, Any]) -> Rod: pass
+    # 在同一个事务中批量添加鱼竿模板
+    @abstractmethod
+    def add_rod_templates(self, rod_data_list: List[Dict[str, Any]]) -> None: pass
     # 更新鱼竿模板
     @abstractmethod
     def update_rod_template(self, rod_id: int, rod_data: Dict[str, Any]) -> None: pass
@@ -105,6 +141,9 @@ class AbstractItemTemplateRepository(ABC):
     # 添加饰品模板
     @abstractmethod
     def add_accessory_template(self, accessory_data: Dict[str, Any]) -> Accessory: pass
+    # 在同一个事务中批量添加饰品模板
+    @abstractmethod
+    def add_accessory_templates(self, accessory_data_list: List[Dict[str, Any]]) -> None: pass
     # 更新饰品模板
     @abstractmethod
     def update_accessory_template(self, accessory_id: int, accessory_data: Dict[str, Any]) -> None: pass
@@ -120,6 +159,12 @@ class AbstractInventoryRepository(ABC):
     # 获取用户的鱼类库存
     @abstractmethod
     def get_fish_inventory(self, user_id: str) -> List[UserFishInventoryItem]: pass
+    # 获取用户鱼塘的展示信息（名称、稀有度、价值、数量），按稀有度降序排列
+    @abstractmethod
+    def get_fish_pond_details(self, user_id: str) -> List[Dict[str, Any]]: pass
+    # 获取用户鱼类库存的总数量与总价值
+    @abstractmethod
+    def get_fish_inventory_stats(self, user_id: str) -> Tuple[int, int]: pass
     # 获取用户鱼类库存的总价值
     @abstractmethod
     def get_fish_inventory_value(self, user_id: str, rarity: Optional[int] = None) -> int: pass
@@ -168,6 +213,9 @@ class AbstractInventoryRepository(ABC):
     # 获取用户当前装备的饰品
     @abstractmethod
     def get_user_equipped_accessory(self, user_id: str) -> Optional[UserAccessoryInstance]: pass
+    # 一次性获取用户当前装备的鱼竿和饰品
+    @abstractmethod
+    def get_equipment(self, user_id: str) -> Tuple[Optional[UserRodInstance], Optional[UserAccessoryInstance]]: pass
     # 统一设置用户的装备状态
     @abstractmethod
     def set_equipment_status(self, user_id: str, rod_instance_id: Optional[int] = None, accessory_instance_id: Optional[int] = None) -> None: pass
@@ -238,6 +286,48 @@ class AbstractInventoryRepository(ABC):
         """
         pass
 
+    @abstractmethod
+    def batch_update_bait_quantities(self, user_id: str, bait_updates: List[Tuple[int, int]]) -> None:
+        """
+        批量更新鱼饵数量。
+
+        Args:
+            user_id: 用户ID
+            bait_updates: 更新列表，每个元素为 (bait_id, delta_quantity)
+        """
+        pass
+
+    @abstractmethod
+    def batch_add_fish(self, user_id: str, fish_items: List[Tuple[int, int]]) -> None:
+        """
+        批量向用户鱼类库存添加鱼。
+
+        Args:
+            user_id: 用户ID
+            fish_items: 鱼类数据列表，每个元素为 (fish_id, quantity)
+        """
+        pass
+
+    @abstractmethod
+    def batch_delete_rod_instances(self, rod_instance_ids: List[int]) -> None:
+        """
+        批量删除鱼竿实例。
+
+        Args:
+            rod_instance_ids: 鱼竿实例ID列表
+        """
+        pass
+
+    @abstractmethod
+    def batch_delete_accessory_instances(self, accessory_instance_ids: List[int]) -> None:
+        """
+        批量删除饰品实例。
+
+        Args:
+            accessory_instance_ids: 饰品实例ID列表
+        """
+        pass
+
 
 class AbstractGachaRepository(ABC):
     """抽卡仓储接口"""
@@ -277,6 +367,12 @@ class AbstractMarketRepository(ABC):
     # 获取所有市场商品
     @abstractmethod
     def get_all_listings(self) -> List[MarketListing]: pass
+    # 获取某个用户上架的所有商品
+    @abstractmethod
+    def get_listings_by_seller(self, user_id: str) -> List[MarketListing]: pass
+    # 获取当前有商品在售的所有用户ID
+    @abstractmethod
+    def get_seller_ids(self) -> List[str]: pass
     # 添加一个市场商品
     @abstractmethod
     def add_listing(self, listing: MarketListing) -> None: pass
@@ -298,6 +394,9 @@ class AbstractLogRepository(ABC):
     # 记录一条抽卡日志
     @abstractmethod
     def add_gacha_record(self, record: GachaRecord) -> None: pass
+    # 批量添加抽卡记录
+    @abstractmethod
+    def add_gacha_records(self, records: List[GachaRecord]) -> None: pass
     # 获取用户抽卡日志
     @abstractmethod
     def get_gacha_records(self, user_id: str, limit: int) -> List[GachaRecord]: pass
@@ -340,6 +439,9 @@ class AbstractAchievementRepository(ABC):
     # 授予用户一个称号
     @abstractmethod
     def grant_title_to_user(self, user_id: str, title_id: int) -> None: pass
+    # 批量授予用户称号，已拥有的称号会被忽略
+    @abstractmethod
+    def grant_titles_to_user(self, user_id: str, title_ids: List[int]) -> None: pass
     # 获取用户钓到的不同鱼种数量
     @abstractmethod
     def get_user_unique_fish_count(self, user_id: str) -> int: pass
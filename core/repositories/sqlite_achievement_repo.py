@@ -4,6 +4,7 @@ from typing import Optional, List
 from datetime import datetime
 
 # 导入抽象基类和领域模型
+from ..database.connection import apply_pragmas, get_transaction_connection
 from .abstract_repository import AbstractAchievementRepository, UserAchievementProgress
 from ..domain.models import Achievement
 
@@ -15,11 +16,16 @@ class SqliteAchievementRepository(AbstractAchievementRepository):
         self._local = threading.local()
 
     def _get_connection(self) -> sqlite3.Connection:
+        # 处于跨仓储事务中时复用事务连接
+        tx_conn = get_transaction_connection(self.db_path)
+        if tx_conn is not None:
+            return tx_conn
         conn = getattr(self._local, "connection", None)
         if conn is None:
-            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES, cached_statements=256)
             conn.row_factory = sqlite3.Row
             conn.execute("PRAGMA foreign_keys = ON;")
+            apply_pragmas(conn)
             self._local.connection = conn
         return conn
 
@@ -92,6 +98,18 @@ class SqliteAchievementRepository(AbstractAchievementRepository):
             cursor.execute("INSERT OR IGNORE INTO user_titles (user_id, title_id, unlocked_at) VALUES (?, ?, ?)", (user_id, title_id, datetime.now()))
             conn.commit()
 
+    def grant_titles_to_user(self, user_id: str, title_ids: List[int]) -> None:
+        if not title_ids:
+            return
+        now = datetime.now()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT OR IGNORE INTO user_titles (user_id, title_id, unlocked_at) VALUES (?, ?, ?)",
+                [(user_id, title_id, now) for title_id in title_ids]
+            )
+            conn.commit()
+
     # --- 新增的成就检查方法实现 ---
 
     def get_user_unique_fish_count(self, user_id: str) -> int:
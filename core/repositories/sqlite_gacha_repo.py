@@ -3,6 +3,7 @@ import threading
 from typing import Optional, List, Dict, Any
 
 # 导入抽象基类和领域模型
+from ..database.connection import apply_pragmas, get_transaction_connection
 from .abstract_repository import AbstractGachaRepository
 from ..domain.models import GachaPool, GachaPoolItem
 
@@ -12,15 +13,31 @@ class SqliteGachaRepository(AbstractGachaRepository):
     def __init__(self, db_path: str):
         self.db_path = db_path
         self._local = threading.local()
+        # 奖池缓存：奖池只在后台编辑时变化，缓存的奖池对象同时保留其别名表等派生数据，
+        # 避免每次抽奖都重新查询奖池并重建别名表。任一写操作都会清空缓存
+        self._pool_cache: Dict[int, GachaPool] = {}
+        self._pool_cache_lock = threading.Lock()
+        self._pool_cache_generation = 0  # 每次清空时递增，丢弃清空前读取到的旧奖池
+
+    def invalidate_pool_cache(self) -> None:
+        """清空奖池缓存"""
+        with self._pool_cache_lock:
+            self._pool_cache.clear()
+            self._pool_cache_generation += 1
 
     def _get_connection(self) -> sqlite3.Connection:
         """获取一个线程安全的数据库连接。"""
+        # 处于跨仓储事务中时复用事务连接
+        tx_conn = get_transaction_connection(self.db_path)
+        if tx_conn is not None:
+            return tx_conn
         conn = getattr(self._local, "connection", None)
         if conn is None:
-            conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(self.db_path, cached_statements=256)
             conn.row_factory = sqlite3.Row
             # 开启外键约束，确保奖池删除时，其下的物品也被删除
             conn.execute("PRAGMA foreign_keys = ON;")
+            apply_pragmas(conn)
             self._local.connection = conn
         return conn
 
@@ -37,6 +54,18 @@ class SqliteGachaRepository(AbstractGachaRepository):
 
     # --- Gacha Read Methods ---
     def get_pool_by_id(self, pool_id: int) -> Optional[GachaPool]:
+        cached = self._pool_cache.get(pool_id)
+        if cached is not None:
+            return cached
+        generation = self._pool_cache_generation
+        pool = self._load_pool(pool_id)
+        if pool is not None:
+            with self._pool_cache_lock:
+                if generation == self._pool_cache_generation:
+                    self._pool_cache[pool_id] = pool
+        return pool
+
+    def _load_pool(self, pool_id: int) -> Optional[GachaPool]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM gacha_pools WHERE gacha_pool_id = ?", (pool_id,))
@@ -115,6 +144,7 @@ class SqliteGachaRepository(AbstractGachaRepository):
                 "cost_premium_currency": data.get("cost_premium_currency", 0)
             })
             conn.commit()
+        self.invalidate_pool_cache()
 
     def update_pool_template(self, pool_id: int, data: Dict[str, Any]) -> None:
         """后台更新一个抽卡池的信息"""
@@ -136,6 +166,7 @@ class SqliteGachaRepository(AbstractGachaRepository):
                 "cost_premium_currency": data.get("cost_premium_currency", 0)
             })
             conn.commit()
+        self.invalidate_pool_cache()
 
     def delete_pool_template(self, pool_id: int) -> None:
         """后台删除一个抽卡池（其下的物品也会被级联删除）"""
@@ -143,6 +174,7 @@ class SqliteGachaRepository(AbstractGachaRepository):
             cursor = conn.cursor()
             cursor.execute("DELETE FROM gacha_pools WHERE gacha_pool_id = ?", (pool_id,))
             conn.commit()
+        self.invalidate_pool_cache()
 
     # Pool Item CRUD
     def add_item_to_pool(self, pool_id: int, data: Dict[str, Any]) -> None:
@@ -165,6 +197,7 @@ class SqliteGachaRepository(AbstractGachaRepository):
                 data.get("weight", 10)
             ))
             conn.commit()
+        self.invalidate_pool_cache()
 
     def update_pool_item(self, item_pool_id: int, data: Dict[str, Any]) -> None:
         """后台更新一个抽卡池物品的信息"""
@@ -187,6 +220,7 @@ class SqliteGachaRepository(AbstractGachaRepository):
                 item_pool_id
             ))
             conn.commit()
+        self.invalidate_pool_cache()
 
     def delete_pool_item(self, item_pool_id: int) -> None:
         """后台删除一个抽卡池物品"""
@@ -194,3 +228,4 @@ class SqliteGachaRepository(AbstractGachaRepository):
             cursor = conn.cursor()
             cursor.execute("DELETE FROM gacha_pool_items WHERE gacha_pool_item_id = ?", (item_pool_id,))
             conn.commit()
+        self.invalidate_pool_cache()
@@ -1,94 +1,328 @@
+import queue
+import random
 import sqlite3
 import threading
-from typing import List, Dict, Any, Optional, Tuple
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, Iterator, ContextManager, Final
 from datetime import datetime
 from astrbot.api import logger
 
 # 导入抽象基类和领域模型
+from ..database.connection import BUSY_TIMEOUT_MS, apply_pragmas, get_transaction_connection
 from .abstract_repository import AbstractInventoryRepository
 from ..domain.models import UserFishInventoryItem, UserRodInstance, UserAccessoryInstance, FishingZone
 
 
+# RETURNING 子句需要 SQLite 3.35.0 及以上版本
+_SUPPORTS_RETURNING: Final[bool] = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# --- SQL 语句常量 ---
+# 每次执行传入同一个字符串对象，配合连接上的语句缓存避免重复解析
+# 列顺序与领域模型的字段顺序保持一致，以便按位置直接构造对象
+_ROD_INSTANCE_COLUMNS: Final[str] = "rod_instance_id, user_id, rod_id, is_equipped, obtained_at, refine_level, current_durability"
+_ACCESSORY_INSTANCE_COLUMNS: Final[str] = "accessory_instance_id, user_id, accessory_id, is_equipped, obtained_at, refine_level"
+_FISHING_ZONE_COLUMNS: Final[str] = "id, name, description, daily_rare_fish_quota, rare_fish_caught_today"
+
+_SQL_GET_FISH_INVENTORY: Final[str] = "SELECT user_id, fish_id, quantity FROM user_fish_inventory WHERE user_id = ? AND quantity > 0"
+# 鱼塘展示：直接关联鱼类模板，并按稀有度降序返回，调用方无需再逐条查模板或排序
+_SQL_GET_FISH_POND_DETAILS: Final[str] = """
+    SELECT f.name, f.rarity, f.base_value, ufi.quantity
+    FROM user_fish_inventory ufi
+    JOIN fish f ON f.fish_id = ufi.fish_id
+    WHERE ufi.user_id = ? AND ufi.quantity > 0
+    ORDER BY f.rarity DESC, ufi.fish_id
+"""
+# 鱼塘统计：总数量与总价值在一次扫描中聚合完成
+_SQL_GET_FISH_INVENTORY_STATS: Final[str] = """
+    SELECT COALESCE(SUM(ufi.quantity), 0), COALESCE(SUM(ufi.quantity * f.base_value), 0)
+    FROM user_fish_inventory ufi
+    JOIN fish f ON f.fish_id = ufi.fish_id
+    WHERE ufi.user_id = ?
+"""
+# 稀有度为 NULL 时不过滤；否则先按稀有度圈定 fish_id，再在 SQL 内完成求和
+_SQL_GET_FISH_INVENTORY_VALUE: Final[str] = """
+    SELECT COALESCE(SUM(ufi.quantity * (SELECT base_value FROM fish WHERE fish_id = ufi.fish_id)), 0)
+    FROM user_fish_inventory ufi
+    WHERE ufi.user_id = ?
+      AND (? IS NULL OR ufi.fish_id IN (SELECT fish_id FROM fish WHERE rarity = ?))
+"""
+_SQL_UPSERT_FISH: Final[str] = """
+    INSERT INTO user_fish_inventory (user_id, fish_id, quantity)
+    VALUES (?, ?, ?)
+    ON CONFLICT(user_id, fish_id) DO UPDATE SET quantity = quantity + excluded.quantity
+"""
+_SQL_CLEAR_FISH_INVENTORY: Final[str] = "DELETE FROM user_fish_inventory WHERE user_id = ?"
+_SQL_CLEAR_FISH_INVENTORY_BY_RARITY: Final[str] = """
+    DELETE FROM user_fish_inventory
+    WHERE user_id = ? AND fish_id IN (
+        SELECT fish_id FROM fish WHERE rarity = ?
+    )
+"""
+_SQL_GET_KEEP_ONE_SOLD_VALUE: Final[str] = """
+    SELECT COALESCE(SUM((ufi.quantity - 1) * f.base_value), 0)
+    FROM user_fish_inventory ufi
+    JOIN fish f ON ufi.fish_id = f.fish_id
+    WHERE ufi.user_id = ? AND ufi.quantity > 1
+"""
+_SQL_KEEP_ONE_FISH: Final[str] = """
+    UPDATE user_fish_inventory
+    SET quantity = 1
+    WHERE user_id = ? AND quantity > 1
+"""
+_SQL_GET_EQUIPPED_ROD: Final[str] = f"""
+    SELECT {_ROD_INSTANCE_COLUMNS} FROM user_rods
+    WHERE user_id = ? AND is_equipped = 1
+"""
+_SQL_GET_ROD_INSTANCE_BY_ID: Final[str] = f"""
+    SELECT {_ROD_INSTANCE_COLUMNS} FROM user_rods
+    WHERE user_id = ? AND rod_instance_id = ?
+"""
+_SQL_CLEAR_ROD_INSTANCES: Final[str] = """
+    DELETE FROM user_rods
+    WHERE user_id = ? AND is_equipped = 0 AND NOT EXISTS (
+        SELECT 1 FROM rods r WHERE r.rod_id = user_rods.rod_id AND r.rarity >= 5
+    )
+"""
+_SQL_CLEAR_ACCESSORY_INSTANCES: Final[str] = """
+    DELETE FROM user_accessories
+    WHERE user_id = ? AND is_equipped = 0 AND NOT EXISTS (
+        SELECT 1 FROM accessories a WHERE a.accessory_id = user_accessories.accessory_id AND a.rarity >= 5
+    )
+"""
+_SQL_GET_ACCESSORY_INSTANCE_BY_ID: Final[str] = f"""
+    SELECT {_ACCESSORY_INSTANCE_COLUMNS} FROM user_accessories
+    WHERE user_id = ? AND accessory_instance_id = ?
+"""
+_SQL_GET_EQUIPPED_ACCESSORY: Final[str] = f"""
+    SELECT {_ACCESSORY_INSTANCE_COLUMNS} FROM user_accessories
+    WHERE user_id = ? AND is_equipped = 1
+"""
+# 未指定装备时传入 -1，CASE 退化为单纯的重置
+_SQL_SET_EQUIPPED_ROD: Final[str] = """
+    UPDATE user_rods SET is_equipped = CASE WHEN rod_instance_id = ? THEN 1 ELSE 0 END
+    WHERE user_id = ?
+"""
+_SQL_SET_EQUIPPED_ACCESSORY: Final[str] = """
+    UPDATE user_accessories SET is_equipped = CASE WHEN accessory_instance_id = ? THEN 1 ELSE 0 END
+    WHERE user_id = ?
+"""
+_SQL_GET_DISPOSABLE_BAITS: Final[str] = """
+    SELECT bait_id FROM user_bait_inventory
+    WHERE user_id = ? AND quantity > 0
+"""
+_SQL_GET_USER_TITLES: Final[str] = """
+    SELECT title_id FROM user_titles
+    WHERE user_id = ?
+"""
+_SQL_COUNT_AVAILABLE_BAITS: Final[str] = "SELECT COUNT(*) FROM user_bait_inventory WHERE user_id = ? AND quantity > 0"
+_SQL_GET_BAIT_AT_OFFSET: Final[str] = """
+    SELECT bait_id FROM user_bait_inventory
+    WHERE user_id = ? AND quantity > 0
+    LIMIT 1 OFFSET ?
+"""
+_SQL_GET_BAIT_INVENTORY: Final[str] = "SELECT bait_id, quantity FROM user_bait_inventory WHERE user_id = ?"
+_SQL_UPDATE_BAIT_QUANTITY: Final[str] = """
+    INSERT INTO user_bait_inventory (user_id, bait_id, quantity)
+    VALUES (?, ?, MAX(0, ?))
+    ON CONFLICT(user_id, bait_id) DO UPDATE SET quantity = MAX(0, quantity + ?)
+"""
+_SQL_UPDATE_BAIT_QUANTITY_RETURNING: Final[str] = _SQL_UPDATE_BAIT_QUANTITY + "RETURNING quantity"
+_SQL_DELETE_EMPTY_BAITS: Final[str] = "DELETE FROM user_bait_inventory WHERE user_id = ? AND quantity <= 0"
+_SQL_DELETE_BAIT: Final[str] = "DELETE FROM user_bait_inventory WHERE user_id = ? AND bait_id = ?"
+_SQL_GET_ROD_INSTANCES: Final[str] = f"SELECT {_ROD_INSTANCE_COLUMNS} FROM user_rods WHERE user_id = ?"
+_SQL_INSERT_ROD: Final[str] = """
+    INSERT INTO user_rods (user_id, rod_id, current_durability, obtained_at, refine_level, is_equipped)
+    VALUES (?, ?, ?, ?, ?, 0)
+"""
+_SQL_INSERT_ROD_RETURNING: Final[str] = """
+    INSERT INTO user_rods (user_id, rod_id, current_durability, obtained_at, refine_level, is_equipped)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?, 0)
+    RETURNING rod_instance_id, obtained_at
+"""
+_SQL_DELETE_ROD_INSTANCE: Final[str] = "DELETE FROM user_rods WHERE rod_instance_id = ?"
+_SQL_GET_ACCESSORY_INSTANCES: Final[str] = f"SELECT {_ACCESSORY_INSTANCE_COLUMNS} FROM user_accessories WHERE user_id = ?"
+_SQL_INSERT_ACCESSORY: Final[str] = """
+    INSERT INTO user_accessories (user_id, accessory_id, obtained_at, refine_level, is_equipped)
+    VALUES (?, ?, ?, ?, 0)
+"""
+_SQL_INSERT_ACCESSORY_RETURNING: Final[str] = """
+    INSERT INTO user_accessories (user_id, accessory_id, obtained_at, refine_level, is_equipped)
+    VALUES (?, ?, CURRENT_TIMESTAMP, ?, 0)
+    RETURNING accessory_instance_id, obtained_at
+"""
+_SQL_DELETE_ACCESSORY_INSTANCE: Final[str] = "DELETE FROM user_accessories WHERE accessory_instance_id = ?"
+_SQL_UPDATE_FISH_QUANTITY: Final[str] = """
+    INSERT INTO user_fish_inventory (user_id, fish_id, quantity)
+    VALUES (?, ?, MAX(0, ?))
+    ON CONFLICT(user_id, fish_id) DO UPDATE SET quantity = MAX(0, quantity + ?)
+"""
+_SQL_UPDATE_FISH_QUANTITY_RETURNING: Final[str] = _SQL_UPDATE_FISH_QUANTITY + "RETURNING quantity"
+_SQL_DELETE_EMPTY_FISH: Final[str] = "DELETE FROM user_fish_inventory WHERE user_id = ? AND quantity <= 0"
+_SQL_DELETE_FISH: Final[str] = "DELETE FROM user_fish_inventory WHERE user_id = ? AND fish_id = ?"
+_SQL_GET_ZONE_BY_ID: Final[str] = f"SELECT {_FISHING_ZONE_COLUMNS} FROM fishing_zones WHERE id = ?"
+_SQL_UPDATE_FISHING_ZONE: Final[str] = """
+    UPDATE fishing_zones
+    SET name = ?, description = ?, daily_rare_fish_quota = ?, rare_fish_caught_today = ?
+    WHERE id = ?
+"""
+_SQL_GET_ALL_FISHING_ZONES: Final[str] = f"SELECT {_FISHING_ZONE_COLUMNS} FROM fishing_zones"
+_SQL_UPDATE_ROD_INSTANCE: Final[str] = """
+    UPDATE user_rods
+    SET rod_id = ?, is_equipped = ?, current_durability = ?, refine_level = ?
+    WHERE rod_instance_id = ? AND user_id = ?
+"""
+_SQL_UPDATE_ACCESSORY_INSTANCE: Final[str] = """
+    UPDATE user_accessories
+    SET accessory_id = ?, is_equipped = ?, refine_level = ?
+    WHERE accessory_instance_id = ? AND user_id = ?
+"""
+_SQL_GET_SAME_ROD_INSTANCES: Final[str] = f"""
+    SELECT {_ROD_INSTANCE_COLUMNS} FROM user_rods
+    WHERE user_id = ? AND rod_id = ?
+"""
+_SQL_GET_SAME_ACCESSORY_INSTANCES: Final[str] = f"""
+    SELECT {_ACCESSORY_INSTANCE_COLUMNS} FROM user_accessories
+    WHERE user_id = ? AND accessory_id = ?
+"""
+_SQL_BATCH_INSERT_ROD: Final[str] = """
+    INSERT INTO user_rods (user_id, rod_id, current_durability, obtained_at, is_equipped, refine_level)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP, 0, 1)
+"""
+_SQL_BATCH_INSERT_ACCESSORY: Final[str] = """
+    INSERT INTO user_accessories (user_id, accessory_id, obtained_at, is_equipped, refine_level)
+    VALUES (?, ?, CURRENT_TIMESTAMP, 0, 1)
+"""
+
+
+class _ConnectionPool:
+    """基于 queue.Queue 的有界SQLite连接池，连接预先设置好PRAGMA并在线程间复用。"""
+
+    def __init__(self, db_path: str, size: int = 5):
+        self.db_path = db_path
+        self.size = size
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create_connection(self) -> sqlite3.Connection:
+        # 连接由连接池保证同一时刻只被一个线程使用
+        conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False,
+                               cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON;")
+        apply_pragmas(conn)
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._create_connection()
+                except Exception:
+                    self._created -= 1
+                    raise
+        # 连接数已达上限，等待其他线程归还；超时说明连接被长期占用，直接报错而不是无限阻塞工作线程
+        try:
+            return self._idle.get(timeout=BUSY_TIMEOUT_MS / 1000)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"连接池已耗尽：{self.size} 个连接均被占用，等待 {BUSY_TIMEOUT_MS} 毫秒后仍无空闲连接"
+            ) from None
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """归还连接，确保没有遗留未结束的事务。"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def acquire(self) -> Iterator[sqlite3.Connection]:
+        """借出一个连接，退出时按 sqlite3 的上下文语义提交或回滚，并归还连接。"""
+        conn = self._checkout()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.release(conn)
+
+
 class SqliteInventoryRepository(AbstractInventoryRepository):
     """用户库存仓储的SQLite实现"""
 
     def __init__(self, db_path: str):
         self.db_path = db_path
-        self._local = threading.local()
-
-    def _get_connection(self) -> sqlite3.Connection:
-        """获取一个线程安全的数据库连接。"""
-        conn = getattr(self._local, "connection", None)
-        if conn is None:
-            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON;")
-            self._local.connection = conn
-        return conn
+        self._pool = _ConnectionPool(db_path)
+
+    def _get_connection(self) -> ContextManager[sqlite3.Connection]:
+        """从连接池借出一个连接，需配合 with 语句使用；处于跨仓储事务中时复用事务连接。"""
+        tx_conn = get_transaction_connection(self.db_path)
+        if tx_conn is not None:
+            return tx_conn
+        return self._pool.acquire()
+
+    # 列表查询直接迭代游标逐行构造领域对象，不再先用 fetchall() 生成一份 Row 列表。
+    # 仍返回 list：游标必须在连接归还连接池之前读完，且调用方依赖 len() 和真值判断。
 
     # --- 私有映射辅助方法 ---
     def _row_to_fish_item(self, row: sqlite3.Row) -> Optional[UserFishInventoryItem]:
         if not row:
             return None
-        return UserFishInventoryItem(**row)
+        return UserFishInventoryItem(*row)
 
     def _row_to_rod_instance(self, row: sqlite3.Row) -> Optional[UserRodInstance]:
         if not row:
             return None
-        return UserRodInstance(**row)
+        return UserRodInstance(*row)
 
     def _row_to_accessory_instance(self, row: sqlite3.Row) -> Optional[UserAccessoryInstance]:
         if not row:
             return None
-        return UserAccessoryInstance(**row)
+        return UserAccessoryInstance(*row)
 
     # --- Fish Inventory Methods ---
     def get_fish_inventory(self, user_id: str) -> List[UserFishInventoryItem]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT user_id, fish_id, quantity FROM user_fish_inventory WHERE user_id = ? AND quantity > 0", (user_id,))
-            return [self._row_to_fish_item(row) for row in cursor.fetchall()]
+            cursor.execute(_SQL_GET_FISH_INVENTORY, (user_id,))
+            return [self._row_to_fish_item(row) for row in cursor]
 
-    def get_fish_inventory_value(self, user_id: str, rarity: Optional[int] = None) -> int:
-        query = """
-            SELECT SUM(f.base_value * ufi.quantity)
-            FROM user_fish_inventory ufi
-            JOIN fish f ON ufi.fish_id = f.fish_id
-            WHERE ufi.user_id = ?
-        """
-        params = [user_id]
-        if rarity is not None:
-            query += " AND f.rarity = ?"
-            params.append(rarity)
+    def get_fish_pond_details(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SQL_GET_FISH_POND_DETAILS, (user_id,))
+            return [dict(row) for row in cursor]
 
+    def get_fish_inventory_stats(self, user_id: str) -> Tuple[int, int]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-            return result[0] if result and result[0] is not None else 0
+            cursor.execute(_SQL_GET_FISH_INVENTORY_STATS, (user_id,))
+            total_count, total_value = cursor.fetchone()
+            return total_count, total_value
+
+    def get_fish_inventory_value(self, user_id: str, rarity: Optional[int] = None) -> int:
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SQL_GET_FISH_INVENTORY_VALUE, (user_id, rarity, rarity))
+            return cursor.fetchone()[0]
 
     def add_fish_to_inventory(self, user_id: str, fish_id: int, quantity: int = 1) -> None:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO user_fish_inventory (user_id, fish_id, quantity)
-                VALUES (?, ?, ?)
-                ON CONFLICT(user_id, fish_id) DO UPDATE SET quantity = quantity + excluded.quantity
-            """, (user_id, fish_id, quantity))
+            cursor.execute(_SQL_UPSERT_FISH, (user_id, fish_id, quantity))
             conn.commit()
 
     def clear_fish_inventory(self, user_id: str, rarity: Optional[int] = None) -> None:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             if rarity is None:
-                cursor.execute("DELETE FROM user_fish_inventory WHERE user_id = ?", (user_id,))
+                cursor.execute(_SQL_CLEAR_FISH_INVENTORY, (user_id,))
             else:
-                cursor.execute("""
-                    DELETE FROM user_fish_inventory
-                    WHERE user_id = ? AND fish_id IN (
-                        SELECT fish_id FROM fish WHERE rarity = ?
-                    )
-                """, (user_id, rarity))
+                cursor.execute(_SQL_CLEAR_FISH_INVENTORY_BY_RARITY, (user_id, rarity))
             conn.commit()
 
     def sell_fish_keep_one(self, user_id: str) -> int:
@@ -97,50 +331,21 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
         返回卖出的总价值。
         注意：此操作应在一个事务中完成，以保证数据一致性。
         """
-        sold_value = 0
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("BEGIN TRANSACTION")
-            try:
-                # 查询所有数量大于1的鱼及其价值
-                cursor.execute("""
-                    SELECT ufi.fish_id, ufi.quantity, f.base_value, f.name
-                    FROM user_fish_inventory ufi
-                    JOIN fish f ON ufi.fish_id = f.fish_id
-                    WHERE ufi.user_id = ? AND ufi.quantity > 1
-                """, (user_id,))
-
-                items_to_sell = cursor.fetchall()
-
-                if not items_to_sell:
-                    conn.rollback()
-                    return 0
-
-                for item in items_to_sell:
-                    sell_qty = item["quantity"] - 1
-                    sold_value += sell_qty * item["base_value"]
-
-                # 将所有数量大于1的鱼更新为1
-                cursor.execute("""
-                    UPDATE user_fish_inventory
-                    SET quantity = 1
-                    WHERE user_id = ? AND quantity > 1
-                """, (user_id,))
-
-                conn.commit()
-            except sqlite3.Error:
-                conn.rollback()
-                raise # 向上抛出异常，让服务层处理
+        # 由 with 语句负责提交，出现异常时自动回滚并向上抛出，让服务层处理
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # 直接在 SQL 中汇总所有数量大于1的鱼卖出后的价值
+            sold_value = cursor.execute(_SQL_GET_KEEP_ONE_SOLD_VALUE, (user_id,)).fetchone()[0]
+
+            # 将所有数量大于1的鱼更新为1（价值为0的物品同样只保留一条，因此不依赖 sold_value 判断）
+            cursor.execute(_SQL_KEEP_ONE_FISH, (user_id,))
         return sold_value
 
     def get_user_equipped_rod(self, user_id: str) -> Optional[UserRodInstance]:
         """获取用户当前装备的钓竿实例"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM user_rods
-                WHERE user_id = ? AND is_equipped = 1
-            """, (user_id,))
+            cursor.execute(_SQL_GET_EQUIPPED_ROD, (user_id,))
             row = cursor.fetchone()
             return self._row_to_rod_instance(row) if row else None
 
@@ -148,10 +353,7 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
         """根据用户ID和钓竿实例ID获取特定的钓竿实例"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM user_rods
-                WHERE user_id = ? AND rod_instance_id = ?
-            """, (user_id, rod_instance_id))
+            cursor.execute(_SQL_GET_ROD_INSTANCE_BY_ID, (user_id, rod_instance_id))
             row = cursor.fetchone()
             return self._row_to_rod_instance(row) if row else None
 
@@ -159,34 +361,21 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
         """清空用户的所有未装备和低于五星的钓竿实例"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                DELETE FROM user_rods
-                WHERE user_id = ? AND is_equipped = 0 AND rod_id NOT IN (
-                    SELECT rod_id FROM rods WHERE rarity >= 5
-                )
-            """, (user_id,))
+            cursor.execute(_SQL_CLEAR_ROD_INSTANCES, (user_id,))
             conn.commit()
 
     def clear_user_accessory_instances(self, user_id: str) -> None:
         """清空用户的所有未装备和低于五星的配件实例"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                DELETE FROM user_accessories
-                WHERE user_id = ? AND is_equipped = 0 AND accessory_id NOT IN (
-                    SELECT accessory_id FROM accessories WHERE rarity >= 5
-                )
-            """, (user_id,))
+            cursor.execute(_SQL_CLEAR_ACCESSORY_INSTANCES, (user_id,))
             conn.commit()
 
     def get_user_accessory_instance_by_id(self, user_id: str, accessory_instance_id: int) -> Optional[UserAccessoryInstance]:
         """根据用户ID和配件实例ID获取特定的配件实例"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM user_accessories
-                WHERE user_id = ? AND accessory_instance_id = ?
-            """, (user_id, accessory_instance_id))
+            cursor.execute(_SQL_GET_ACCESSORY_INSTANCE_BY_ID, (user_id, accessory_instance_id))
             row = cursor.fetchone()
             return self._row_to_accessory_instance(row) if row else None
 
@@ -194,36 +383,27 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
         """获取用户当前装备的配件实例"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM user_accessories
-                WHERE user_id = ? AND is_equipped = 1
-            """, (user_id,))
+            cursor.execute(_SQL_GET_EQUIPPED_ACCESSORY, (user_id,))
             row = cursor.fetchone()
             return self._row_to_accessory_instance(row) if row else None
 
+    def get_equipment(self, user_id: str) -> Tuple[Optional[UserRodInstance], Optional[UserAccessoryInstance]]:
+        """在同一个连接上获取用户当前装备的钓竿和配件实例"""
+        with self._get_connection() as conn:
+            rod_row = conn.execute(_SQL_GET_EQUIPPED_ROD, (user_id,)).fetchone()
+            accessory_row = conn.execute(_SQL_GET_EQUIPPED_ACCESSORY, (user_id,)).fetchone()
+        return self._row_to_rod_instance(rod_row), self._row_to_accessory_instance(accessory_row)
+
     def set_equipment_status(self, user_id: str, rod_instance_id: Optional[int] = None, accessory_instance_id: Optional[int] = None) -> None:
         """
         设置用户的装备状态。
         """
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            # 重置所有装备状态
-            cursor.execute("""
-                UPDATE user_rods SET is_equipped = 0 WHERE user_id = ?
-            """, (user_id,))
-            cursor.execute("""
-                UPDATE user_accessories SET is_equipped = 0 WHERE user_id = ?
-            """, (user_id,))
-
-            # 设置新的装备状态
-            if rod_instance_id is not None:
-                cursor.execute("""
-                    UPDATE user_rods SET is_equipped = 1 WHERE rod_instance_id = ? AND user_id = ?
-                """, (rod_instance_id, user_id))
-            if accessory_instance_id is not None:
-                cursor.execute("""
-                    UPDATE user_accessories SET is_equipped = 1 WHERE accessory_instance_id = ? AND user_id = ?
-                """, (accessory_instance_id, user_id))
+            # 重置与设置合并为每张表一条语句
+            cursor.execute(_SQL_SET_EQUIPPED_ROD, (-1 if rod_instance_id is None else rod_instance_id, user_id))
+            cursor.execute(_SQL_SET_EQUIPPED_ACCESSORY,
+                           (-1 if accessory_instance_id is None else accessory_instance_id, user_id))
 
             conn.commit()
 
@@ -235,11 +415,9 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
         """
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT bait_id FROM user_bait_inventory
-                WHERE user_id = ? AND quantity > 0
-            """, (user_id,))
-            return [row["bait_id"] for row in cursor.fetchall()]
+            cursor.row_factory = None  # 直接返回元组，省去 Row 的按键查找
+            cursor.execute(_SQL_GET_DISPOSABLE_BAITS, (user_id,))
+            return [bait_id for (bait_id,) in cursor]
 
     def get_user_titles(self, user_id: str) -> List[int]:
         """
@@ -248,11 +426,9 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
         """
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT title_id FROM user_titles
-                WHERE user_id = ?
-            """, (user_id,))
-            return [row["title_id"] for row in cursor.fetchall()]
+            cursor.row_factory = None  # 直接返回元组，省去 Row 的按键查找
+            cursor.execute(_SQL_GET_USER_TITLES, (user_id,))
+            return [title_id for (title_id,) in cursor]
 
     def get_random_bait(self, user_id: str) -> Optional[int]:
         """
@@ -261,11 +437,11 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
         """
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT bait_id FROM user_bait_inventory
-                WHERE user_id = ? AND quantity > 0
-                ORDER BY RANDOM() LIMIT 1
-            """, (user_id,))
+            # 先计数再随机偏移，避免 ORDER BY RANDOM() 对所有行排序
+            count = cursor.execute(_SQL_COUNT_AVAILABLE_BAITS, (user_id,)).fetchone()[0]
+            if not count:
+                return None
+            cursor.execute(_SQL_GET_BAIT_AT_OFFSET, (user_id, random.randrange(count)))
             row = cursor.fetchone()
             return row["bait_id"] if row else None
 
@@ -273,20 +449,24 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
     def get_user_bait_inventory(self, user_id: str) -> Dict[int, int]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT bait_id, quantity FROM user_bait_inventory WHERE user_id = ?", (user_id,))
-            return {row["bait_id"]: row["quantity"] for row in cursor.fetchall()}
+            cursor.row_factory = None  # 直接返回元组，省去 Row 的按键查找
+            cursor.execute(_SQL_GET_BAIT_INVENTORY, (user_id,))
+            return {bait_id: quantity for bait_id, quantity in cursor}
 
     def update_bait_quantity(self, user_id: str, bait_id: int, delta: int) -> None:
         """更新用户诱饵库存中特定诱饵的数量（可增可减），并确保数量不小于0。"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO user_bait_inventory (user_id, bait_id, quantity)
-                VALUES (?, ?, MAX(0, ?))
-                ON CONFLICT(user_id, bait_id) DO UPDATE SET quantity = MAX(0, quantity + ?)
-            """, (user_id, bait_id, delta, delta))
-            # 删除数量为0的行，保持数据整洁
-            cursor.execute("DELETE FROM user_bait_inventory WHERE user_id = ? AND quantity <= 0", (user_id,))
+            if _SUPPORTS_RETURNING:
+                cursor.execute(_SQL_UPDATE_BAIT_QUANTITY_RETURNING, (user_id, bait_id, delta, delta))
+                row = cursor.fetchone()
+                # 仅当该诱饵数量归零时才删除对应行
+                if row and row[0] <= 0:
+                    cursor.execute(_SQL_DELETE_BAIT, (user_id, bait_id))
+            else:
+                cursor.execute(_SQL_UPDATE_BAIT_QUANTITY, (user_id, bait_id, delta, delta))
+                # 删除数量为0的行，保持数据整洁
+                cursor.execute(_SQL_DELETE_EMPTY_BAITS, (user_id,))
             conn.commit()
 
 
@@ -294,139 +474,128 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
     def get_user_rod_instances(self, user_id: str) -> List[UserRodInstance]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM user_rods WHERE user_id = ?", (user_id,))
-            return [self._row_to_rod_instance(row) for row in cursor.fetchall()]
+            cursor.execute(_SQL_GET_ROD_INSTANCES, (user_id,))
+            return [self._row_to_rod_instance(row) for row in cursor]
 
     def  add_rod_instance(self, user_id: str, rod_id: int, durability: Optional[int], refine_level:int = 1) -> UserRodInstance:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            now = datetime.now()
-            cursor.execute("""
-                INSERT INTO user_rods (user_id, rod_id, current_durability, obtained_at, refine_level, is_equipped)
-                VALUES (?, ?, ?, ?, ?, 0)
-            """, (user_id, rod_id, durability, now, refine_level))
-            instance_id = cursor.lastrowid
+            if _SUPPORTS_RETURNING:
+                # 与批量插入一致，获得时间由数据库的 CURRENT_TIMESTAMP 生成
+                cursor.execute(_SQL_INSERT_ROD_RETURNING, (user_id, rod_id, durability, refine_level))
+                instance_id, obtained_at = cursor.fetchone()
+            else:
+                obtained_at = datetime.now()
+                cursor.execute(_SQL_INSERT_ROD, (user_id, rod_id, durability, obtained_at, refine_level))
+                instance_id = cursor.lastrowid
             conn.commit()
             return UserRodInstance(
                 rod_instance_id=instance_id, user_id=user_id, rod_id=rod_id,
-                is_equipped=False, obtained_at=now, current_durability=durability, refine_level=refine_level
+                is_equipped=False, obtained_at=obtained_at, current_durability=durability, refine_level=refine_level
             )
 
     def delete_rod_instance(self, rod_instance_id: int) -> None:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM user_rods WHERE rod_instance_id = ?", (rod_instance_id,))
+            cursor.execute(_SQL_DELETE_ROD_INSTANCE, (rod_instance_id,))
             conn.commit()
 
     # --- Accessory Inventory Methods ---
     def get_user_accessory_instances(self, user_id: str) -> List[UserAccessoryInstance]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM user_accessories WHERE user_id = ?", (user_id,))
-            return [self._row_to_accessory_instance(row) for row in cursor.fetchall()]
+            cursor.execute(_SQL_GET_ACCESSORY_INSTANCES, (user_id,))
+            return [self._row_to_accessory_instance(row) for row in cursor]
 
     def add_accessory_instance(self, user_id: str, accessory_id: int, refine_level: int = 1) -> UserAccessoryInstance:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            now = datetime.now()
-            cursor.execute("""
-                INSERT INTO user_accessories (user_id, accessory_id, obtained_at, refine_level, is_equipped)
-                VALUES (?, ?, ?, ?, 0)
-            """, (user_id, accessory_id, now, refine_level))
-            instance_id = cursor.lastrowid
+            if _SUPPORTS_RETURNING:
+                # 与批量插入一致，获得时间由数据库的 CURRENT_TIMESTAMP 生成
+                cursor.execute(_SQL_INSERT_ACCESSORY_RETURNING, (user_id, accessory_id, refine_level))
+                instance_id, obtained_at = cursor.fetchone()
+            else:
+                obtained_at = datetime.now()
+                cursor.execute(_SQL_INSERT_ACCESSORY, (user_id, accessory_id, obtained_at, refine_level))
+                instance_id = cursor.lastrowid
             conn.commit()
             return UserAccessoryInstance(
                 accessory_instance_id=instance_id, user_id=user_id, accessory_id=accessory_id,
-                is_equipped=False, obtained_at=now, refine_level=refine_level
+                is_equipped=False, obtained_at=obtained_at, refine_level=refine_level
             )
 
     def delete_accessory_instance(self, accessory_instance_id: int) -> None:
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM user_accessories WHERE accessory_instance_id = ?", (accessory_instance_id,))
+            cursor.execute(_SQL_DELETE_ACCESSORY_INSTANCE, (accessory_instance_id,))
             conn.commit()
 
     def update_fish_quantity(self, user_id: str, fish_id: int, delta: int) -> None:
         """更新用户鱼类库存中特定鱼的数量（可增可减），并确保数量不小于0。"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO user_fish_inventory (user_id, fish_id, quantity)
-                VALUES (?, ?, MAX(0, ?))
-                ON CONFLICT(user_id, fish_id) DO UPDATE SET quantity = MAX(0, quantity + ?)
-            """, (user_id, fish_id, delta, delta))
-            # 删除数量为0的行，保持数据整洁
-            cursor.execute("DELETE FROM user_fish_inventory WHERE user_id = ? AND quantity <= 0", (user_id,))
+            if _SUPPORTS_RETURNING:
+                cursor.execute(_SQL_UPDATE_FISH_QUANTITY_RETURNING, (user_id, fish_id, delta, delta))
+                row = cursor.fetchone()
+                # 仅当该鱼数量归零时才删除对应行
+                if row and row[0] <= 0:
+                    cursor.execute(_SQL_DELETE_FISH, (user_id, fish_id))
+            else:
+                cursor.execute(_SQL_UPDATE_FISH_QUANTITY, (user_id, fish_id, delta, delta))
+                # 删除数量为0的行，保持数据整洁
+                cursor.execute(_SQL_DELETE_EMPTY_FISH, (user_id,))
             conn.commit()
     def get_zone_by_id(self, zone_id: int) -> FishingZone:
         """根据ID获取钓鱼区域信息"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM fishing_zones WHERE id = ?", (zone_id,))
+            cursor.execute(_SQL_GET_ZONE_BY_ID, (zone_id,))
             row = cursor.fetchone()
             if row:
-                return FishingZone(**row)
+                return FishingZone(*row)
             else:
                 raise ValueError(f"钓鱼区域ID {zone_id} 不存在。")
     def update_fishing_zone(self, zone: FishingZone) -> None:
         """更新钓鱼区域信息"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE fishing_zones
-                SET name = ?, description = ?, daily_rare_fish_quota = ?, rare_fish_caught_today = ?
-                WHERE id = ?
-            """, (zone.name, zone.description, zone.daily_rare_fish_quota, zone.rare_fish_caught_today, zone.id))
+            cursor.execute(_SQL_UPDATE_FISHING_ZONE, (zone.name, zone.description, zone.daily_rare_fish_quota, zone.rare_fish_caught_today, zone.id))
             conn.commit()
 
     def get_all_fishing_zones(self) -> List[FishingZone]:
         """获取所有钓鱼区域信息"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM fishing_zones")
-            return [FishingZone(**row) for row in cursor.fetchall()]
+            cursor.execute(_SQL_GET_ALL_FISHING_ZONES)
+            return [FishingZone(*row) for row in cursor]
 
     def update_rod_instance(self, rod_instance: UserRodInstance):
         """更新钓竿实例信息"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE user_rods
-                SET rod_id = ?, is_equipped = ?, current_durability = ?, refine_level = ?
-                WHERE rod_instance_id = ? AND user_id = ?
-            """, (rod_instance.rod_id, rod_instance.is_equipped, rod_instance.current_durability, rod_instance.refine_level, rod_instance.rod_instance_id, rod_instance.user_id))
+            cursor.execute(_SQL_UPDATE_ROD_INSTANCE, (rod_instance.rod_id, rod_instance.is_equipped, rod_instance.current_durability, rod_instance.refine_level, rod_instance.rod_instance_id, rod_instance.user_id))
             conn.commit()
 
     def update_accessory_instance(self, accessory_instance: UserAccessoryInstance):
         """更新配件实例信息"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE user_accessories
-                SET accessory_id = ?, is_equipped = ?, refine_level = ?
-                WHERE accessory_instance_id = ? AND user_id = ?
-            """, (accessory_instance.accessory_id, accessory_instance.is_equipped, accessory_instance.refine_level, accessory_instance.accessory_instance_id, accessory_instance.user_id))
+            cursor.execute(_SQL_UPDATE_ACCESSORY_INSTANCE, (accessory_instance.accessory_id, accessory_instance.is_equipped, accessory_instance.refine_level, accessory_instance.accessory_instance_id, accessory_instance.user_id))
             conn.commit()
 
     def get_same_rod_instances(self, user_id: int, rod_id: str) -> List[UserRodInstance]:
         """获取用户所有相同类型的钓竿实例"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM user_rods
-                WHERE user_id = ? AND rod_id = ?
-            """, (user_id, rod_id))
-            return [self._row_to_rod_instance(row) for row in cursor.fetchall()]
+            cursor.execute(_SQL_GET_SAME_ROD_INSTANCES, (user_id, rod_id))
+            return [self._row_to_rod_instance(row) for row in cursor]
 
     def get_same_accessory_instances(self, user_id: int, accessory_id: str) -> List[UserAccessoryInstance]:
         """获取用户所有相同类型的配件实例"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM user_accessories
-                WHERE user_id = ? AND accessory_id = ?
-            """, (user_id, accessory_id))
-            return [self._row_to_accessory_instance(row) for row in cursor.fetchall()]
+            cursor.execute(_SQL_GET_SAME_ACCESSORY_INSTANCES, (user_id, accessory_id))
+            return [self._row_to_accessory_instance(row) for row in cursor]
 
     def batch_add_rod_instances(self, user_id: str, rod_data_list: List[Tuple[int, int]]) -> List[int]:
         """
@@ -452,56 +621,39 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
     
     def _batch_insert_rod_instances(self, user_id: str, rod_data_list: List[Tuple[int, int]]) -> List[int]:
         """实际的批量插入实现"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
-            
-            try:
-                # 开始事务
-                conn.execute("BEGIN TRANSACTION")
-                
-                # 构建批量插入语句 - 使用正确的表名和字段名
-                placeholders = ",".join(["(?, ?, ?, CURRENT_TIMESTAMP, 0, 1)"] * len(rod_data_list))  # is_equipped=0, refine_level=1
-                sql = f"""
-                INSERT INTO user_rods (user_id, rod_id, current_durability, obtained_at, is_equipped, refine_level)
-                VALUES {placeholders}
-                """
-                
-                # 准备参数：user_id, rod_id, current_durability 为一组
-                params = []
-                for rod_id, durability in rod_data_list:
-                    params.extend([user_id, rod_id, durability])
-                
-                cursor.execute(sql, params)
-                
-                # 获取插入的ID范围
-                last_id = cursor.lastrowid
-                first_id = last_id - len(rod_data_list) + 1
-                inserted_ids = list(range(first_id, last_id + 1))
-                
-                # 提交事务
-                conn.commit()
-                
-                logger.info(f"批量插入 {len(rod_data_list)} 个鱼竿实例成功，ID范围: {first_id}-{last_id}")
-                return inserted_ids
-                
-            except Exception as e:
-                # 回滚事务
-                conn.rollback()
-                raise e
+            # 立即获取写锁，避免事务中途升级时遇到 SQLITE_BUSY，也保证自增ID连续
+            # 已处于外层事务中时写锁已持有，无需再开启事务
+            if not conn.in_transaction:
+                cursor.execute("BEGIN IMMEDIATE")
+
+            # 同一条预编译语句通过 executemany 逐行绑定参数，is_equipped=0, refine_level=1
+            cursor.executemany(_SQL_BATCH_INSERT_ROD, [(user_id, rod_id, durability) for rod_id, durability in rod_data_list])
+
+            # 获取插入的ID范围（executemany 不会设置 cursor.lastrowid）
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            first_id = last_id - len(rod_data_list) + 1
+            inserted_ids = list(range(first_id, last_id + 1))
+
+        # 事务已由 with 语句提交，异常时会自动回滚
+        logger.info(f"批量插入 {len(rod_data_list)} 个鱼竿实例成功，ID范围: {first_id}-{last_id}")
+        return inserted_ids
     
     def _fallback_add_rod_instances(self, user_id: str, rod_data_list: List[Tuple[int, int]]) -> List[int]:
-        """回退方案：单个插入鱼竿实例"""
+        """回退方案：逐行插入鱼竿实例，但所有行共用一个事务，只提交一次"""
         inserted_ids = []
-        for rod_id, durability in rod_data_list:
-            try:
-                # 使用现有的单个插入方法
-                instance_id = self.add_rod_instance(user_id, rod_id, durability)
-                if instance_id:
-                    inserted_ids.append(instance_id)
-            except Exception as e:
-                logger.error(f"插入单个鱼竿实例失败 (rod_id: {rod_id}): {e}")
-                continue
-        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for rod_id, durability in rod_data_list:
+                try:
+                    # 单行失败只回滚该语句本身，不影响同一事务中的其他行
+                    cursor.execute(_SQL_BATCH_INSERT_ROD, (user_id, rod_id, durability))
+                    inserted_ids.append(cursor.lastrowid)
+                except sqlite3.Error as e:
+                    logger.error(f"插入单个鱼竿实例失败 (rod_id: {rod_id}): {e}")
+                    continue
+
         logger.info(f"回退方案完成：成功插入 {len(inserted_ids)} 个鱼竿实例")
         return inserted_ids
     
@@ -529,59 +681,69 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
     
     def _batch_insert_accessory_instances(self, user_id: str, accessory_ids: List[int]) -> List[int]:
         """实际的批量插入实现"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
-            
-            try:
-                # 开始事务
-                conn.execute("BEGIN TRANSACTION")
-                
-                # 构建批量插入语句 - 使用正确的表名和字段名
-                placeholders = ",".join(["(?, ?, CURRENT_TIMESTAMP, 0, 1)"] * len(accessory_ids))  # is_equipped=0, refine_level=1
-                sql = f"""
-                INSERT INTO user_accessories (user_id, accessory_id, obtained_at, is_equipped, refine_level)
-                VALUES {placeholders}
-                """
-                
-                # 准备参数：user_id, accessory_id 为一组
-                params = []
-                for accessory_id in accessory_ids:
-                    params.extend([user_id, accessory_id])
-                
-                cursor.execute(sql, params)
-                
-                # 获取插入的ID范围
-                last_id = cursor.lastrowid
-                first_id = last_id - len(accessory_ids) + 1
-                inserted_ids = list(range(first_id, last_id + 1))
-                
-                # 提交事务
-                conn.commit()
-                
-                logger.info(f"批量插入 {len(accessory_ids)} 个饰品实例成功，ID范围: {first_id}-{last_id}")
-                return inserted_ids
-                
-            except Exception as e:
-                # 回滚事务
-                conn.rollback()
-                raise e
+            # 立即获取写锁，避免事务中途升级时遇到 SQLITE_BUSY，也保证自增ID连续
+            # 已处于外层事务中时写锁已持有，无需再开启事务
+            if not conn.in_transaction:
+                cursor.execute("BEGIN IMMEDIATE")
+
+            # 同一条预编译语句通过 executemany 逐行绑定参数，is_equipped=0, refine_level=1
+            cursor.executemany(_SQL_BATCH_INSERT_ACCESSORY, [(user_id, accessory_id) for accessory_id in accessory_ids])
+
+            # 获取插入的ID范围（executemany 不会设置 cursor.lastrowid）
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            first_id = last_id - len(accessory_ids) + 1
+            inserted_ids = list(range(first_id, last_id + 1))
+
+        # 事务已由 with 语句提交，异常时会自动回滚
+        logger.info(f"批量插入 {len(accessory_ids)} 个饰品实例成功，ID范围: {first_id}-{last_id}")
+        return inserted_ids
     
     def _fallback_add_accessory_instances(self, user_id: str, accessory_ids: List[int]) -> List[int]:
-        """回退方案：单个插入饰品实例"""
+        """回退方案：逐行插入饰品实例，但所有行共用一个事务，只提交一次"""
         inserted_ids = []
-        for accessory_id in accessory_ids:
-            try:
-                # 使用现有的单个插入方法
-                instance_id = self.add_accessory_instance(user_id, accessory_id)
-                if instance_id:
-                    inserted_ids.append(instance_id)
-            except Exception as e:
-                logger.error(f"插入单个饰品实例失败 (accessory_id: {accessory_id}): {e}")
-                continue
-        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for accessory_id in accessory_ids:
+                try:
+                    # 单行失败只回滚该语句本身，不影响同一事务中的其他行
+                    cursor.execute(_SQL_BATCH_INSERT_ACCESSORY, (user_id, accessory_id))
+                    inserted_ids.append(cursor.lastrowid)
+                except sqlite3.Error as e:
+                    logger.error(f"插入单个饰品实例失败 (accessory_id: {accessory_id}): {e}")
+                    continue
+
         logger.info(f"回退方案完成：成功插入 {len(inserted_ids)} 个饰品实例")
         return inserted_ids
     
+    def batch_add_fish(self, user_id: str, fish_items: List[Tuple[int, int]]) -> None:
+        """
+        批量向用户鱼类库存添加鱼，所有条目在同一个事务中提交。
+
+        Args:
+            user_id: 用户ID
+            fish_items: 鱼类数据列表，每个元素为 (fish_id, quantity)
+        """
+        if not fish_items:
+            return
+        with self._get_connection() as conn:
+            conn.executemany(_SQL_UPSERT_FISH, [(user_id, fish_id, quantity) for fish_id, quantity in fish_items])
+
+    def batch_delete_rod_instances(self, rod_instance_ids: List[int]) -> None:
+        """批量删除鱼竿实例，所有删除在同一个事务中提交。"""
+        if not rod_instance_ids:
+            return
+        with self._get_connection() as conn:
+            conn.executemany(_SQL_DELETE_ROD_INSTANCE, [(instance_id,) for instance_id in rod_instance_ids])
+
+    def batch_delete_accessory_instances(self, accessory_instance_ids: List[int]) -> None:
+        """批量删除饰品实例，所有删除在同一个事务中提交。"""
+        if not accessory_instance_ids:
+            return
+        with self._get_connection() as conn:
+            conn.executemany(_SQL_DELETE_ACCESSORY_INSTANCE, [(instance_id,) for instance_id in accessory_instance_ids])
+
     def batch_update_bait_quantities(self, user_id: str, bait_updates: List[Tuple[int, int]]) -> None:
         """
         批量更新鱼饵数量。
@@ -592,46 +754,19 @@ class SqliteInventoryRepository(AbstractInventoryRepository):
         """
         if not bait_updates:
             return
-            
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            try:
-                # 开始事务
-                conn.execute("BEGIN TRANSACTION")
-                
-                for bait_id, delta_quantity in bait_updates:
-                    if delta_quantity == 0:
-                        continue
-                        
-                    # 检查当前数量 - 使用正确的表名
-                    cursor.execute("""
-                        SELECT quantity FROM user_bait_inventory 
-                        WHERE user_id = ? AND bait_id = ?
-                    """, (user_id, bait_id))
-                    
-                    result = cursor.fetchone()
-                    if result:
-                        new_quantity = max(0, result[0] + delta_quantity)
-                        cursor.execute("""
-                            UPDATE user_bait_inventory 
-                            SET quantity = ? 
-                            WHERE user_id = ? AND bait_id = ?
-                        """, (new_quantity, user_id, bait_id))
-                    elif delta_quantity > 0:
-                        # 新增记录
-                        cursor.execute("""
-                            INSERT INTO user_bait_inventory (user_id, bait_id, quantity)
-                            VALUES (?, ?, ?)
-                        """, (user_id, bait_id, delta_quantity))
-                
-                # 提交事务
-                conn.commit()
-                
-                logger.info(f"批量更新 {len(bait_updates)} 种鱼饵数量")
-                
-            except Exception as e:
-                # 回滚事务
-                conn.rollback()
-                logger.error(f"批量更新鱼饵数量失败: {e}")
-                raise e
\ No newline at end of file
+
+        params = [(user_id, bait_id, delta, delta) for bait_id, delta in bait_updates if delta]
+        if not params:
+            return
+
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                # 与 update_bait_quantity 相同的 UPSERT，一次 executemany 完成所有更新
+                cursor.executemany(_SQL_UPDATE_BAIT_QUANTITY, params)
+                # 删除数量为0的行，保持数据整洁
+                cursor.execute(_SQL_DELETE_EMPTY_BAITS, (user_id,))
+            logger.info(f"批量更新 {len(params)} 种鱼饵数量")
+        except Exception as e:
+            logger.error(f"批量更新鱼饵数量失败: {e}")
+            raise
@@ -1,24 +1,102 @@
 import sqlite3
 import threading
-from typing import Optional, List, Dict, Any
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Set
 
 # 导入抽象基类和领域模型
+from ..database.connection import apply_pragmas, get_transaction_connection
 from .abstract_repository import AbstractItemTemplateRepository
 from ..domain.models import Fish, Rod, Bait, Accessory, Title
 
+# 各类物品模板所在的表，模板名称在表中唯一
+_TEMPLATE_TABLES = {"fish": "fish", "rod": "rods", "bait": "baits", "accessory": "accessories"}
+# 单条 IN 查询最多绑定的参数个数，低于旧版 SQLite 的 999 个变量上限
+_MAX_IN_PARAMS = 900
+
+class _TemplateCache:
+    """
+    进程内的模板LRU缓存，模板数据只在后台编辑时变化。
+    每次失效都递增 generation，查询前记下的 generation 已变化时丢弃查询结果，避免失效前读到的旧模板写回缓存。
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[int, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def get(self, key: int) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: int, value: Any, generation: int) -> None:
+        """generation 为查询数据库前读取的 self.generation，期间发生过失效则不写入"""
+        if value is None:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Optional[int] = None) -> None:
+        with self._lock:
+            self.generation += 1
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+
 class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
     """物品模板仓储的SQLite实现"""
 
     def __init__(self, db_path: str):
         self.db_path = db_path
         self._local = threading.local()
+        # 按物品类型划分的模板缓存，后台增删改时失效
+        self._caches: Dict[str, _TemplateCache] = {
+            "rod": _TemplateCache(),
+            "accessory": _TemplateCache(),
+            "bait": _TemplateCache(),
+            "title": _TemplateCache(),
+        }
+        # 鱼竿/鱼饵/饰品/称号模板的版本号，每次增删改后递增，供上层判断渲染结果是否过期
+        self._version = 0
+        self._version_lock = threading.Lock()
+
+    def get_version(self) -> int:
+        """返回当前的模板版本号"""
+        return self._version
+
+    def _bump_version(self) -> None:
+        # 后台编辑可能来自不同的工作线程，递增需加锁
+        with self._version_lock:
+            self._version += 1
+
+    def invalidate(self, item_type: str, item_id: Optional[int] = None) -> None:
+        """使指定类型的模板缓存失效，item_id 为空时清空该类型的全部缓存"""
+        cache = self._caches.get(item_type)
+        if cache is not None:
+            cache.invalidate(item_id)
+            self._bump_version()
 
     def _get_connection(self) -> sqlite3.Connection:
         """获取一个线程安全的数据库连接。"""
+        # 处于跨仓储事务中时复用事务连接
+        tx_conn = get_transaction_connection(self.db_path)
+        if tx_conn is not None:
+            return tx_conn
         conn = getattr(self._local, "connection", None)
         if conn is None:
-            conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(self.db_path, cached_statements=256)
             conn.row_factory = sqlite3.Row
+            apply_pragmas(conn)
             self._local.connection = conn
         return conn
 
@@ -48,6 +126,32 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
             return None
         return Title(**row)
 
+    def _get_by_ids(self, item_type: str, table: str, id_column: str, ids: List[int], mapper) -> Dict[int, Any]:
+        """优先读取缓存，未命中的ID按 _MAX_IN_PARAMS 分批用 IN 查询获取，返回以主键为键的字典"""
+        cache = self._caches[item_type]
+        result = {}
+        missing_ids = []
+        for item_id in set(ids):
+            template = cache.get(item_id)
+            if template is not None:
+                result[item_id] = template
+            else:
+                missing_ids.append(item_id)
+        if not missing_ids:
+            return result
+        generation = cache.generation
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(missing_ids), _MAX_IN_PARAMS):
+                chunk = missing_ids[start:start + _MAX_IN_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(f"SELECT * FROM {table} WHERE {id_column} IN ({placeholders})", chunk)
+                for row in cursor.fetchall():
+                    template = mapper(row)
+                    cache.put(row[id_column], template, generation)
+                    result[row[id_column]] = template
+        return result
+
     # --- Fish Read Methods ---
     def get_fish_by_id(self, fish_id: int) -> Optional[Fish]:
         with self._get_connection() as conn:
@@ -76,10 +180,17 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
 
     # --- Rod Read Methods ---
     def get_rod_by_id(self, rod_id: int) -> Optional[Rod]:
+        cache = self._caches["rod"]
+        cached = cache.get(rod_id)
+        if cached is not None:
+            return cached
+        generation = cache.generation
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM rods WHERE rod_id = ?", (rod_id,))
-            return self._row_to_rod(cursor.fetchone())
+            template = self._row_to_rod(cursor.fetchone())
+        cache.put(rod_id, template, generation)
+        return template
 
     def get_all_rods(self) -> List[Rod]:
         with self._get_connection() as conn:
@@ -89,10 +200,17 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
 
     # --- Bait Read Methods ---
     def get_bait_by_id(self, bait_id: int) -> Optional[Bait]:
+        cache = self._caches["bait"]
+        cached = cache.get(bait_id)
+        if cached is not None:
+            return cached
+        generation = cache.generation
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM baits WHERE bait_id = ?", (bait_id,))
-            return self._row_to_bait(cursor.fetchone())
+            template = self._row_to_bait(cursor.fetchone())
+        cache.put(bait_id, template, generation)
+        return template
 
     def get_all_baits(self) -> List[Bait]:
         with self._get_connection() as conn:
@@ -102,10 +220,17 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
 
     # --- Accessory Read Methods ---
     def get_accessory_by_id(self, accessory_id: int) -> Optional[Accessory]:
+        cache = self._caches["accessory"]
+        cached = cache.get(accessory_id)
+        if cached is not None:
+            return cached
+        generation = cache.generation
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM accessories WHERE accessory_id = ?", (accessory_id,))
-            return self._row_to_accessory(cursor.fetchone())
+            template = self._row_to_accessory(cursor.fetchone())
+        cache.put(accessory_id, template, generation)
+        return template
 
     def get_all_accessories(self) -> List[Accessory]:
         with self._get_connection() as conn:
@@ -115,10 +240,17 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
 
     # --- Title Read Methods ---
     def get_title_by_id(self, title_id: int) -> Optional[Title]:
+        cache = self._caches["title"]
+        cached = cache.get(title_id)
+        if cached is not None:
+            return cached
+        generation = cache.generation
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM titles WHERE title_id = ?", (title_id,))
-            return self._row_to_title(cursor.fetchone())
+            template = self._row_to_title(cursor.fetchone())
+        cache.put(title_id, template, generation)
+        return template
 
     def get_all_titles(self) -> List[Title]:
         with self._get_connection() as conn:
@@ -126,18 +258,50 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
             cursor.execute("SELECT * FROM titles ORDER BY rarity DESC")
             return [self._row_to_title(row) for row in cursor.fetchall()]
 
+    # --- Batch Read Methods ---
+    def get_rods_by_ids(self, rod_ids: List[int]) -> Dict[int, Rod]:
+        return self._get_by_ids("rod", "rods", "rod_id", rod_ids, self._row_to_rod)
+
+    def get_accessories_by_ids(self, accessory_ids: List[int]) -> Dict[int, Accessory]:
+        return self._get_by_ids("accessory", "accessories", "accessory_id", accessory_ids, self._row_to_accessory)
+
+    def get_baits_by_ids(self, bait_ids: List[int]) -> Dict[int, Bait]:
+        return self._get_by_ids("bait", "baits", "bait_id", bait_ids, self._row_to_bait)
+
+    def get_titles_by_ids(self, title_ids: List[int]) -> Dict[int, Title]:
+        return self._get_by_ids("title", "titles", "title_id", title_ids, self._row_to_title)
+
+    def get_existing_template_names(self, item_type: str, names: List[str]) -> Set[str]:
+        """用 IN 查询按批检查名称，返回 names 中已存在于对应模板表的名称"""
+        table = _TEMPLATE_TABLES[item_type]
+        names = list(set(names))
+        existing = set()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(names), _MAX_IN_PARAMS):
+                chunk = names[start:start + _MAX_IN_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(f"SELECT name FROM {table} WHERE name IN ({placeholders})", chunk)
+                existing.update(row[0] for row in cursor.fetchall())
+        return existing
+
     # ==========================================================
     # Admin Panel CRUD Methods
     # ==========================================================
 
     # --- Fish Admin CRUD ---
     def add_fish_template(self, data: Dict[str, Any]) -> None:
+        self.add_fish_templates([data])
+
+    def add_fish_templates(self, data_list: List[Dict[str, Any]]) -> None:
+        """在同一个事务中批量添加鱼类模板，任一行失败则整批回滚"""
+        if not data_list:
+            return
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
+            conn.executemany("""
                 INSERT INTO fish (name, description, rarity, base_value, min_weight, max_weight, icon_url)
                 VALUES (:name, :description, :rarity, :base_value, :min_weight, :max_weight, :icon_url)
-            """, {**data, "icon_url": data.get("icon_url")})
+            """, [{**data, "icon_url": data.get("icon_url")} for data in data_list])
             conn.commit()
 
     def update_fish_template(self, fish_id: int, data: Dict[str, Any]) -> None:
@@ -161,17 +325,26 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
 
     # --- Rod Admin CRUD ---
     def add_rod_template(self, data: Dict[str, Any]) -> None:
+        self.add_rod_templates([data])
+
+    def add_rod_templates(self, data_list: List[Dict[str, Any]]) -> None:
+        """在同一个事务中批量添加鱼竿模板，任一行失败则整批回滚"""
+        if not data_list:
+            return
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
+            conn.executemany("""
                 INSERT INTO rods (name, description, rarity, source, purchase_cost,
                                   bonus_fish_quality_modifier, bonus_fish_quantity_modifier,
                                   bonus_rare_fish_chance, durability, icon_url)
                 VALUES (:name, :description, :rarity, :source, :purchase_cost,
                         :bonus_fish_quality_modifier, :bonus_fish_quantity_modifier,
                         :bonus_rare_fish_chance, :durability, :icon_url)
-            """, {**data, "purchase_cost": data.get("purchase_cost") or None, "durability": data.get("durability") or None, "icon_url": data.get("icon_url")})
+            """, [
+                {**data, "purchase_cost": data.get("purchase_cost") or None, "durability": data.get("durability") or None, "icon_url": data.get("icon_url")}
+                for data in data_list
+            ])
             conn.commit()
+        self._bump_version()
 
     def update_rod_template(self, rod_id: int, data: Dict[str, Any]) -> None:
         data["rod_id"] = rod_id
@@ -187,35 +360,45 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
                 WHERE rod_id = :rod_id
             """, {**data, "purchase_cost": data.get("purchase_cost") or None, "durability": data.get("durability") or None, "icon_url": data.get("icon_url")})
             conn.commit()
+        self.invalidate("rod", rod_id)
 
     def delete_rod_template(self, rod_id: int) -> None:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM rods WHERE rod_id = ?", (rod_id,))
             conn.commit()
+        self.invalidate("rod", rod_id)
 
     # --- Bait Admin CRUD ---
+    @staticmethod
+    def _bait_insert_params(data: Dict[str, Any]) -> Dict[str, Any]:
+        """从表单字典中准备鱼饵数据，为数字字段提供默认值"""
+        return {
+            "name": data.get("name"),
+            "description": data.get("description"),
+            "rarity": data.get("rarity", 1),
+            "effect_description": data.get("effect_description"),
+            "duration_minutes": data.get("duration_minutes", 0),
+            "cost": data.get("cost", 0),
+            "required_rod_rarity": data.get("required_rod_rarity", 0),
+            "success_rate_modifier": data.get("success_rate_modifier", 0.0),
+            "rare_chance_modifier": data.get("rare_chance_modifier", 0.0),
+            "garbage_reduction_modifier": data.get("garbage_reduction_modifier", 0.0),
+            "value_modifier": data.get("value_modifier", 1.0),
+            "quantity_modifier": data.get("quantity_modifier", 1.0),
+            "is_consumable": 1 if "is_consumable" in data else 0
+        }
+
     def add_bait_template(self, data: Dict[str, Any]) -> None:
         """后台添加一个新鱼饵，包含所有结构化效果字段"""
+        self.add_bait_templates([data])
+
+    def add_bait_templates(self, data_list: List[Dict[str, Any]]) -> None:
+        """在同一个事务中批量添加鱼饵模板，任一行失败则整批回滚"""
+        if not data_list:
+            return
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            # 从表单字典中准备数据，为数字字段提供默认值
-            params = {
-                "name": data.get("name"),
-                "description": data.get("description"),
-                "rarity": data.get("rarity", 1),
-                "effect_description": data.get("effect_description"),
-                "duration_minutes": data.get("duration_minutes", 0),
-                "cost": data.get("cost", 0),
-                "required_rod_rarity": data.get("required_rod_rarity", 0),
-                "success_rate_modifier": data.get("success_rate_modifier", 0.0),
-                "rare_chance_modifier": data.get("rare_chance_modifier", 0.0),
-                "garbage_reduction_modifier": data.get("garbage_reduction_modifier", 0.0),
-                "value_modifier": data.get("value_modifier", 1.0),
-                "quantity_modifier": data.get("quantity_modifier", 1.0),
-                "is_consumable": 1 if "is_consumable" in data else 0
-            }
-            cursor.execute("""
+            conn.executemany("""
                 INSERT INTO baits (
                     name, description, rarity, effect_description, duration_minutes, cost, required_rod_rarity,
                     success_rate_modifier, rare_chance_modifier, garbage_reduction_modifier,
@@ -225,8 +408,9 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
                     :success_rate_modifier, :rare_chance_modifier, :garbage_reduction_modifier,
                     :value_modifier, :quantity_modifier, :is_consumable
                 )
-            """, params)
+            """, [self._bait_insert_params(data) for data in data_list])
             conn.commit()
+        self._bump_version()
 
     def update_bait_template(self, bait_id: int, data: Dict[str, Any]) -> None:
         """后台更新一个鱼饵的信息，包含所有结构化效果字段"""
@@ -259,26 +443,34 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
                 WHERE bait_id = :bait_id
             """, params)
             conn.commit()
+        self.invalidate("bait", bait_id)
 
     def delete_bait_template(self, bait_id: int) -> None:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM baits WHERE bait_id = ?", (bait_id,))
             conn.commit()
+        self.invalidate("bait", bait_id)
 
     # --- Accessory Admin CRUD ---
     def add_accessory_template(self, data: Dict[str, Any]) -> None:
+        self.add_accessory_templates([data])
+
+    def add_accessory_templates(self, data_list: List[Dict[str, Any]]) -> None:
+        """在同一个事务中批量添加饰品模板，任一行失败则整批回滚"""
+        if not data_list:
+            return
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
+            conn.executemany("""
                 INSERT INTO accessories (name, description, rarity, slot_type, bonus_fish_quality_modifier,
                                          bonus_fish_quantity_modifier, bonus_rare_fish_chance,
                                          bonus_coin_modifier, other_bonus_description, icon_url)
                 VALUES (:name, :description, :rarity, :slot_type, :bonus_fish_quality_modifier,
                         :bonus_fish_quantity_modifier, :bonus_rare_fish_chance, :bonus_coin_modifier,
                         :other_bonus_description, :icon_url)
-            """, {**data, "icon_url": data.get("icon_url")})
+            """, [{**data, "icon_url": data.get("icon_url")} for data in data_list])
             conn.commit()
+        self._bump_version()
 
     def update_accessory_template(self, accessory_id: int, data: Dict[str, Any]) -> None:
         data["accessory_id"] = accessory_id
@@ -295,12 +487,14 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
                 WHERE accessory_id = :accessory_id
             """, {**data, "icon_url": data.get("icon_url")})
             conn.commit()
+        self.invalidate("accessory", accessory_id)
 
     def delete_accessory_template(self, accessory_id: int) -> None:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM accessories WHERE accessory_id = ?", (accessory_id,))
             conn.commit()
+        self.invalidate("accessory", accessory_id)
 
     def add_title_template(self, data: Dict[str, Any]) -> None:
         with self._get_connection() as conn:
@@ -310,3 +504,4 @@ class SqliteItemTemplateRepository(AbstractItemTemplateRepository):
                 VALUES (:title_id, :name, :description, :display_format)
             """, data)
             conn.commit()
+        self._bump_version()
@@ -3,6 +3,7 @@ import threading
 from typing import Optional, List, Dict
 from datetime import date, datetime, timedelta, timezone
 # 导入抽象基类和领域模型
+from ..database.connection import apply_pragmas, get_transaction_connection
 from .abstract_repository import AbstractLogRepository
 from ..domain.models import FishingRecord, GachaRecord, WipeBombLog, TaxRecord
 
@@ -17,11 +18,16 @@ class SqliteLogRepository(AbstractLogRepository):
 
     def _get_connection(self) -> sqlite3.Connection:
         """获取一个线程安全的数据库连接。"""
+        # 处于跨仓储事务中时复用事务连接
+        tx_conn = get_transaction_connection(self.db_path)
+        if tx_conn is not None:
+            return tx_conn
         conn = getattr(self._local, "connection", None)
         if conn is None:
-            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES, cached_statements=256)
             conn.row_factory = sqlite3.Row
             conn.execute("PRAGMA foreign_keys = ON;")
+            apply_pragmas(conn)
             self._local.connection = conn
         return conn
 
@@ -111,6 +117,25 @@ class SqliteLogRepository(AbstractLogRepository):
             ))
             conn.commit()
 
+    def add_gacha_records(self, records: List[GachaRecord]) -> None:
+        """用一条预编译语句通过 executemany 批量写入抽卡记录"""
+        if not records:
+            return
+        now = datetime.now(self.UTC8)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO gacha_records (
+                    user_id, gacha_pool_id, item_type, item_id,
+                    item_name, quantity, rarity, timestamp
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(
+                record.user_id, record.gacha_pool_id, record.item_type,
+                record.item_id, record.item_name, record.quantity,
+                record.rarity, record.timestamp or now
+            ) for record in records])
+            conn.commit()
+
     def get_gacha_records(self, user_id: str, limit: int) -> List[GachaRecord]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
@@ -4,9 +4,38 @@ from typing import Optional, List
 from datetime import datetime
 
 # 导入抽象基类和领域模型
+from ..database.connection import apply_pragmas, get_transaction_connection
 from .abstract_repository import AbstractMarketRepository
 from ..domain.models import MarketListing
 
+# 市场商品的连表查询，补全商品名称、描述与卖家昵称，各查询只在其后追加条件与排序
+_LISTING_SELECT = """
+    SELECT
+        m.market_id,
+        m.user_id,
+        u.nickname AS seller_nickname,
+        m.item_type,
+        m.item_id,
+        m.quantity,
+        m.price,
+        m.refine_level,
+        m.listed_at,
+        CASE
+            WHEN m.item_type = 'rod' THEN r.name
+            WHEN m.item_type = 'accessory' THEN a.name
+            ELSE '未知物品'
+        END AS item_name,
+        CASE
+            WHEN m.item_type = 'rod' THEN r.description
+            WHEN m.item_type = 'accessory' THEN a.description
+            ELSE ''
+        END AS item_description
+    FROM market m
+    JOIN users u ON m.user_id = u.user_id
+    LEFT JOIN rods r ON m.item_type = 'rod' AND m.item_id = r.rod_id
+    LEFT JOIN accessories a ON m.item_type = 'accessory' AND m.item_id = a.accessory_id
+"""
+
 class SqliteMarketRepository(AbstractMarketRepository):
     """市场仓储的SQLite实现"""
 
@@ -16,11 +45,16 @@ class SqliteMarketRepository(AbstractMarketRepository):
 
     def _get_connection(self) -> sqlite3.Connection:
         """获取一个线程安全的数据库连接。"""
+        # 处于跨仓储事务中时复用事务连接
+        tx_conn = get_transaction_connection(self.db_path)
+        if tx_conn is not None:
+            return tx_conn
         conn = getattr(self._local, "connection", None)
         if conn is None:
-            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES, cached_statements=256)
             conn.row_factory = sqlite3.Row
             conn.execute("PRAGMA foreign_keys = ON;")
+            apply_pragmas(conn)
             self._local.connection = conn
         return conn
 
@@ -36,34 +70,7 @@ class SqliteMarketRepository(AbstractMarketRepository):
         with self._get_connection() as conn:
             cursor = conn.cursor()
             #  采用连表查询补全其他字段
-            # cursor.execute("SELECT * FROM market WHERE market_id = ?", (market_id,))
-            cursor.execute("""
-                SELECT
-                    m.market_id,
-                    m.user_id,
-                    u.nickname AS seller_nickname,
-                    m.item_type,
-                    m.item_id,
-                    m.quantity,
-                    m.price,
-                    m.refine_level,
-                    m.listed_at,
-                    CASE
-                        WHEN m.item_type = 'rod' THEN r.name
-                        WHEN m.item_type = 'accessory' THEN a.name
-                        ELSE '未知物品'
-                        END AS item_name,
-                        CASE
-                        WHEN m.item_type = 'rod' THEN r.description
-                        WHEN m.item_type = 'accessory' THEN a.description
-                        ELSE ''
-                        END AS item_description
-                        FROM market m
-                    JOIN users u ON m.user_id = u.user_id
-                    LEFT JOIN rods r ON m.item_type = 'rod' AND m.item_id = r.rod_id
-                    LEFT JOIN accessories a ON m.item_type = 'accessory' AND m.item_id = a.accessory_id
-                    WHERE m.market_id = ?
-            """, (market_id,))
+            cursor.execute(_LISTING_SELECT + " WHERE m.market_id = ?", (market_id,))
 
             row = cursor.fetchone()
             return self._row_to_market_listing(row)
@@ -77,37 +84,25 @@ class SqliteMarketRepository(AbstractMarketRepository):
         with self._get_connection() as conn:
             cursor = conn.cursor()
             # 一个查询处理所有类型的物品
-            query = """
-                SELECT
-                    m.market_id,
-                    m.user_id,
-                    u.nickname AS seller_nickname,
-                    m.item_type,
-                    m.item_id,
-                    m.quantity,
-                    m.price,
-                    m.refine_level,
-                    m.listed_at,
-                    CASE
-                        WHEN m.item_type = 'rod' THEN r.name
-                        WHEN m.item_type = 'accessory' THEN a.name
-                        ELSE '未知物品'
-                    END AS item_name,
-                    CASE
-                        WHEN m.item_type = 'rod' THEN r.description
-                        WHEN m.item_type = 'accessory' THEN a.description
-                        ELSE ''
-                    END AS item_description
-                FROM market m
-                JOIN users u ON m.user_id = u.user_id
-                LEFT JOIN rods r ON m.item_type = 'rod' AND m.item_id = r.rod_id
-                LEFT JOIN accessories a ON m.item_type = 'accessory' AND m.item_id = a.accessory_id
-                ORDER BY m.listed_at DESC;
-            """
-            cursor.execute(query)
+            cursor.execute(_LISTING_SELECT + " ORDER BY m.listed_at DESC")
+            rows = cursor.fetchall()
+            return [self._row_to_market_listing(row) for row in rows]
+
+    def get_listings_by_seller(self, user_id: str) -> List[MarketListing]:
+        """获取某个用户上架的所有商品，过滤在SQL中完成（走 idx_market_user_listed 覆盖索引）"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_LISTING_SELECT + " WHERE m.user_id = ? ORDER BY m.listed_at DESC", (user_id,))
             rows = cursor.fetchall()
             return [self._row_to_market_listing(row) for row in rows]
 
+    def get_seller_ids(self) -> List[str]:
+        """获取当前在市场上有商品的所有用户ID"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT DISTINCT user_id FROM market")
+            return [row["user_id"] for row in cursor.fetchall()]
+
     def add_listing(self, listing: MarketListing) -> None:
         """添加一个市场商品"""
         with self._get_connection() as conn:
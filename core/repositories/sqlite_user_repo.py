@@ -4,6 +4,8 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 from ..domain.models import User, TaxRecord
+from ..utils import to_aware
+from ..database.connection import apply_pragmas, get_transaction_connection, transaction
 from .abstract_repository import AbstractUserRepository
 
 class SqliteUserRepository(AbstractUserRepository):
@@ -21,14 +23,24 @@ class SqliteUserRepository(AbstractUserRepository):
 
     def _get_connection(self) -> sqlite3.Connection:
         """获取一个线程安全的数据库连接。"""
+        # 处于跨仓储事务中时复用事务连接
+        tx_conn = get_transaction_connection(self.db_path)
+        if tx_conn is not None:
+            return tx_conn
         conn = getattr(self._local, "connection", None)
         if conn is None:
-            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+            conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                                   cached_statements=256)
             conn.row_factory = sqlite3.Row  # 返回字典形式的行
             conn.execute("PRAGMA foreign_keys = ON;")
+            apply_pragmas(conn)
             self._local.connection = conn
         return conn
 
+    def transaction(self):
+        """开启跨仓储事务，同一数据库上的所有仓储在块内共用一个连接。"""
+        return transaction(self.db_path)
+
     def _row_to_user(self, row: sqlite3.Row) -> Optional[User]:
         """将数据库行对象映射到User领域模型。"""
         if not row:
@@ -46,6 +58,11 @@ class SqliteUserRepository(AbstractUserRepository):
                     return datetime.strptime(dt_val, "%Y-%m-%d %H:%M:%S")
             return None
 
+        # 游戏逻辑使用的时间字段统一为带时区（UTC+8）的时间，调用方无需再处理时区差异
+        def parse_aware_datetime(dt_val):
+            dt = parse_datetime(dt_val)
+            return to_aware(dt) if dt is not None else None
+
         return User(
             user_id=row["user_id"],
             nickname=row["nickname"],
@@ -61,12 +78,12 @@ class SqliteUserRepository(AbstractUserRepository):
             equipped_accessory_instance_id=row["equipped_accessory_instance_id"],
             current_title_id=row["current_title_id"],
             current_bait_id=row["current_bait_id"],
-            bait_start_time=parse_datetime(row["bait_start_time"]),
+            bait_start_time=parse_aware_datetime(row["bait_start_time"]),
             auto_fishing_enabled=bool(row["auto_fishing_enabled"]),
-            last_fishing_time=parse_datetime(row["last_fishing_time"]),
-            last_wipe_bomb_time=parse_datetime(row["last_wipe_bomb_time"]),
-            last_steal_time=parse_datetime(row["last_steal_time"]),
-            last_login_time=parse_datetime(row["last_login_time"]),
+            last_fishing_time=parse_aware_datetime(row["last_fishing_time"]),
+            last_wipe_bomb_time=parse_aware_datetime(row["last_wipe_bomb_time"]),
+            last_steal_time=parse_aware_datetime(row["last_steal_time"]),
+            last_login_time=parse_aware_datetime(row["last_login_time"]),
             fishing_zone_id=row["fishing_zone_id"],
         )
 
@@ -119,6 +136,22 @@ class SqliteUserRepository(AbstractUserRepository):
             ))
             conn.commit()
 
+    def adjust_coins(self, user_id: str, delta: int) -> Optional[int]:
+        """在一条语句中原子地增减金币且不会扣成负数，返回调整后的金币数；用户不存在或金币不足时返回 None"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE users SET coins = coins + ? WHERE user_id = ? AND coins + ? >= 0",
+                (delta, user_id, delta)
+            )
+            if cursor.rowcount == 0:
+                return None
+            # 同一事务内读取，期间不会有其他写入
+            cursor.execute("SELECT coins FROM users WHERE user_id = ?", (user_id,))
+            coins = cursor.fetchone()[0]
+            conn.commit()
+            return coins
+
     def get_all_user_ids(self, auto_fishing_only: bool = False) -> List[str]:
         query = "SELECT user_id FROM users"
         params = []
@@ -133,12 +166,14 @@ class SqliteUserRepository(AbstractUserRepository):
 
     def get_leaderboard_data(self, limit: int) -> List[Dict[str, Any]]:
         # 此方法返回一个DTO（数据传输对象），而不是领域模型，因为它需要多表连接
+        # 未装备的称号/鱼竿/饰品直接在查询中替换为展示用的默认文字
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT
                     u.user_id, u.nickname, u.coins, u.total_fishing_count as fish_count,
-                    t.name as title, r.name as fishing_rod, a.name as accessory
+                    COALESCE(t.name, '无称号') as title, COALESCE(r.name, '无鱼竿') as fishing_rod,
+                    COALESCE(a.name, '无饰品') as accessory
                 FROM users u
                 LEFT JOIN titles t ON u.current_title_id = t.title_id
                 LEFT JOIN user_rods ur ON u.equipped_rod_instance_id = ur.rod_instance_id
@@ -0,0 +1,51 @@
+import random
+from typing import List, Sequence
+
+
+class AliasTable:
+    """Vose 别名表：O(n) 构建，之后每次加权抽样只需 O(1)。"""
+
+    __slots__ = ("prob", "alias", "n")
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = sum(weights)
+        # 缩放后每个槽位的平均概率为 1
+        scaled = [w * n / total for w in weights]
+        self.prob: List[float] = [0.0] * n
+        self.alias: List[int] = [0] * n
+        self.n = n
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        # 剩余槽位（含浮点误差残留）概率为 1
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def sample(self) -> int:
+        # 一个均匀随机数同时给出槽位（整数部分）和槽内判定值（小数部分）
+        x = random.random() * self.n
+        i = int(x)
+        return i if x - i < self.prob[i] else self.alias[i]
+
+    def sample_many(self, k: int) -> List[int]:
+        """一次性生成 k 个样本下标，每个样本只消耗一次 random() 调用。"""
+        n, prob, alias = self.n, self.prob, self.alias
+        rand = random.random
+        picked = []
+        append = picked.append
+        for _ in range(k):
+            x = rand() * n
+            i = int(x)
+            append(i if x - i < prob[i] else alias[i])
+        return picked
@@ -34,6 +34,8 @@ class FishingService:
         self.config = config
 
         self.today = get_today()
+        # 每个用户最近一次钓鱼的单调时钟时间戳，用于免查库、免时区换算的冷却判断
+        self._last_fish_monotonic: Dict[str, float] = {}
         # 自动钓鱼线程相关属性
         self.auto_fishing_thread: Optional[threading.Thread] = None
         self.auto_fishing_running = False
@@ -60,6 +62,13 @@ class FishingService:
         else:
             return {"success": True, "message": "🚫 自动钓鱼已关闭！"}
 
+    def seconds_since_last_fish(self, user_id: str) -> Optional[float]:
+        """返回距离用户上次钓鱼经过的秒数；本进程内还没有该用户的钓鱼记录时返回 None。"""
+        last = self._last_fish_monotonic.get(user_id)
+        if last is None:
+            return None
+        return time.monotonic() - last
+
     def go_fish(self, user_id: str) -> Dict[str, Any]:
         """
         执行一次完整的钓鱼动作。
@@ -89,8 +98,9 @@ class FishingService:
         rare_chance = 0.0 # 稀有鱼出现几率
         coins_chance = 0.0 # 增加同稀有度高金币出现几率
         logger.debug(f"当前钓鱼概率： base_success_rate={base_success_rate}, quality_modifier={quality_modifier}, quantity_modifier={quantity_modifier}, rare_chance={rare_chance}, coins_chance={coins_chance}")
-        # 获取装备鱼竿并应用加成
-        equipped_rod_instance = self.inventory_repo.get_user_equipped_rod(user.user_id)
+        # 一次性获取装备的鱼竿和饰品
+        equipped_rod_instance, equipped_accessory_instance = self.inventory_repo.get_equipment(user.user_id)
+        # 应用装备鱼竿加成
         if equipped_rod_instance:
             rod_template = self.item_template_repo.get_rod_by_id(equipped_rod_instance.rod_id)
             if rod_template:
@@ -98,8 +108,7 @@ class FishingService:
                 quantity_modifier *= calculate_after_refine(rod_template.bonus_fish_quantity_modifier, refine_level= equipped_rod_instance.refine_level)
                 rare_chance += calculate_after_refine(rod_template.bonus_rare_fish_chance, refine_level= equipped_rod_instance.refine_level)
         logger.debug(f"装备鱼竿加成后： quality_modifier={quality_modifier}, quantity_modifier={quantity_modifier}, rare_chance={rare_chance}")
-        # 获取装备饰品并应用加成
-        equipped_accessory_instance = self.inventory_repo.get_user_equipped_accessory(user.user_id)
+        # 应用装备饰品加成
         if equipped_accessory_instance:
             acc_template = self.item_template_repo.get_accessory_by_id(equipped_accessory_instance.accessory_id)
             if acc_template:
@@ -121,14 +130,8 @@ class FishingService:
                     # 有时效鱼饵：检查是否过期
                     bait_expiry_time = user.bait_start_time
                     if bait_expiry_time:
-                        now = get_now()
                         expiry_time = bait_expiry_time + timedelta(minutes=bait_template.duration_minutes)
-                        # 移除两个时间的时区信息
-                        if now.tzinfo is not None:
-                            now = now.replace(tzinfo=None)
-                        if expiry_time.tzinfo is not None:
-                            expiry_time = expiry_time.replace(tzinfo=None)
-                        if now > expiry_time:
+                        if get_now() > expiry_time:
                             # 鱼饵已过期，清除当前鱼饵并消耗一个
                             user.current_bait_id = None
                             user.bait_start_time = None
@@ -185,6 +188,7 @@ class FishingService:
             # 失败逻辑
             user.last_fishing_time = get_now()
             self.user_repo.update(user)
+            self._last_fish_monotonic[user.user_id] = time.monotonic()
             return {"success": False, "message": "💨 什么都没钓到..."}
 
         # 4. 成功，生成渔获
@@ -252,9 +256,10 @@ class FishingService:
         value = fish_template.base_value
 
         # 计算一下是否超过用户鱼塘容量
-        user_fish_inventory = self.inventory_repo.get_fish_inventory(user.user_id)
-        if user.fish_pond_capacity == sum(item.quantity for item in user_fish_inventory):
-            # 随机删除用户的一条鱼
+        current_fish_count, _ = self.inventory_repo.get_fish_inventory_stats(user.user_id)
+        if user.fish_pond_capacity == current_fish_count:
+            # 鱼塘已满时才取出库存明细，随机删除用户的一条鱼
+            user_fish_inventory = self.inventory_repo.get_fish_inventory(user.user_id)
             random_fish = random.choice(user_fish_inventory)
             self.inventory_repo.update_fish_quantity(
                 user.user_id,
@@ -286,6 +291,7 @@ class FishingService:
         user.total_coins_earned += value
         user.last_fishing_time = get_now()
         self.user_repo.update(user)
+        self._last_fish_monotonic[user.user_id] = time.monotonic()
 
         # 判断用户的鱼竿和饰品是否真实存在
         if user.equipped_rod_instance_id:
@@ -1,6 +1,7 @@
 import random
-from typing import Dict, Any, List, Tuple
-from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+from collections import Counter, defaultdict
+from dataclasses import dataclass
 
 from astrbot.core.utils.pip_installer import logger
 # 导入仓储接口和领域模型
@@ -12,21 +13,72 @@ from ..repositories.abstract_repository import (
     AbstractLogRepository,
     AbstractAchievementRepository
 )
-from ..domain.models import GachaPool, GachaPoolItem, GachaRecord
+from ..domain.models import GachaPool, GachaPoolItem, GachaRecord, User
 from ..utils import get_now
 
+# 奖励条目的整数类型标签（DrawReward.t），展示时按整数比较分派
+REWARD_ITEM = 0    # 鱼竿、饰品、鱼饵
+REWARD_COINS = 1   # 金币
+REWARD_TITLE = 2   # 称号
+
+# 达到该稀有度的保留奖励会额外单独列出，展示层无需遍历全部奖励
+_RARE_RARITY = 4
+
+
+@dataclass(slots=True)
+class _VirtualItem:
+    """聚合后的奖励（鱼饵、金币、称号），仅用于生成抽奖日志"""
+    gacha_pool_id: int
+    item_type: str
+    item_id: int
+    quantity: int
+
+
+@dataclass(slots=True, frozen=True)
+class DrawReward:
+    """
+    抽卡结果中的一条保留奖励或直接获得的金币。
+    不可变，同一鱼竿/饰品被抽中多次时各条结果共用同一个对象。
+    """
+    t: int           # 整数类型标签 REWARD_*
+    type: str        # "rod" / "accessory" / "bait" / "coins" / "title"
+    item_id: int
+    name: str
+    rarity: int = 1  # 称号与金币没有稀有度，展示时按一星计
+    quantity: int = 1
+
 
 def _perform_single_weighted_draw(pool: GachaPool) -> GachaPoolItem:
     """执行一次加权随机抽奖。"""
-    total_weight = sum(item.weight for item in pool.items)
-    rand_val = random.uniform(0, total_weight)
-
-    current_weight = 0
-    for item in pool.items:
-        current_weight += item.weight
-        if rand_val <= current_weight:
-            return item
-    return None # 理论上不会发生
+    if not pool.items:
+        return None
+    if pool.total_weight <= 0:
+        return pool.items[0]
+    if pool.is_alias_table_built():
+        return pool.items[pool.alias_table.sample()]
+    # 累积权重缓存在奖池上，random.choices 在C层完成二分查找
+    return random.choices(pool.items, cum_weights=pool.cum_weights)[0]
+
+
+def _perform_weighted_draw_counts(pool: GachaPool, num_draws: int) -> List[Tuple[GachaPoolItem, int]]:
+    """
+    批量执行 num_draws 次加权随机抽奖，结果按奖品聚合为 [(奖品, 抽中次数), ...]，按奖池顺序排列。
+    抽奖结果只用于按奖品汇总，后续处理只需遍历抽中过的 K 种奖品，而不是全部 N 次抽奖。
+    别名表已缓存、或抽奖次数足以摊薄 O(n) 建表成本时使用别名表，
+    否则用累积权重 + random.choices（O(log n) 二分查找）直接抽取。
+    """
+    if not pool.items or num_draws <= 0:
+        return []
+    if pool.total_weight <= 0:
+        return [(pool.items[0], num_draws)]
+    items = pool.items
+    if num_draws >= len(items) or pool.is_alias_table_built():
+        picked = pool.alias_table.sample_many(num_draws)
+    else:
+        picked = random.choices(range(len(items)), cum_weights=pool.cum_weights, k=num_draws)
+    # Counter 在C层完成计数
+    counts = Counter(picked)
+    return [(items[index], counts[index]) for index in sorted(counts)]
 
 
 class GachaService:
@@ -59,37 +111,48 @@ class GachaService:
         except Exception as e:
             return {"success": False, "message": f"获取卡池信息失败: {str(e)}"}
 
+    def get_pool(self, pool_id: int) -> Optional[GachaPool]:
+        """
+        获取卡池及其奖品。仓储层按卡池 ID 缓存（后台修改卡池时失效），
+        命令层确认费用时取到的卡池与随后 perform_draw 使用的是同一个对象，不会重复查询数据库。
+        """
+        return self.gacha_repo.get_pool_by_id(pool_id)
+
     def get_pool_details(self, pool_id: int) -> Dict[str, Any]:
         """获取单个卡池的详细信息，包括奖品列表和概率。"""
-        pool = self.gacha_repo.get_pool_by_id(pool_id)
+        pool = self.get_pool(pool_id)
         if not pool:
             return {"success": False, "message": "该卡池不存在"}
 
-        total_weight = sum(item.weight for item in pool.items)
+        total_weight = pool.total_weight
         if total_weight == 0:
             return {"success": True, "pool": pool, "probabilities": {}}
 
+        # 每种物品类型只查询一次模板
+        templates = self._get_templates_for_items(pool.items)
+
         probabilities = []
         for item in pool.items:
             probability = float(item.weight / total_weight)
             item_name = "未知物品"
             item_rarity = 1
             if item.item_type == "rod":
-                rod = self.item_template_repo.get_rod_by_id(item.item_id)
+                rod = templates["rod"].get(item.item_id)
                 item_name = rod.name if rod else "未知鱼竿"
                 item_rarity = rod.rarity if rod else 1
             elif item.item_type == "accessory":
-                accessory = self.item_template_repo.get_accessory_by_id(item.item_id)
+                accessory = templates["accessory"].get(item.item_id)
                 item_name = accessory.name if accessory else "未知饰品"
                 item_rarity = accessory.rarity if accessory else 1
             elif item.item_type == "bait":
-                bait = self.item_template_repo.get_bait_by_id(item.item_id)
+                bait = templates["bait"].get(item.item_id)
                 item_name = bait.name if bait else "未知鱼饵"
                 item_rarity = bait.rarity if bait else 1
             elif item.item_type == "coins":
                 item_name = f"{item.quantity} 金币"
             elif item.item_type == "titles":
-                item_name = self.item_template_repo.get_title_by_id(item.item_id).name
+                title = templates["titles"].get(item.item_id)
+                item_name = title.name if title else "未知称号"
 
             probabilities.append({
                 "item_type": item.item_type,
@@ -112,13 +175,47 @@ class GachaService:
             num_draws: 抽卡次数
 
         Returns:
-            一个包含成功状态和抽卡结果的字典。
+            一个包含成功状态和抽卡结果的字典。成功时 results 只含保留的奖励和直接获得的金币，
+            自动卖出的物品汇总在 sold_summary 中（没有卖出时为 None）；
+            另外给出保留奖励按稀有度的件数 kept_rarity_counts、四星及以上保留奖励的
+            (稀有度, 名称) 列表 rare_rewards 和直接获得的金币数 coins_quantity。
         """
+        # 扣费、发放奖励与写日志在同一个事务中完成，任一步失败都会整体回滚
+        with self.user_repo.transaction():
+            return self._perform_draw(user_id, pool_id, num_draws, skip_cost)
+
+    def perform_single_draw(self, user_id: str, pool_id: int) -> Dict[str, Any]:
+        """
+        单抽：单次抽奖不会自动卖出，结果直接给出抽中的那一件奖励。
+
+        Returns:
+            成功时为 {"success": True, "item": 奖励或 None（奖品模板缺失时）}
+        """
+        result = self.perform_draw(user_id, pool_id, num_draws=1)
+        if not result["success"]:
+            return result
+        results = result["results"]
+        return {"success": True, "item": results[0] if results else None}
+
+    def perform_ten_draw(self, user_id: str, pool_id: int) -> Dict[str, Any]:
+        """
+        十连：结果已按保留与卖出分好，调用方无需再逐条区分奖励类型。
+
+        Returns:
+            成功时为 {"success": True, "kept": 保留的奖励列表, "sold_summary": 自动卖出汇总或 None}
+        """
+        result = self.perform_draw(user_id, pool_id, num_draws=10)
+        if not result["success"]:
+            return result
+        return {"success": True, "kept": result["results"], "sold_summary": result["sold_summary"]}
+
+    def _perform_draw(self, user_id: str, pool_id: int, num_draws: int, skip_cost: bool) -> Dict[str, Any]:
+        """perform_draw 的事务内实现"""
         user = self.user_repo.get_by_id(user_id)
         if not user:
             return {"success": False, "message": "用户不存在"}
 
-        pool = self.gacha_repo.get_pool_by_id(pool_id)
+        pool = self.get_pool(pool_id)
         if not pool or not pool.items:
             return {"success": False, "message": "卡池不存在或卡池为空"}
 
@@ -126,26 +223,24 @@ class GachaService:
             total_cost = pool.cost_coins * num_draws
             if not user.can_afford(total_cost):
                 return {"success": False, "message": f"金币不足，需要 {total_cost} 金币"}
-            # 2. 扣除费用
+            # 2. 扣除费用（仅修改内存对象，发放奖励后统一写回）
             user.coins -= total_cost
-            self.user_repo.update(user)
 
-        # 1. 执行抽卡 - 在内存中收集所有结果
-        draw_results = []
-        for _ in range(num_draws):
-            drawn_item = _perform_single_weighted_draw(pool)
-            if drawn_item:
-                draw_results.append(drawn_item)
+        # 1. 执行抽卡 - 在内存中按奖品汇总抽中次数
+        draw_counts = _perform_weighted_draw_counts(pool, num_draws)
 
-        if not draw_results:
+        if not draw_counts:
             return {"success": False, "message": "抽卡失败，请检查卡池配置"}
 
         # 3. 内存聚合 + 批量发放奖励
         # 十连以上启用自动卖出四星以下物品
         auto_sell_enabled = num_draws >= 10
-        granted_rewards = self._grant_rewards_batch(user_id, draw_results, auto_sell_enabled)
-        
-        return {"success": True, "results": granted_rewards}
+        draw_result = self._grant_rewards_batch(user, draw_counts, num_draws, auto_sell_enabled)
+
+        # 扣费与金币奖励合并为一次用户更新
+        self.user_repo.update(user)
+
+        return {"success": True, **draw_result}
 
     def _calculate_sell_price(self, item_type: str, item_rarity: int) -> int:
         """
@@ -175,19 +270,24 @@ class GachaService:
             
         return base_price
 
-    def _grant_rewards_batch(self, user_id: str, draw_results: List[GachaPoolItem], auto_sell_low_rarity: bool = False) -> List[Dict[str, Any]]:
+    def _grant_rewards_batch(self, user: User, draw_counts: List[Tuple[GachaPoolItem, int]], num_draws: int,
+                             auto_sell_low_rarity: bool = False) -> Dict[str, Any]:
         """
         批量发放奖励，使用内存聚合 + 数据库批量插入优化性能。
         支持自动卖出四星以下物品功能。
         
         Args:
-            user_id: 用户ID
-            draw_results: 抽奖结果列表
+            user: 已加载的用户对象，获得的金币直接累加到该对象上，由调用方负责写回
+            draw_counts: 按奖品汇总的抽奖结果 [(奖品, 抽中次数), ...]
+            num_draws: 抽奖总次数
             auto_sell_low_rarity: 是否自动卖出四星以下物品
             
         Returns:
-            用户可见的奖励列表
+            抽卡结果字典，键为 results、sold_summary、kept_rarity_counts、rare_rewards、coins_quantity，
+            含义见 perform_draw
         """
+        user_id = user.user_id
+
         # 内存聚合数据结构
         aggregated_rewards = {
             "rods": [],           # 鱼竿列表
@@ -207,10 +307,24 @@ class GachaService:
         # 日志记录数据
         log_records = []
         granted_rewards = []
+        sold_summary = None
+        # 保留奖励（不含金币）按稀有度的件数，与展示结果中的保留条目一一对应
+        kept_rarity_counts: Counter = Counter()
+        # 四星及以上的保留奖励 (稀有度, 名称)，顺序与展示结果一致
+        rare_rewards: List[Tuple[int, str]] = []
+        coins_quantity = 0
+        # 聚合出的奖励（鱼饵、金币、称号）记录到本次抽奖所在的卡池
+        pool_id = draw_counts[0][0].gacha_pool_id
+        # 同一次抽奖的所有日志共用一个时间戳
+        now = get_now()
+
+        # 每种物品类型只查询一次模板，后续聚合与发放均从字典中读取
+        templates = self._get_templates_for_items([item for item, _ in draw_counts])
         
-        # 1. 内存聚合阶段 - 处理自动卖出逻辑
-        for item in draw_results:
-            item_rarity = self._get_item_rarity(item)
+        # 1. 内存聚合阶段 - 处理自动卖出逻辑，每种奖品只处理一次
+        for item, count in draw_counts:
+            item_rarity = self._get_item_rarity(item, templates)
+            total_quantity = item.quantity * count
             
             # 十连以上且四星以下物品自动卖出（金币和称号除外）
             if (auto_sell_low_rarity and 
@@ -219,218 +333,192 @@ class GachaService:
                 
                 # 计算卖出价格
                 sell_price = self._calculate_sell_price(item.item_type, item_rarity)
-                sell_coins = sell_price * item.quantity
+                sell_coins = sell_price * total_quantity
                 
                 # 累加到金币
                 aggregated_rewards["coins"] += sell_coins
                 
                 # 统计信息
-                auto_sell_stats["sold_items_count"] += item.quantity
+                auto_sell_stats["sold_items_count"] += total_quantity
                 auto_sell_stats["sold_coins_total"] += sell_coins
-                auto_sell_stats["sold_by_rarity"][item_rarity] += item.quantity
+                auto_sell_stats["sold_by_rarity"][item_rarity] += total_quantity
                 
-                # 添加到显示结果（标记为已卖出）
-                item_name = self._get_item_name(item)
-                granted_rewards.append({
-                    "type": f"sold_{item.item_type}",
-                    "name": f"{item_name}（已卖出）",
-                    "rarity": item_rarity,
-                    "quantity": item.quantity,
-                    "sell_price": sell_coins
-                })
-                
-                # 不记录到抽奖日志中，因为直接卖出了
+                # 卖出的物品只计入汇总，不添加到显示结果，也不记录到抽奖日志中
                 continue
             
-            # 正常处理逻辑
+            # 正常处理逻辑：按类型聚合；鱼竿和饰品每抽中一次对应一个实例
             if item.item_type == "rod":
-                aggregated_rewards["rods"].append(item)
+                aggregated_rewards["rods"].extend([item] * count)
+                if item.item_id in templates["rod"]:
+                    kept_rarity_counts[item_rarity] += count
             elif item.item_type == "accessory":
-                aggregated_rewards["accessories"].append(item)
+                aggregated_rewards["accessories"].extend([item] * count)
+                if item.item_id in templates["accessory"]:
+                    kept_rarity_counts[item_rarity] += count
             elif item.item_type == "bait":
-                aggregated_rewards["baits"][item.item_id] += item.quantity
+                aggregated_rewards["baits"][item.item_id] += total_quantity
             elif item.item_type == "coins":
-                aggregated_rewards["coins"] += item.quantity
+                aggregated_rewards["coins"] += total_quantity
             elif item.item_type == "titles":
                 aggregated_rewards["titles"].add(item.item_id)
 
         # 2. 批量数据库操作阶段（与原代码相同）
         try:
-            db_operations_count = 0
-            
             # 批量添加鱼竿
             if aggregated_rewards["rods"]:
                 rod_data_list = []
                 rod_templates = {}
+                rod_rewards = {}  # 每种鱼竿只创建一个展示结果对象
                 
                 for rod_item in aggregated_rewards["rods"]:
-                    rod_template = self.item_template_repo.get_rod_by_id(rod_item.item_id)
+                    rod_template = templates["rod"].get(rod_item.item_id)
                     if rod_template:
-                        rod_templates[rod_item.item_id] = rod_template
+                        if rod_item.item_id not in rod_templates:
+                            rod_templates[rod_item.item_id] = rod_template
+                            rod_rewards[rod_item.item_id] = DrawReward(
+                                REWARD_ITEM, "rod", rod_item.item_id, rod_template.name, rod_template.rarity)
                         rod_data_list.append((rod_item.item_id, rod_template.durability))
                 
                 if rod_data_list:
                     inserted_ids = self.inventory_repo.batch_add_rod_instances(user_id, rod_data_list)
-                    db_operations_count += 1
                     
                     for rod_item in aggregated_rewards["rods"]:
                         if rod_item.item_id in rod_templates:
                             rod_template = rod_templates[rod_item.item_id]
-                            granted_rewards.append({
-                                "type": "rod",
-                                "id": rod_item.item_id,
-                                "name": rod_template.name,
-                                "rarity": rod_template.rarity
-                            })
-                            self._create_log_record(log_records, user_id, rod_item, rod_template.name, rod_template.rarity)
+                            granted_rewards.append(rod_rewards[rod_item.item_id])
+                            if rod_template.rarity >= _RARE_RARITY:
+                                rare_rewards.append((rod_template.rarity, rod_template.name))
+                            self._create_log_record(log_records, user_id, rod_item, rod_template.name, rod_template.rarity, now)
 
             # 批量添加饰品
             if aggregated_rewards["accessories"]:
                 accessory_ids = []
                 accessory_templates = {}
+                accessory_rewards = {}  # 每种饰品只创建一个展示结果对象
                 
                 for accessory_item in aggregated_rewards["accessories"]:
-                    accessory_template = self.item_template_repo.get_accessory_by_id(accessory_item.item_id)
+                    accessory_template = templates["accessory"].get(accessory_item.item_id)
                     if accessory_template:
-                        accessory_templates[accessory_item.item_id] = accessory_template
+                        if accessory_item.item_id not in accessory_templates:
+                            accessory_templates[accessory_item.item_id] = accessory_template
+                            accessory_rewards[accessory_item.item_id] = DrawReward(
+                                REWARD_ITEM, "accessory", accessory_item.item_id,
+                                accessory_template.name, accessory_template.rarity)
                         accessory_ids.append(accessory_item.item_id)
                 
                 if accessory_ids:
                     inserted_ids = self.inventory_repo.batch_add_accessory_instances(user_id, accessory_ids)
-                    db_operations_count += 1
                     
                     for accessory_item in aggregated_rewards["accessories"]:
                         if accessory_item.item_id in accessory_templates:
                             accessory_template = accessory_templates[accessory_item.item_id]
-                            granted_rewards.append({
-                                "type": "accessory",
-                                "id": accessory_item.item_id,
-                                "name": accessory_template.name,
-                                "rarity": accessory_template.rarity
-                            })
-                            self._create_log_record(log_records, user_id, accessory_item, accessory_template.name, accessory_template.rarity)
-
-            # 批量更新鱼饵数量
+                            granted_rewards.append(accessory_rewards[accessory_item.item_id])
+                            if accessory_template.rarity >= _RARE_RARITY:
+                                rare_rewards.append((accessory_template.rarity, accessory_template.name))
+                            self._create_log_record(log_records, user_id, accessory_item, accessory_template.name, accessory_template.rarity, now)
+
+            # 批量更新鱼饵数量：一次遍历同时收集更新参数、展示结果和日志
             if aggregated_rewards["baits"]:
-                if hasattr(self.inventory_repo, 'batch_update_bait_quantities'):
-                    bait_updates = [(bait_id, quantity) for bait_id, quantity in aggregated_rewards["baits"].items()]
-                    self.inventory_repo.batch_update_bait_quantities(user_id, bait_updates)
-                    db_operations_count += 1
-                else:
-                    for bait_id, total_quantity in aggregated_rewards["baits"].items():
-                        if total_quantity > 0:
-                            self.inventory_repo.update_bait_quantity(user_id, bait_id, total_quantity)
-                            db_operations_count += 1
-                
+                bait_updates = []
                 for bait_id, total_quantity in aggregated_rewards["baits"].items():
-                    bait_template = self.item_template_repo.get_bait_by_id(bait_id)
+                    bait_updates.append((bait_id, total_quantity))
+                    bait_template = templates["bait"].get(bait_id)
                     if bait_template and total_quantity > 0:
-                        granted_rewards.append({
-                            "type": "bait",
-                            "id": bait_id,
-                            "name": bait_template.name,
-                            "rarity": bait_template.rarity,
-                            "quantity": total_quantity
-                        })
-                        virtual_item = type('obj', (object,), {
-                            'gacha_pool_id': 0, 
-                            'item_type': 'bait', 
-                            'item_id': bait_id, 
-                            'quantity': total_quantity
-                        })
-                        self._create_log_record(log_records, user_id, virtual_item, bait_template.name, bait_template.rarity)
-
-            # 批量更新用户金币
+                        kept_rarity_counts[bait_template.rarity] += 1
+                        granted_rewards.append(DrawReward(
+                            REWARD_ITEM, "bait", bait_id, bait_template.name, bait_template.rarity, total_quantity))
+                        if bait_template.rarity >= _RARE_RARITY:
+                            rare_rewards.append((bait_template.rarity, bait_template.name))
+                        virtual_item = _VirtualItem(pool_id, 'bait', bait_id, total_quantity)
+                        self._create_log_record(log_records, user_id, virtual_item, bait_template.name, bait_template.rarity, now)
+
+                self.inventory_repo.batch_update_bait_quantities(user_id, bait_updates)
+
+            # 累加用户金币，由调用方统一写回
             if aggregated_rewards["coins"] > 0:
-                user = self.user_repo.get_by_id(user_id)
                 user.coins += aggregated_rewards["coins"]
-                self.user_repo.update(user)
-                db_operations_count += 1
                 
                 # 分别显示正常获得的金币和卖出获得的金币
                 if auto_sell_low_rarity and auto_sell_stats["sold_coins_total"] > 0:
                     normal_coins = aggregated_rewards["coins"] - auto_sell_stats["sold_coins_total"]
                     if normal_coins > 0:
-                        granted_rewards.append({
-                            "type": "coins",
-                            "quantity": normal_coins
-                        })
+                        coins_quantity = normal_coins
+                        granted_rewards.append(DrawReward(
+                            REWARD_COINS, "coins", 0, f"{normal_coins} 金币", quantity=normal_coins))
                         # 记录正常金币的日志
-                        virtual_item = type('obj', (object,), {
-                            'gacha_pool_id': 0,
-                            'item_type': 'coins',
-                            'item_id': 0,
-                            'quantity': normal_coins
-                        })
-                        self._create_log_record(log_records, user_id, virtual_item, f"{normal_coins} 金币", 1)
+                        virtual_item = _VirtualItem(pool_id, 'coins', 0, normal_coins)
+                        self._create_log_record(log_records, user_id, virtual_item, f"{normal_coins} 金币", 1, now)
                     
-                    # 添加卖出金币的汇总信息
-                    granted_rewards.append({
-                        "type": "sold_coins_summary",
+                    # 卖出金币的汇总信息单独返回
+                    sold_summary = {
                         "quantity": auto_sell_stats["sold_coins_total"],
                         "sold_items_count": auto_sell_stats["sold_items_count"],
                         "sold_by_rarity": auto_sell_stats["sold_by_rarity"]
-                    })
+                    }
                 else:
-                    granted_rewards.append({
-                        "type": "coins",
-                        "quantity": aggregated_rewards["coins"]
-                    })
-                    virtual_item = type('obj', (object,), {
-                        'gacha_pool_id': 0,
-                        'item_type': 'coins',
-                        'item_id': 0,
-                        'quantity': aggregated_rewards["coins"]
-                    })
-                    self._create_log_record(log_records, user_id, virtual_item, f"{aggregated_rewards['coins']} 金币", 1)
-
-            # 批量授予称号
+                    coins_quantity = aggregated_rewards["coins"]
+                    granted_rewards.append(DrawReward(
+                        REWARD_COINS, "coins", 0, f"{aggregated_rewards['coins']} 金币",
+                        quantity=aggregated_rewards["coins"]))
+                    virtual_item = _VirtualItem(pool_id, 'coins', 0, aggregated_rewards["coins"])
+                    self._create_log_record(log_records, user_id, virtual_item, f"{aggregated_rewards['coins']} 金币", 1, now)
+
+            # 批量授予称号：模板已批量获取，授予操作合并为一次调用
+            granted_title_ids = []
             for title_id in aggregated_rewards["titles"]:
-                title_template = self.item_template_repo.get_title_by_id(title_id)
+                title_template = templates["titles"].get(title_id)
                 if title_template:
-                    self.achievement_repo.grant_title_to_user(user_id, title_id)
-                    db_operations_count += 1
-                    
-                    granted_rewards.append({
-                        "type": "title",
-                        "id": title_id,
-                        "name": title_template.name
-                    })
-                    virtual_item = type('obj', (object,), {
-                        'gacha_pool_id': 0,
-                        'item_type': 'titles',
-                        'item_id': title_id,
-                        'quantity': 1
-                    })
-                    self._create_log_record(log_records, user_id, virtual_item, title_template.name, 0)
+                    granted_title_ids.append(title_id)
+                    kept_rarity_counts[1] += 1  # 称号条目不带稀有度，展示时按一星计
+                    granted_rewards.append(DrawReward(REWARD_TITLE, "title", title_id, title_template.name))
+                    virtual_item = _VirtualItem(pool_id, 'titles', title_id, 1)
+                    self._create_log_record(log_records, user_id, virtual_item, title_template.name, 0, now)
+            if granted_title_ids:
+                self.achievement_repo.grant_titles_to_user(user_id, granted_title_ids)
 
             # 3. 批量写入日志
             if log_records:
-                for log_record in log_records:
-                    self.log_repo.add_gacha_record(log_record)
-                db_operations_count += len(log_records)
+                self.log_repo.add_gacha_records(log_records)
 
-            logger.info(f"用户 {user_id} 完成 {len(draw_results)} 次抽奖")
+            # 使用惰性格式化，日志级别关闭时不会拼接字符串
+            logger.info("用户 %s 完成 %d 次抽奖", user_id, num_draws)
             if auto_sell_low_rarity and auto_sell_stats["sold_items_count"] > 0:
-                logger.info(f"自动卖出 {auto_sell_stats['sold_items_count']} 件低稀有度物品，获得 {auto_sell_stats['sold_coins_total']} 金币")
-            logger.info(f"批量插入优化: 实际执行 {db_operations_count} 次数据库操作")
+                logger.info("自动卖出 %d 件低稀有度物品，获得 %d 金币",
+                            auto_sell_stats["sold_items_count"], auto_sell_stats["sold_coins_total"])
             
         except Exception as e:
             logger.error(f"批量发放奖励失败: {e}", exc_info=True)
             raise e
             
-        return granted_rewards
+        return {
+            "results": granted_rewards,
+            "sold_summary": sold_summary,
+            "kept_rarity_counts": dict(kept_rarity_counts),
+            "rare_rewards": rare_rewards,
+            "coins_quantity": coins_quantity,
+        }
+
+    def _get_templates_for_items(self, items: List[GachaPoolItem]) -> Dict[str, Dict[int, Any]]:
+        """按物品类型分组收集ID，每种类型用一次批量查询获取全部模板"""
+        ids_by_type = defaultdict(set)
+        for item in items:
+            ids_by_type[item.item_type].add(item.item_id)
+
+        fetchers = {
+            "rod": self.item_template_repo.get_rods_by_ids,
+            "accessory": self.item_template_repo.get_accessories_by_ids,
+            "bait": self.item_template_repo.get_baits_by_ids,
+            "titles": self.item_template_repo.get_titles_by_ids,
+        }
+        return {
+            item_type: fetch(list(ids_by_type[item_type])) if ids_by_type.get(item_type) else {}
+            for item_type, fetch in fetchers.items()
+        }
 
-    def _get_item_rarity(self, item: GachaPoolItem) -> int:
+    def _get_item_rarity(self, item: GachaPoolItem, templates: Dict[str, Dict[int, Any]]) -> int:
         """获取物品稀有度"""
-        if item.item_type == "rod":
-            template = self.item_template_repo.get_rod_by_id(item.item_id)
-            return template.rarity if template else 1
-        elif item.item_type == "accessory":
-            template = self.item_template_repo.get_accessory_by_id(item.item_id)
-            return template.rarity if template else 1
-        elif item.item_type == "bait":
-            template = self.item_template_repo.get_bait_by_id(item.item_id)
+        if item.item_type in ("rod", "accessory", "bait"):
+            template = templates[item.item_type].get(item.item_id)
             return template.rarity if template else 1
         elif item.item_type == "coins":
             return 1  # 金币视为1星
@@ -438,26 +526,26 @@ class GachaService:
             return 5  # 称号视为5星，不会被卖出
         return 1
 
-    def _get_item_name(self, item: GachaPoolItem) -> str:
+    def _get_item_name(self, item: GachaPoolItem, templates: Dict[str, Dict[int, Any]]) -> str:
         """获取物品名称"""
         if item.item_type == "rod":
-            template = self.item_template_repo.get_rod_by_id(item.item_id)
+            template = templates["rod"].get(item.item_id)
             return template.name if template else "未知鱼竿"
         elif item.item_type == "accessory":
-            template = self.item_template_repo.get_accessory_by_id(item.item_id)
+            template = templates["accessory"].get(item.item_id)
             return template.name if template else "未知饰品"
         elif item.item_type == "bait":
-            template = self.item_template_repo.get_bait_by_id(item.item_id)
+            template = templates["bait"].get(item.item_id)
             return template.name if template else "未知鱼饵"
         elif item.item_type == "coins":
             return f"{item.quantity} 金币"
         elif item.item_type == "titles":
-            template = self.item_template_repo.get_title_by_id(item.item_id)
+            template = templates["titles"].get(item.item_id)
             return template.name if template else "未知称号"
         return "未知物品"
 
-    def _create_log_record(self, log_records: List[GachaRecord], user_id: str, item, item_name: str, item_rarity: int):
-        """创建日志记录"""
+    def _create_log_record(self, log_records: List[GachaRecord], user_id: str, item, item_name: str, item_rarity: int, timestamp=None):
+        """创建日志记录，timestamp 为空时取当前时间"""
         log_entry = GachaRecord(
             record_id=0,  # DB自增
             user_id=user_id,
@@ -467,20 +555,10 @@ class GachaService:
             item_name=item_name,
             quantity=item.quantity,
             rarity=item_rarity,
-            timestamp=get_now()
+            timestamp=timestamp or get_now()
         )
         log_records.append(log_entry)
 
-    def _estimate_traditional_db_operations(self, aggregated_rewards: Dict) -> int:
-        """估算传统方式需要的数据库操作次数（用于性能对比）"""
-        count = 0
-        count += len(aggregated_rewards["rods"])  # 鱼竿逐个插入
-        count += len(aggregated_rewards["accessories"])  # 饰品逐个插入
-        count += len(aggregated_rewards["baits"])  # 鱼饵逐个更新
-        count += 1 if aggregated_rewards["coins"] > 0 else 0  # 用户金币更新
-        count += len(aggregated_rewards["titles"])  # 称号逐个授予
-        return count
-
     def _grant_reward(self, user_id: str, item: GachaPoolItem):
         """
         传统的单个奖励发放方法，保留用于兼容性。
@@ -1,6 +1,6 @@
 import requests
 import random
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from concurrent.futures import ThreadPoolExecutor
 from astrbot.api import logger
 
@@ -32,13 +32,18 @@ class GameMechanicsService:
         self.config = config
         self.thread_pool = ThreadPoolExecutor(max_workers=5)
 
-    def perform_wipe_bomb(self, user_id: str, contribution_amount: int) -> Dict[str, Any]:
+    def perform_wipe_bomb(self, user_id: str, contribution_amount: int, mode: Optional[str] = None) -> Dict[str, Any]:
         """
         处理"擦弹"的完整逻辑。
+        mode 为 "allin"/"halfin" 时忽略 contribution_amount，按读取到的当前金币投入全部/一半。
         """
         user = self.user_repo.get_by_id(user_id)
         if not user:
             return {"success": False, "message": "用户不存在"}
+        if mode == "allin":
+            contribution_amount = user.coins
+        elif mode == "halfin":
+            contribution_amount = user.coins // 2
 
         # 1. 验证投入金额
         if contribution_amount <= 0:
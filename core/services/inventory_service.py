@@ -1,4 +1,3 @@
-from datetime import datetime
 from typing import Dict, Any
 
 # 导入仓储接口和领域模型
@@ -7,7 +6,7 @@ from ..repositories.abstract_repository import (
     AbstractUserRepository,
     AbstractItemTemplateRepository
 )
-from ..utils import calculate_after_refine
+from ..utils import calculate_after_refine, get_now
 
 class InventoryService:
     """封装与用户库存相关的业务逻辑"""
@@ -28,26 +27,16 @@ class InventoryService:
         """
         获取用户的鱼塘信息（鱼类库存）。
         """
-        inventory_items = self.inventory_repo.get_fish_inventory(user_id)
-        total_value = self.inventory_repo.get_fish_inventory_value(user_id)
-
-        # 为了丰富信息，可以从模板仓储获取鱼的详细信息
-        enriched_items = []
-        for item in inventory_items:
-            fish_template = self.item_template_repo.get_fish_by_id(item.fish_id)
-            if fish_template:
-                enriched_items.append({
-                    "name": fish_template.name,
-                    "rarity": fish_template.rarity,
-                    "base_value": fish_template.base_value,
-                    "quantity": item.quantity
-                })
+        # 鱼类模板信息在SQL中关联获取，结果已按稀有度降序排列
+        enriched_items = self.inventory_repo.get_fish_pond_details(user_id)
+        # 总数量与总价值直接由SQL聚合得到
+        total_count, total_value = self.inventory_repo.get_fish_inventory_stats(user_id)
 
         return {
             "success": True,
             "fishes": enriched_items,
             "stats": {
-                "total_count": sum(item["quantity"] for item in enriched_items),
+                "total_count": total_count,
                 "total_value": total_value
             }
         }
@@ -57,10 +46,12 @@ class InventoryService:
         获取用户的鱼竿库存。
         """
         rod_instances = self.inventory_repo.get_user_rod_instances(user_id)
+        # 一次性批量获取所有用到的鱼竿模板，避免逐个实例查询
+        rod_templates = self.item_template_repo.get_rods_by_ids([inst.rod_id for inst in rod_instances])
         enriched_rods = []
 
         for rod_instance in rod_instances:
-            rod_template = self.item_template_repo.get_rod_by_id(rod_instance.rod_id)
+            rod_template = rod_templates.get(rod_instance.rod_id)
             if rod_template:
                 enriched_rods.append({
                     "name": rod_template.name,
@@ -83,10 +74,12 @@ class InventoryService:
         获取用户的鱼饵库存。
         """
         bait_inventory = self.inventory_repo.get_user_bait_inventory(user_id)
+        # 一次性批量获取所有用到的鱼饵模板，避免逐个查询
+        bait_templates = self.item_template_repo.get_baits_by_ids(list(bait_inventory))
         enriched_baits = []
 
         for bait_id, quantity in bait_inventory.items():
-            bait_template = self.item_template_repo.get_bait_by_id(bait_id)
+            bait_template = bait_templates.get(bait_id)
             if bait_template:
                 enriched_baits.append({
                     "bait_id": bait_id,
@@ -107,10 +100,13 @@ class InventoryService:
         获取用户的饰品库存。
         """
         accessory_instances = self.inventory_repo.get_user_accessory_instances(user_id)
+        # 一次性批量获取所有用到的饰品模板，避免逐个实例查询
+        accessory_templates = self.item_template_repo.get_accessories_by_ids(
+            [inst.accessory_id for inst in accessory_instances])
         enriched_accessories = []
 
         for accessory_instance in accessory_instances:
-            accessory_template = self.item_template_repo.get_accessory_by_id(accessory_instance.accessory_id)
+            accessory_template = accessory_templates.get(accessory_instance.accessory_id)
             if accessory_template:
                 enriched_accessories.append({
                     "name": accessory_template.name,
@@ -200,8 +196,7 @@ class InventoryService:
             return {"success": False, "message": "用户不存在"}
 
         # 1. 验证鱼竿是否属于该用户
-        user_rods = self.inventory_repo.get_user_rod_instances(user_id)
-        rod_to_sell = next((r for r in user_rods if r.rod_instance_id == rod_instance_id), None)
+        rod_to_sell = self.inventory_repo.get_user_rod_instance_by_id(user_id, rod_instance_id)
 
         if not rod_to_sell:
             return {"success": False, "message": "鱼竿不存在或不属于你"}
@@ -266,8 +261,7 @@ class InventoryService:
             return {"success": False, "message": "用户不存在"}
 
         # 1. 验证饰品是否属于该用户
-        user_accessories = self.inventory_repo.get_user_accessory_instances(user_id)
-        accessory_to_sell = next((a for a in user_accessories if a.accessory_instance_id == accessory_instance_id), None)
+        accessory_to_sell = self.inventory_repo.get_user_accessory_instance_by_id(user_id, accessory_instance_id)
 
         if not accessory_to_sell:
             return {"success": False, "message": "饰品不存在或不属于你"}
@@ -335,24 +329,18 @@ class InventoryService:
         equip_item_id = None
         # 验证物品归属
         if item_type == "rod":
-            instances = self.inventory_repo.get_user_rod_instances(user_id)
-            for instance in instances:
-                if instance.rod_instance_id == instance_id:
-                    equip_item_id = instance.rod_id
-                    break
-            if instance_id not in [i.rod_instance_id for i in instances]:
+            instance = self.inventory_repo.get_user_rod_instance_by_id(user_id, instance_id)
+            if not instance:
                 return {"success": False, "message": "❌ 鱼竿不存在或不属于你"}
+            equip_item_id = instance.rod_id
             user.equipped_rod_instance_id = instance_id
             equip_item_name = self.item_template_repo.get_rod_by_id(equip_item_id).name
 
         elif item_type == "accessory":
-            instances = self.inventory_repo.get_user_accessory_instances(user_id)
-            for instance in instances:
-                if instance.accessory_instance_id == instance_id:
-                    equip_item_id = instance.accessory_id
-                    break
-            if instance_id not in [i.accessory_instance_id for i in instances]:
+            instance = self.inventory_repo.get_user_accessory_instance_by_id(user_id, instance_id)
+            if not instance:
                 return {"success": False, "message": "❌ 饰品不存在或不属于你"}
+            equip_item_id = instance.accessory_id
             user.equipped_accessory_instance_id = instance_id
             equip_item_name = self.item_template_repo.get_accessory_by_id(equip_item_id).name
         else:
@@ -388,7 +376,7 @@ class InventoryService:
 
         # 更新用户当前鱼饵状态
         user.current_bait_id = bait_id
-        user.bait_start_time = datetime.now()
+        user.bait_start_time = get_now()
 
         self.user_repo.update(user)
 
@@ -401,11 +389,11 @@ class InventoryService:
         user = self.user_repo.get_by_id(user_id)
         if not user:
             return {"success": False, "message": "用户不存在"}
-        fish_inventory = self.inventory_repo.get_fish_inventory(user_id)
+        current_fish_count, _ = self.inventory_repo.get_fish_inventory_stats(user_id)
         return {
             "success": True,
             "fish_pond_capacity": user.fish_pond_capacity,
-            "current_fish_count": sum(item.quantity for item in fish_inventory),
+            "current_fish_count": current_fish_count,
         }
 
     def upgrade_fish_pond(self, user_id: str) -> Dict[str, Any]:
@@ -499,8 +487,7 @@ class InventoryService:
     def _get_item_config(self, item_type, instance_id, user_id) -> Dict[str, Any]:
         """获取物品配置信息"""
         if item_type == "rod":
-            instances = self.inventory_repo.get_user_rod_instances(user_id)
-            instance = next((i for i in instances if i.rod_instance_id == instance_id), None)
+            instance = self.inventory_repo.get_user_rod_instance_by_id(user_id, instance_id)
             if not instance:
                 return {"success": False, "message": "鱼竿不存在或不属于你"}
 
@@ -517,8 +504,7 @@ class InventoryService:
             }
 
         else:  # accessory
-            instances = self.inventory_repo.get_user_accessory_instances(user_id)
-            instance = next((i for i in instances if i.accessory_instance_id == instance_id), None)
+            instance = self.inventory_repo.get_user_accessory_instance_by_id(user_id, instance_id)
             if not instance:
                 return {"success": False, "message": "饰品不存在或不属于你"}
 
@@ -618,9 +604,8 @@ class InventoryService:
         if total_value == 0:
             return {"success": False, "message": "❌ 没有可以卖出的五星鱼竿"}
 
-        # 逐个删除五星鱼竿实例
-        for rod_instance in five_star_rods:
-            self.inventory_repo.delete_rod_instance(rod_instance.rod_instance_id)
+        # 在一个事务中批量删除五星鱼竿实例
+        self.inventory_repo.batch_delete_rod_instances([r.rod_instance_id for r in five_star_rods])
 
         # 更新用户金币
         user.coins += total_value
@@ -659,9 +644,8 @@ class InventoryService:
         if total_value == 0:
             return {"success": False, "message": "❌ 没有可以卖出的五星饰品"}
 
-        # 逐个删除五星饰品实例
-        for accessory_instance in five_star_accessories:
-            self.inventory_repo.delete_accessory_instance(accessory_instance.accessory_instance_id)
+        # 在一个事务中批量删除五星饰品实例
+        self.inventory_repo.batch_delete_accessory_instances([a.accessory_instance_id for a in five_star_accessories])
 
         # 更新用户金币
         user.coins += total_value
@@ -1,4 +1,4 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Set
 from ..repositories.abstract_repository import AbstractItemTemplateRepository, AbstractGachaRepository
 from ..domain.models import Fish, Rod, Bait, Accessory, GachaPool
 
@@ -14,6 +14,10 @@ class ItemTemplateService:
         self.item_template_repo = item_template_repo
         self.gacha_repo = gacha_repo
 
+    def get_existing_template_names(self, item_type: str, names: List[str]) -> Set[str]:
+        """返回 names 中已被同类模板使用的名称，批量添加前用于提前排除重名数据"""
+        return self.item_template_repo.get_existing_template_names(item_type, names)
+
     # --- Fish Methods ---
     def get_all_fish(self) -> List[Fish]:
         return self.item_template_repo.get_all_fish()
@@ -22,6 +26,9 @@ class ItemTemplateService:
         # 服务层可以添加数据验证逻辑，例如检查rarity是否在1-5之间
         self.item_template_repo.add_fish_template(data)
 
+    def add_fish_templates(self, data_list: List[Dict[str, Any]]):
+        self.item_template_repo.add_fish_templates(data_list)
+
     def update_fish_template(self, fish_id: int, data: Dict[str, Any]):
         self.item_template_repo.update_fish_template(fish_id, data)
 
@@ -35,6 +42,9 @@ class ItemTemplateService:
     def add_rod_template(self, data: Dict[str, Any]):
         self.item_template_repo.add_rod_template(data)
 
+    def add_rod_templates(self, data_list: List[Dict[str, Any]]):
+        self.item_template_repo.add_rod_templates(data_list)
+
     def update_rod_template(self, rod_id: int, data: Dict[str, Any]):
         self.item_template_repo.update_rod_template(rod_id, data)
 
@@ -48,6 +58,9 @@ class ItemTemplateService:
     def add_bait_template(self, data: Dict[str, Any]):
         self.item_template_repo.add_bait_template(data)
 
+    def add_bait_templates(self, data_list: List[Dict[str, Any]]):
+        self.item_template_repo.add_bait_templates(data_list)
+
     def update_bait_template(self, bait_id: int, data: Dict[str, Any]):
         self.item_template_repo.update_bait_template(bait_id, data)
 
@@ -61,6 +74,9 @@ class ItemTemplateService:
     def add_accessory_template(self, data: Dict[str, Any]):
         self.item_template_repo.add_accessory_template(data)
 
+    def add_accessory_templates(self, data_list: List[Dict[str, Any]]):
+        self.item_template_repo.add_accessory_templates(data_list)
+
     def update_accessory_template(self, accessory_id: int, data: Dict[str, Any]):
         self.item_template_repo.update_accessory_template(accessory_id, data)
 
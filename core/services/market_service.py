@@ -1,4 +1,5 @@
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Optional, Set, Tuple
 from datetime import datetime
 
 from astrbot.core.utils.pip_installer import logger
@@ -30,17 +31,34 @@ class MarketService:
         self.log_repo = log_repo
         self.item_template_repo = item_template_repo  # 修正：赋值给实例变量
         self.config = config
+        # 曾在市场上架过商品的用户ID集合（首次使用时从数据库加载），不在集合中的用户一定没有上架商品
+        self._seller_ids: Optional[Set[str]] = None
+        self._seller_ids_lock = threading.Lock()
+
+    def _get_seller_ids(self) -> Set[str]:
+        with self._seller_ids_lock:
+            if self._seller_ids is None:
+                self._seller_ids = set(self.market_repo.get_seller_ids())
+            return self._seller_ids
+
+    @staticmethod
+    def _split_by_item_type(listings: List[MarketListing]) -> Tuple[List[MarketListing], List[MarketListing]]:
+        """一次遍历把商品分为鱼竿与饰品两组，保持原有顺序"""
+        rods, accessories = [], []
+        for item in listings:
+            if item.item_type == "rod":
+                rods.append(item)
+            elif item.item_type == "accessory":
+                accessories.append(item)
+        return rods, accessories
 
     def get_market_listings(self) -> Dict[str, Any]:
         """
         提供查看市场所有商品的功能。
         """
         try:
-            # 仓储层已经做好了连接查询，直接返回即可
-            listings = self.market_repo.get_all_listings()
-            # 按物品类型分组，便于前端展示
-            rods = [item for item in listings if item.item_type == "rod"]
-            accessories = [item for item in listings if item.item_type == "accessory"]
+            # 仓储层已经用一条连表查询取回了所有类型的商品，这里只需按物品类型分组，便于前端展示
+            rods, accessories = self._split_by_item_type(self.market_repo.get_all_listings())
             return {
                 "success": True,
                 "rods": rods,
@@ -49,6 +67,23 @@ class MarketService:
         except Exception as e:
             return {"success": False, "message": f"获取市场列表失败: {e}"}
 
+    def get_my_listings(self, user_id: str) -> Dict[str, Any]:
+        """
+        获取用户自己上架的商品，按物品类型分组。
+        """
+        try:
+            # 从未上架过商品的用户（大多数）无需查询数据库
+            if user_id not in self._get_seller_ids():
+                return {"success": True, "rods": [], "accessories": []}
+            rods, accessories = self._split_by_item_type(self.market_repo.get_listings_by_seller(user_id))
+            return {
+                "success": True,
+                "rods": rods,
+                "accessories": accessories
+            }
+        except Exception as e:
+            return {"success": False, "message": f"获取上架商品失败: {e}"}
+
     def put_item_on_sale(self, user_id: str, item_type: str, item_instance_id: int, price: int) -> Dict[str, Any]:
         """
         处理上架物品到市场的逻辑。
@@ -56,6 +91,12 @@ class MarketService:
         if price <= 0:
             return {"success": False, "message": "上架价格必须大于0"}
 
+        # 移除物品、扣税与创建条目在同一个事务中完成，写锁取得后才读取卖家金币
+        with self.user_repo.transaction():
+            return self._put_item_on_sale(user_id, item_type, item_instance_id, price)
+
+    def _put_item_on_sale(self, user_id: str, item_type: str, item_instance_id: int, price: int) -> Dict[str, Any]:
+        """put_item_on_sale 的事务内实现"""
         seller = self.user_repo.get_by_id(user_id)
         if not seller:
             return {"success": False, "message": "用户不存在"}
@@ -72,8 +113,7 @@ class MarketService:
         item_description = None
         item_refine_level = 1
         if item_type == "rod":
-            user_items = self.inventory_repo.get_user_rod_instances(user_id)
-            item_to_list = next((i for i in user_items if i.rod_instance_id == item_instance_id), None)
+            item_to_list = self.inventory_repo.get_user_rod_instance_by_id(user_id, item_instance_id)
             if not item_to_list:
                 return {"success": False, "message": "鱼竿不存在或不属于你"}
             if item_to_list.is_equipped:
@@ -84,8 +124,7 @@ class MarketService:
             item_description = rod_template.description if rod_template else None
             item_refine_level = item_to_list.refine_level
         elif item_type == "accessory":
-            user_items = self.inventory_repo.get_user_accessory_instances(user_id)
-            item_to_list = next((i for i in user_items if i.accessory_instance_id == item_instance_id), None)
+            item_to_list = self.inventory_repo.get_user_accessory_instance_by_id(user_id, item_instance_id)
             if not item_to_list:
                 return {"success": False, "message": "饰品不存在或不属于你"}
             if item_to_list.is_equipped:
@@ -130,7 +169,10 @@ class MarketService:
             listed_at=datetime.now(),
             refine_level=item_refine_level
         )
-        self.market_repo.add_listing(new_listing)
+        with self._seller_ids_lock:
+            self.market_repo.add_listing(new_listing)
+            if self._seller_ids is not None:
+                self._seller_ids.add(user_id)
 
         return {"success": True, "message": f"成功将物品上架市场，价格为 {price} 金币 (手续费: {tax_cost} 金币)"}
 
@@ -138,6 +180,12 @@ class MarketService:
         """
         处理从市场购买物品的逻辑。
         """
+        # 买卖双方的金币与物品转移在同一个事务中完成，写锁取得后才读取双方金币
+        with self.user_repo.transaction():
+            return self._buy_market_item(buyer_id, market_id)
+
+    def _buy_market_item(self, buyer_id: str, market_id: int) -> Dict[str, Any]:
+        """buy_market_item 的事务内实现"""
         buyer = self.user_repo.get_by_id(buyer_id)
         if not buyer:
             return {"success": False, "message": "购买者用户不存在"}
@@ -20,6 +20,12 @@ class ShopService:
         self.inventory_repo = inventory_repo
         self.user_repo = user_repo
 
+    def get_shop_version(self) -> int:
+        """
+        商店商品由鱼竿与鱼饵模板决定，模板版本号不变时商品列表也不变。
+        """
+        return self.item_template_repo.get_version()
+
     def get_shop_listings(self) -> Dict[str, Any]:
         """
         获取商店中所有可供出售的商品列表。
@@ -60,6 +66,13 @@ class ShopService:
         if quantity <= 0:
             return {"success": False, "message": "购买数量必须大于0"}
 
+        # 在事务中读取用户并完成扣款与发货：BEGIN IMMEDIATE 取得写锁后才读取金币，
+        # 其他线程中同一用户的金币写入无法插在读取与写回之间
+        with self.user_repo.transaction():
+            return self._buy_item(user_id, item_type, item_template_id, quantity)
+
+    def _buy_item(self, user_id: str, item_type: str, item_template_id: int, quantity: int) -> Dict[str, Any]:
+        """buy_item 的事务内实现"""
         user = self.user_repo.get_by_id(user_id)
         if not user:
             return {"success": False, "message": "用户不存在"}
@@ -233,6 +233,29 @@ class UserService:
             "message": f"金币数量已更新，当前金币：{user.coins}"
         }
 
+    def adjust_user_coins(self, user_id: str, delta: int) -> Dict[str, Any]:
+        """
+        在当前金币的基础上增减金币，一次原子更新完成，不会与并发修改互相覆盖。
+
+        Args:
+            user_id: 用户ID
+            delta: 金币变化量，负数表示扣除
+
+        Returns:
+            包含成功状态、消息和调整后金币数量的字典。
+        """
+        coins = self.user_repo.adjust_coins(user_id, delta)
+        if coins is None:
+            if not self.user_repo.check_exists(user_id):
+                return {"success": False, "message": "用户不存在或未注册，请检查后重试。"}
+            return {"success": False, "message": "扣除的金币数量不能超过用户当前拥有的金币数量"}
+
+        return {
+            "success": True,
+            "message": f"金币数量已更新，当前金币：{coins}",
+            "coins": coins
+        }
+
     def get_tax_record(self, user_id: str) -> Dict[str, Any]:
         """获取用户的税务记录。"""
         user = self.user_repo.get_by_id(user_id)
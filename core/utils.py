@@ -1,33 +1,62 @@
 import random
+from operator import attrgetter
 from datetime import datetime, date, timedelta, timezone
 
+# UTC+8 时区对象只创建一次
+_TZ_UTC8 = timezone(timedelta(hours=8))
+
 # 获取当前的UTC+8时间
 def get_now() -> datetime:
-    return datetime.now(timezone(timedelta(hours=8)))
+    return datetime.now(_TZ_UTC8)
 
 def get_today() -> date:
     return get_now().date()
 
-def get_fish_template(new_fish_list, coins_chance):
-    sorted_fish_list = sorted(new_fish_list, key=lambda x: x.base_value, reverse=True)
-    random_index = random.randint(0, len(sorted_fish_list) - 1)
+# 没有时区信息的时间按 UTC+8 解释，与 get_now() 写入的时间保持一致
+def to_aware(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=_TZ_UTC8) if dt.tzinfo is None else dt
+
+_BY_BASE_VALUE = attrgetter("base_value")
+
+def get_fish_templates(new_fish_list, coins_chance, k):
+    """
+    一次抽取 k 条鱼的模板：鱼列表只按价值降序排序一次，之后每次抽取只需一次下标计算。
+    单条抽取的概率分布与 get_fish_template 完全一致。
+    """
+    sorted_fish_list = sorted(new_fish_list, key=_BY_BASE_VALUE, reverse=True)
+    last_index = len(sorted_fish_list) - 1
+    randint, rand = random.randint, random.random
     if coins_chance > 0:
-        max_move = random_index
-        move_rate = random.random() <= coins_chance
-        if move_rate:
-            return sorted_fish_list[min(max_move + 1, len(sorted_fish_list) - 1)]
-        return sorted_fish_list[max_move]
-    else:
-        return sorted_fish_list[random_index]
+        return [
+            sorted_fish_list[min(index + 1, last_index) if rand() <= coins_chance else index]
+            for index in (randint(0, last_index) for _ in range(k))
+        ]
+    return [sorted_fish_list[randint(0, last_index)] for _ in range(k)]
+
+def get_fish_template(new_fish_list, coins_chance):
+    return get_fish_templates(new_fish_list, coins_chance, 1)[0]
+
+def _refine_multiplier(refine_level: int) -> float:
+    return 1 + 0.1 * (refine_level - 1 if refine_level < 5 else 5)
+
+# 常见精炼等级的倍率查找表
+_REFINE_MULTIPLIERS = tuple(_refine_multiplier(level) for level in range(32))
 
 def calculate_after_refine(before_value: float, refine_level: int) -> float:
     """
     计算经过精炼后的值
     精炼公式：value * (1 + 0.1 * refine_level)
     """
+    if 0 <= refine_level < len(_REFINE_MULTIPLIERS):
+        multiplier = _REFINE_MULTIPLIERS[refine_level]
+    else:
+        multiplier = _refine_multiplier(refine_level)
     if before_value < 1:
-        return before_value * (1 + 0.1 * (refine_level - 1 if refine_level < 5 else 5))
-    return (before_value - 1) * (1 + 0.1 * (refine_level - 1 if refine_level < 5 else 5)) + 1
+        return before_value * multiplier
+    return (before_value - 1) * multiplier + 1
+
+# 按精度缓存的百分比格式化函数，避免每次调用重新解析动态格式说明符
+_PERCENT_FORMATTERS = {}
 
 def to_percentage(value: float, precision: int = 8) -> str:
     """
@@ -46,4 +75,7 @@ def to_percentage(value: float, precision: int = 8) -> str:
     else:
         percentage = value * 100
     
-    return f"{percentage:.{precision}f}%"
\ No newline at end of file
+    formatter = _PERCENT_FORMATTERS.get(precision)
+    if formatter is None:
+        formatter = _PERCENT_FORMATTERS.setdefault(precision, ("{:." + str(precision) + "f}%").format)
+    return formatter(percentage)
\ No newline at end of file
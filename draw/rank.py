@@ -76,7 +76,7 @@ def draw_fishing_ranking(user_data: List[Dict], output_path: str = "fishing_rank
 
     参数:
     user_data: 用户数据列表，每个用户是一个字典，包含昵称、称号、金币、钓鱼数量、鱼竿、饰品等信息
-    output_path: 输出图片路径
+    output_path: 输出图片路径，也可以是可写入的二进制文件对象（如 io.BytesIO）
     """
     # 准备字体
     try:
@@ -230,8 +230,9 @@ def draw_fishing_ranking(user_data: List[Dict], output_path: str = "fishing_rank
 
     # 保存图片
     try:
-        img.save(output_path)
-        logger.info(f"排行榜图片已保存到 {output_path}")
+        img.save(output_path, format="PNG")
+        if isinstance(output_path, str):
+            logger.info(f"排行榜图片已保存到 {output_path}")
     except Exception as e:
         logger.error(f"保存排行榜图片失败: {e}")
         raise e
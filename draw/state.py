@@ -408,9 +408,11 @@ def get_user_state_data(user_repo, inventory_repo, item_template_repo, log_repo,
     if not user:
         return None
     
-    # 获取当前装备的鱼竿
+    # 一次性获取当前装备的鱼竿和饰品
+    rod_instance, accessory_instance = inventory_repo.get_equipment(user_id)
+
+    # 当前装备的鱼竿
     current_rod = None
-    rod_instance = inventory_repo.get_user_equipped_rod(user_id)
     if rod_instance:
         rod_template = item_template_repo.get_rod_by_id(rod_instance.rod_id)
         if rod_template:
@@ -420,9 +422,8 @@ def get_user_state_data(user_repo, inventory_repo, item_template_repo, log_repo,
                 'refine_level': rod_instance.refine_level
             }
     
-    # 获取当前装备的饰品
+    # 当前装备的饰品
     current_accessory = None
-    accessory_instance = inventory_repo.get_user_equipped_accessory(user_id)
     if accessory_instance:
         accessory_template = item_template_repo.get_accessory_by_id(accessory_instance.accessory_id)
         if accessory_template:
@@ -462,14 +463,7 @@ def get_user_state_data(user_repo, inventory_repo, item_template_repo, log_repo,
     steal_cooldown_remaining = 0
     if user.last_steal_time:
         cooldown_seconds = game_config.get("steal", {}).get("cooldown_seconds", 14400)
-        now = get_now()
-        # 处理时区问题
-        if user.last_steal_time.tzinfo is None and now.tzinfo is not None:
-            now = now.replace(tzinfo=None)
-        elif user.last_steal_time.tzinfo is not None and now.tzinfo is None:
-            now = now.replace(tzinfo=user.last_steal_time.tzinfo)
-        
-        elapsed = (now - user.last_steal_time).total_seconds()
+        elapsed = (get_now() - user.last_steal_time).total_seconds()
         if elapsed < cooldown_seconds:
             steal_cooldown_remaining = int(cooldown_seconds - elapsed)
     
@@ -527,11 +521,8 @@ def get_user_state_data(user_repo, inventory_repo, item_template_repo, log_repo,
     pond_info = None
     try:
         # 使用与inventory_service.get_user_fish_pond相同的逻辑获取鱼塘信息
-        inventory_items = inventory_repo.get_fish_inventory(user_id)
-        total_value = inventory_repo.get_fish_inventory_value(user_id)
-        
-        # 计算总鱼数
-        total_count = sum(item.quantity for item in inventory_items) if inventory_items else 0
+        # 总鱼数与总价值由SQL一次聚合得到
+        total_count, total_value = inventory_repo.get_fish_inventory_stats(user_id)
         
         if total_count > 0 or total_value > 0:
             pond_info = {
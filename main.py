@@ -1,13 +1,24 @@
+import io
 import os
+import re
+import sys
+import csv
+import hashlib
+import time
 import asyncio
+import weakref
 from hypercorn.config import Config
 from hypercorn.asyncio import serve
-from collections import defaultdict
+from collections import Counter, OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from functools import cached_property
 
 from astrbot.api import logger, AstrBotConfig
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api.star import Context, Star
-from astrbot.core.message.components import At
+from astrbot.core.message.components import At, File
 from astrbot.core.star.filter.permission import PermissionType
 
 # ==========================================================
@@ -29,7 +40,7 @@ from .core.services.fishing_service import FishingService
 from .core.services.inventory_service import InventoryService
 from .core.services.shop_service import ShopService
 from .core.services.market_service import MarketService
-from .core.services.gacha_service import GachaService
+from .core.services.gacha_service import GachaService, REWARD_COINS
 from .core.services.achievement_service import AchievementService
 from .core.services.game_mechanics_service import GameMechanicsService
 # 其他
@@ -39,7 +50,344 @@ from .core.utils import get_now
 from .draw.rank import draw_fishing_ranking
 from .draw.help import draw_help_image
 from .manager.server import create_app
-from .utils import get_public_ip, to_percentage, format_accessory_or_rod, safe_datetime_handler, _is_port_available
+from .utils import (get_public_ip, to_percentage, format_accessory_or_rod, safe_datetime_handler, _is_port_available,
+                    get_first_arg, parse_non_negative_int, white_stars, yellow_stars, fetch_text)
+
+
+# 稀有度1~5的默认出售价格
+_DEFAULT_SELL_PRICES = (100, 500, 1000, 5000, 10000)
+
+# 商店/市场命令的整数参数规格：((参数名, 格式错误提示, 是否必须为正数, 缺省值), ...), 缺少必填参数时的提示
+_BUY_ROD_ARGS = (
+    (
+        ("rod_id", "⚠ 鱼竿 ID 必须是数字，请检查后重试。", False, None),
+        ("quantity", "⚠ 购买数量必须是正整数，请检查后重试。", True, 1),  # 默认购买数量为1
+    ),
+    "⚠ 请指定要购买的鱼竿 ID，例如：/购买鱼竿 12",
+)
+_BUY_BAIT_ARGS = (
+    (
+        ("bait_id", "❌ 鱼饵 ID 必须是数字，请检查后重试。", False, None),
+        ("quantity", "❌ 购买数量必须是正整数，请检查后重试。", True, 1),  # 默认购买数量为1
+    ),
+    "❌ 请指定要购买的鱼饵 ID，例如：/购买鱼饵 13",
+)
+_LIST_ROD_ARGS = (
+    (
+        ("rod_instance_id", "❌ 鱼竿 ID 必须是数字，请检查后重试。", False, None),
+        ("price", "❌ 上架价格必须是正整数，请检查后重试。", True, None),
+    ),
+    "❌ 请指定要上架的鱼竿 ID和价格，例如：/上架鱼竿 12 1000",
+)
+_LIST_ACCESSORY_ARGS = (
+    (
+        ("accessory_instance_id", "❌ 饰品 ID 必须是数字，请检查后重试。", False, None),
+        ("price", "❌ 上架价格必须是正整数，请检查后重试。", True, None),
+    ),
+    "❌ 请指定要上架的饰品 ID和价格，例如：/上架饰品 15 1000",
+)
+_REMOVE_MARKET_ITEM_ARGS = (
+    (
+        ("market_id", "❌ 物品 ID 必须是数字，请检查后重试。", False, None),
+    ),
+    "❌ 请指定要下架的物品 ID，例如：/下架 12",
+)
+_BUY_MARKET_ITEM_ARGS = (
+    (
+        ("market_id", "❌ 物品 ID 必须是数字，请检查后重试。", False, None),
+    ),
+    "❌ 请指定要购买的物品 ID，例如：/购买 12",
+)
+_POOL_ID_INVALID_MSG = "❌ 抽奖池 ID 必须是数字，请检查后重试。"
+# 擦弹命令中表示投入全部/一半金币的关键字
+_WIPE_BOMB_MODES = {"allin": "allin", "梭哈": "allin", "halfin": "halfin", "梭一半": "halfin"}
+# 管理员金币命令：命令名 用户ID 金币数量，其后的多余参数忽略
+_COIN_CMD_RE = re.compile(r"\S+\s+(\d+)\s+(\d+)(?:\s|$)")
+# 鱼竿模板允许的来源，值为共享的字符串对象，批量添加的每行数据不再各自持有一份
+_ROD_SOURCES = {source: source for source in ("shop", "gacha", "event")}
+# 批量添加一次最多处理的数据行数，以及单行数据的最大长度
+_MAX_BATCH_ROWS = 10_000
+_MAX_BATCH_LINE_LENGTH = 4096
+# 从文件批量添加时允许的最大文件字节数，超过行数与行长上限的文件无需完整读取
+_MAX_BATCH_FILE_BYTES = _MAX_BATCH_ROWS * _MAX_BATCH_LINE_LENGTH
+# 批量添加命令的格式说明
+_BATCH_FISH_HELP = """📋 批量添加鱼类格式说明：
+    /批量添加鱼类
+    名称|描述|稀有度|基础价值|最小重量|最大重量|图标URL
+    小鲫鱼|一条非常常见的小鱼。|1|10|100|500|None
+    泥鳅|滑溜溜的小家伙。|1|15|50|200|None
+
+    注意：
+    - 每行一个鱼类数据
+    - 字段之间用"|"分隔
+    - 稀有度必须是1-5的整数
+    - 重量、价值必须是正整数
+    - 图标URL可以填None"""
+_BATCH_BAIT_HELP = """📋 批量添加鱼饵格式说明：
+    /批量添加鱼饵
+    名称|描述|稀有度|效果描述|持续时间(分钟)|成本|所需鱼竿稀有度|成功率加成|稀有鱼几率加成|垃圾减少率|价值加成|数量加成|是否消耗品
+    普通蚯蚓|最基础的鱼饵，随处可见。|1|无特殊效果|0|5|0|0.0|0.0|0.0|1.0|1.0|True
+    红虫|营养丰富的鱼饵，很多鱼都爱吃。|2|提高中小型鱼上钩率|0|20|0|0.05|0.0|0.0|1.0|1.0|True
+
+    注意：
+    - 每行一个鱼饵数据
+    - 字段之间用"|"分隔  
+    - 稀有度必须是1-5的整数
+    - 加成值为小数(如0.05表示5%加成)
+    - 是否消耗品填True或False"""
+_BATCH_ROD_HELP = """📋 批量添加鱼竿格式说明：
+    /批量添加鱼竿
+    名称|描述|稀有度|来源|购买价格|质量加成|数量加成|稀有鱼几率加成|耐久度|图标URL
+    新手木竿|刚入门时的可靠伙伴|1|shop|50|1.0|1.0|0.0|None|None
+    竹制鱼竿|轻巧耐用|2|shop|500|1.0|1.0|0.01|None|None
+
+    注意：
+    - 每行一个鱼竿数据
+    - 字段之间用"|"分隔
+    - 稀有度必须是1-5的整数  
+    - 来源必须是shop、gacha或event
+    - 加成值为小数(如1.05表示5%加成)
+    - 购买价格、耐久度、图标URL可以填None"""
+_BATCH_ACCESSORY_HELP = """📋 批量添加饰品格式说明：
+    /批量添加饰品
+    名称|描述|稀有度|槽位类型|质量加成|数量加成|稀有鱼几率加成|金币加成|其他加成描述|图标URL
+    幸运四叶草|带来好运的小饰品|2|general|1.05|1.0|0.01|1.02|None|None
+    渔夫的戒指|刻有古老符文的戒指|3|general|1.0|1.0|0.0|1.10|None|None
+
+    注意：
+    - 每行一个饰品数据
+    - 字段之间用"|"分隔
+    - 稀有度必须是1-5的整数
+    - 槽位类型一般填general
+    - 加成值为小数(如1.05表示5%加成)
+    - 其他加成描述、图标URL可以填None"""
+_BATCH_ADD_HELP = """📋 批量添加功能帮助
+
+    🐟 **批量添加鱼类**
+    /批量添加鱼类
+    名称|描述|稀有度|基础价值|最小重量|最大重量|图标URL
+
+    🎣 **批量添加鱼竿** 
+    /批量添加鱼竿
+    名称|描述|稀有度|来源|购买价格|质量加成|数量加成|稀有鱼几率加成|耐久度|图标URL
+
+    📄 **从文件批量添加鱼竿**
+    /批量添加鱼竿文件 <文件URL>（或附带文件发送）
+    文件每行一个鱼竿数据，格式同上
+
+    🐛 **批量添加鱼饵**
+    /批量添加鱼饵
+    名称|描述|稀有度|效果描述|持续时间|成本|所需鱼竿稀有度|成功率加成|稀有鱼几率加成|垃圾减少率|价值加成|数量加成|是否消耗品
+
+    💍 **批量添加饰品**
+    /批量添加饰品  
+    名称|描述|稀有度|槽位类型|质量加成|数量加成|稀有鱼几率加成|金币加成|其他加成描述|图标URL
+
+    **注意事项：**
+    - 每行一个物品数据
+    - 字段之间用"|"分隔
+    - 稀有度必须是1-5的整数
+    - None值填写None
+    - 小数值如1.05表示5%加成
+    - 错误数据会被跳过并显示错误信息"""
+# 千连、万连中收集4星、5星物品时使用的前缀
+_RARE_PREFIX = yellow_stars(4) + " "
+_LEGEND_PREFIX = yellow_stars(5) + " "
+# 万连完整物品列表最多逐件列出的数量，超出部分只给出件数，避免生成和发送过长的转发消息
+_MAX_DETAIL_ITEMS = 200
+
+
+@dataclass(slots=True)
+class _DrawSummary:
+    """百连、千连、万连共用的统计，按抽卡服务返回的汇总逐批累加，不遍历单条奖励"""
+    rare_rarity: int = 4  # 达到该稀有度的保留物品才逐件记录 (稀有度, 名称)
+    draws: int = 0
+    rarity_count: Counter = field(default_factory=Counter)  # 保留物品按稀有度的件数
+    coins: int = 0  # 直接获得的金币
+    sold_items_count: int = 0
+    sold_coins: int = 0
+    sold_by_rarity: Dict[int, int] = field(default_factory=lambda: {1: 0, 2: 0, 3: 0})
+    rare_rewards: List[Tuple[int, str]] = field(default_factory=list)
+
+    def add(self, result: dict, draws: int) -> None:
+        """累加一次 perform_draw 的成功结果"""
+        self.draws += draws
+        self.rarity_count.update(result["kept_rarity_counts"])
+        self.coins += result["coins_quantity"]
+        sold_summary = result["sold_summary"]
+        if sold_summary:
+            self.sold_items_count += sold_summary["sold_items_count"]
+            self.sold_coins += sold_summary["quantity"]
+            for rarity in (1, 2, 3):
+                self.sold_by_rarity[rarity] += sold_summary["sold_by_rarity"].get(rarity, 0)
+        rare_rarity = self.rare_rarity
+        self.rare_rewards.extend(reward for reward in result["rare_rewards"] if reward[0] >= rare_rarity)
+
+    @property
+    def kept_count(self) -> int:
+        return sum(self.rarity_count.values())
+
+
+@dataclass(slots=True)
+class _BatchErrors:
+    """
+    批量添加的错误收集：统计全部错误的数量，但只保留前几条用于展示。
+    错误信息以模板加参数的形式传入，只有需要展示的前几条才会真正格式化。
+    """
+    limit: int = 5
+    count: int = 0
+    messages: List[str] = field(default_factory=list)
+
+    def add(self, template: str, *args) -> None:
+        self.count += 1
+        if len(self.messages) < self.limit:
+            self.messages.append(template.format(*args))
+
+
+class _BatchRowError(Exception):
+    """批量添加中某一行数据校验失败，异常信息即为展示给用户的错误原因"""
+
+
+def _batch_name(item_name: str):
+    def convert(value: str) -> str:
+        if not value:
+            raise _BatchRowError(f"{item_name}名称不能为空")
+        return value
+    return convert
+
+
+def _batch_rarity(value: str) -> int:
+    rarity = int(value)
+    if not (1 <= rarity <= 5):
+        raise _BatchRowError("稀有度必须是1-5之间的整数")
+    return rarity
+
+
+def _batch_rod_source(value: str) -> str:
+    source = _ROD_SOURCES.get(value)
+    if source is None:
+        raise _BatchRowError("来源必须是shop、gacha或event")
+    return source
+
+
+def _batch_optional(convert):
+    """字段填 None 时取 None，否则按 convert 转换"""
+    return lambda value: None if value == "None" else convert(value)
+
+
+def _batch_bool(value: str) -> bool:
+    return value.lower() == "true"
+
+
+def _check_batch_fish(data: dict) -> None:
+    if data["base_value"] < 0:
+        raise _BatchRowError("基础价值不能为负数")
+    if data["min_weight"] >= data["max_weight"]:
+        raise _BatchRowError("最小重量必须小于最大重量")
+
+
+@dataclass(frozen=True, slots=True)
+class _BatchSchema:
+    """批量添加命令的数据格式：各列依次为 (字段名, 转换函数)，按列顺序转换与校验"""
+    item_name: str
+    item_type: str  # 模板类型（fish/bait/rod/accessory），用于检查名称是否已存在
+    help_text: str
+    columns: Tuple[Tuple[str, Callable[[str], Any]], ...]
+    add_bulk: str  # ItemTemplateService 中批量添加的方法名
+    check: Optional[Callable[[dict], None]] = None  # 全部列转换完成后的整行校验
+
+
+_BATCH_FISH_SCHEMA = _BatchSchema(
+    "鱼类", "fish", _BATCH_FISH_HELP,
+    (
+        ("name", _batch_name("鱼类")),
+        ("description", str),
+        ("rarity", _batch_rarity),
+        ("base_value", int),
+        ("min_weight", int),
+        ("max_weight", int),
+        ("icon_url", _batch_optional(str)),
+    ),
+    "add_fish_templates", _check_batch_fish,
+)
+_BATCH_BAIT_SCHEMA = _BatchSchema(
+    "鱼饵", "bait", _BATCH_BAIT_HELP,
+    (
+        ("name", _batch_name("鱼饵")),
+        ("description", str),
+        ("rarity", _batch_rarity),
+        ("effect_description", str),
+        ("duration_minutes", int),
+        ("cost", int),
+        ("required_rod_rarity", int),
+        ("success_rate_modifier", float),
+        ("rare_chance_modifier", float),
+        ("garbage_reduction_modifier", float),
+        ("value_modifier", float),
+        ("quantity_modifier", float),
+        ("is_consumable", _batch_bool),
+    ),
+    "add_bait_templates",
+)
+_BATCH_ROD_SCHEMA = _BatchSchema(
+    "鱼竿", "rod", _BATCH_ROD_HELP,
+    (
+        ("name", _batch_name("鱼竿")),
+        ("description", str),
+        ("rarity", _batch_rarity),
+        ("source", _batch_rod_source),
+        ("purchase_cost", _batch_optional(int)),
+        ("bonus_fish_quality_modifier", float),
+        ("bonus_fish_quantity_modifier", float),
+        ("bonus_rare_fish_chance", float),
+        ("durability", _batch_optional(int)),
+        ("icon_url", _batch_optional(str)),
+    ),
+    "add_rod_templates",
+)
+_BATCH_ACCESSORY_SCHEMA = _BatchSchema(
+    "饰品", "accessory", _BATCH_ACCESSORY_HELP,
+    (
+        ("name", _batch_name("饰品")),
+        ("description", str),
+        ("rarity", _batch_rarity),
+        ("slot_type", sys.intern),  # 取值很少（通常为 general），驻留后各行共享
+        ("bonus_fish_quality_modifier", float),
+        ("bonus_fish_quantity_modifier", float),
+        ("bonus_rare_fish_chance", float),
+        ("bonus_coin_modifier", float),
+        ("other_bonus_description", _batch_optional(str)),
+        ("icon_url", _batch_optional(str)),
+    ),
+    "add_accessory_templates",
+)
+
+
+def _read_text_file(path: str) -> str:
+    if os.path.getsize(path) > _MAX_BATCH_FILE_BYTES:
+        raise ValueError(f"文件过大，不能超过 {_MAX_BATCH_FILE_BYTES} 字节")
+    # utf-8-sig 兼容表格软件导出时带 BOM 的文件
+    with open(path, encoding="utf-8-sig") as f:
+        return f.read()
+
+
+def _strftime_listed_at(value) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _listed_at_formatter(listings):
+    """同一查询返回的上架时间类型一致，按第一条记录选定一次格式化函数"""
+    if listings and hasattr(listings[0]["listed_at"], "strftime"):
+        return _strftime_listed_at
+    return str
+
+
+# 钓鱼成功消息与钓鱼记录单条的消息模板
+_FISH_FMT = "🎣 恭喜你钓到了：{name}\n✨品质：{stars} \n⚖️重量：{weight} 克\n💰价值：{value} 金币"
+_FISHING_LOG_RECORD_FMT = (" - {fish_name} ({stars})\n"
+                           " - ⚖️重量: {fish_weight} 克 - 💰价值: {fish_value} 金币\n"
+                           " - 🔧装备： {accessory} & {rod} | 🎣鱼饵: {bait}\n"
+                           " - 钓鱼时间: {timestamp}\n")
 
 
 class FishingPlugin(Star):
@@ -55,8 +403,12 @@ class FishingPlugin(Star):
         self.min_rate = config.get("min_rate", 0.05)  # 最小税率
         self.area2num = config.get("area2num", 2000)
         self.area3num = config.get("area3num", 500)
-        self.ten_thousand_gacha_lock = False
-        self.ten_thousand_gacha_user = None  # 记录当前进行万连的用户
+        self._ten_thousand_lock = asyncio.Lock()  # 同一时间只允许一人万连
+        self._ten_thousand_user = None  # 记录当前进行万连的用户
+        sell_prices = config.get("sell_prices") or {}  # 按稀有度的出售价格，只读取一次
+        unknown_keys = set(sell_prices) - {f"by_rarity_{rarity}" for rarity in range(1, len(_DEFAULT_SELL_PRICES) + 1)}
+        if unknown_keys:
+            logger.warning(f"sell_prices 配置中存在未知的键，已忽略: {sorted(unknown_keys)}")
         self.game_config = {
             "fishing": {"cost": config.get("fish_cost", 10), "cooldown_seconds": config.get("fish_cooldown_seconds", 180)},
             "steal": {"cooldown_seconds": config.get("steal_cooldown_seconds", 14400)},
@@ -81,11 +433,8 @@ class FishingPlugin(Star):
             },
             "sell_prices": {
               "by_rarity": {
-                  "1": config.get("sell_prices", {"by_rarity_1":100}).get("by_rarity_1", 100),
-                  "2": config.get("sell_prices", {"by_rarity_2": 500}).get("by_rarity_2", 500),
-                  "3": config.get("sell_prices", {"by_rarity_3": 1000}).get("by_rarity_3", 1000),
-                  "4": config.get("sell_prices", {"by_rarity_4": 5000}).get("by_rarity_4", 5000),
-                  "5": config.get("sell_prices", {"by_rarity_5": 10000}).get("by_rarity_5", 10000),
+                  str(rarity): sell_prices.get(f"by_rarity_{rarity}", default_price)
+                  for rarity, default_price in enumerate(_DEFAULT_SELL_PRICES, start=1)
               }
             },
             "wipe_bomb": {
@@ -107,6 +456,8 @@ class FishingPlugin(Star):
                 { "from": 99999, "to": 999999, "cost": 5000000000 },
             ]
         }
+        # 海洋之心的减半冷却时间只计算一次
+        self.game_config["fishing"]["cooldown_seconds_half"] = self.game_config["fishing"]["cooldown_seconds"] / 2
         db_path = "data/fish.db"
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         # 初始化数据库模式
@@ -114,54 +465,200 @@ class FishingPlugin(Star):
         migrations_path = os.path.join(plugin_root_dir, "core", "database", "migrations")
         run_migrations(db_path, migrations_path)
 
-        # --- 2. 组合根：实例化所有仓储层 ---
+        # --- 2. 组合根：实例化热路径上的仓储层（其余仓储见下方的惰性属性） ---
+        self.db_path = db_path
         self.user_repo = SqliteUserRepository(db_path)
         self.item_template_repo = SqliteItemTemplateRepository(db_path)
         self.inventory_repo = SqliteInventoryRepository(db_path)
-        self.gacha_repo = SqliteGachaRepository(db_path)
-        self.market_repo = SqliteMarketRepository(db_path)
         self.log_repo = SqliteLogRepository(db_path)
         self.achievement_repo = SqliteAchievementRepository(db_path)
 
-        # --- 3. 组合根：实例化所有服务层，并注入依赖 ---
+        # --- 3. 组合根：实例化热路径上的服务层，并注入依赖（其余服务首次访问时再创建） ---
         self.user_service = UserService(self.user_repo, self.log_repo, self.inventory_repo, self.item_template_repo, self.game_config)
         self.inventory_service = InventoryService(self.inventory_repo, self.user_repo, self.item_template_repo,
                                                   self.game_config)
-        self.shop_service = ShopService(self.item_template_repo, self.inventory_repo, self.user_repo)
-        self.market_service = MarketService(self.market_repo, self.inventory_repo, self.user_repo, self.log_repo,
-                                            self.item_template_repo, self.game_config)
-        self.gacha_service = GachaService(
-    self.gacha_repo, 
-    self.user_repo, 
-    self.inventory_repo, 
-    self.item_template_repo,
-    self.log_repo, 
-    self.achievement_repo,
-    self.game_config  # 传入配置
-)
-        self.game_mechanics_service = GameMechanicsService(self.user_repo, self.log_repo, self.inventory_repo,
-                                                           self.item_template_repo, self.game_config)
         self.achievement_service = AchievementService(self.achievement_repo, self.user_repo, self.inventory_repo,
                                                       self.item_template_repo, self.log_repo)
         self.fishing_service = FishingService(self.user_repo, self.inventory_repo, self.item_template_repo,
                                               self.log_repo, self.game_config)
 
-        self.item_template_service = ItemTemplateService(self.item_template_repo, self.gacha_repo)
-
-        # --- 4. 启动后台任务 ---
-        self.fishing_service.start_auto_fishing_task()
-        self.achievement_service.start_achievement_check_task()
-
-        # --- 5. 初始化核心游戏数据 ---
-        data_setup_service = DataSetupService(self.item_template_repo, self.gacha_repo)
-        data_setup_service.setup_initial_data()
-        self.fishing_service.on_load(area2num=self.area2num, area3num=self.area3num)
+        # 核心游戏数据初始化与后台任务的启动推迟到 initialize() 中，避免阻塞插件加载
+
+        # --- 用户对象短时缓存：user_id -> (缓存时刻, User)，按LRU淘汰 ---
+        self._user_cache: OrderedDict = OrderedDict()
+        self._user_cache_size = 1024
+        # --- 市场列表渲染结果的短时缓存：(缓存时刻, 消息文本) ---
+        self._market_cache = (0.0, None)
+        self._market_cache_ttl = 10.0
+        self._market_cache_generation = 0  # 每次失效时递增，用于丢弃查询期间已过期的渲染结果
+        # --- 商店列表渲染结果缓存：(模板版本号, 消息文本) ---
+        self._shop_render_cache = (None, None)
+        # --- 状态图缓存：状态数据 -> PNG字节，按LRU淘汰 ---
+        self._state_image_cache: OrderedDict = OrderedDict()
+        self._state_image_cache_size = 128
+        # --- 排行榜数据短时缓存：(缓存时刻, 排行数据) ---
+        self._leaderboard_cache = (0.0, None)
+        # --- 排行榜图片缓存：(排行数据摘要, 绘制时刻, PNG字节) ---
+        self._ranking_cache = (None, 0.0, None)
+        self._ranking_cache_ttl = 60.0
+        # --- 帮助图片内容固定，首次请求时绘制一次后复用 ---
+        self._help_image_path = None
+        # 商店/市场交易在线程中执行，交易之间仍需串行，避免同一商品被重复购买等读-改-写竞争
+        self._trade_lock = asyncio.Lock()
+        # 按用户划分的锁：万连、商店与市场在线程中读-改-写用户数据，修改同一用户的命令须依次执行，
+        # 否则事件循环上的命令会用旧数据覆盖线程中刚写入的金币
+        self._user_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # 限制同时在线程池中绘图的数量，避免大量绘图请求占满默认线程池
+        self._draw_semaphore = asyncio.Semaphore(2)
+        # 排行榜图片同一时刻只绘制一张，并发请求等待后直接复用刚绘制的结果
+        self._ranking_draw_lock = asyncio.Lock()
 
         # --- Web后台配置 ---
         self.web_admin_task = None
         self.secret_key = config.get("secret_key", "default_secret_key")
         self.port = config.get("port", 7777)
 
+    # --- 惰性组合根：不常用的仓储与服务在首次访问时才实例化 ---
+    @cached_property
+    def gacha_repo(self) -> SqliteGachaRepository:
+        return SqliteGachaRepository(self.db_path)
+
+    @cached_property
+    def market_repo(self) -> SqliteMarketRepository:
+        return SqliteMarketRepository(self.db_path)
+
+    @cached_property
+    def shop_service(self) -> ShopService:
+        return ShopService(self.item_template_repo, self.inventory_repo, self.user_repo)
+
+    @cached_property
+    def market_service(self) -> MarketService:
+        return MarketService(self.market_repo, self.inventory_repo, self.user_repo, self.log_repo,
+                             self.item_template_repo, self.game_config)
+
+    @cached_property
+    def gacha_service(self) -> GachaService:
+        return GachaService(self.gacha_repo, self.user_repo, self.inventory_repo, self.item_template_repo,
+                            self.log_repo, self.achievement_repo, self.game_config)
+
+    @cached_property
+    def game_mechanics_service(self) -> GameMechanicsService:
+        return GameMechanicsService(self.user_repo, self.log_repo, self.inventory_repo,
+                                    self.item_template_repo, self.game_config)
+
+    @cached_property
+    def item_template_service(self) -> ItemTemplateService:
+        return ItemTemplateService(self.item_template_repo, self.gacha_repo)
+
+    def _get_user_cached(self, user_id: str, ttl: float = 2.0):
+        """读取用户对象，ttl 秒内的重复读取直接命中内存缓存（仅用于只读场景）。"""
+        cached = self._user_cache.get(user_id)
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < ttl:
+            self._user_cache.move_to_end(user_id)
+            return cached[1]
+        user = self.user_repo.get_by_id(user_id)
+        if user is None:
+            self._user_cache.pop(user_id, None)
+        else:
+            self._user_cache[user_id] = (now, user)
+            self._user_cache.move_to_end(user_id)
+            if len(self._user_cache) > self._user_cache_size:
+                self._user_cache.popitem(last=False)
+        return user
+
+    def _invalidate_user_cache(self, *user_ids: str) -> None:
+        """用户数据被修改后使其缓存失效。"""
+        for user_id in user_ids:
+            self._user_cache.pop(user_id, None)
+
+    @asynccontextmanager
+    async def _lock_users(self, *user_ids):
+        """依次获取各用户的锁，按用户ID排序加锁，同时涉及多个用户时不会互相死锁"""
+        locks = []
+        for user_id in sorted({str(user_id) for user_id in user_ids}):
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = asyncio.Lock()
+            locks.append(lock)
+        async with AsyncExitStack() as stack:
+            for lock in locks:
+                await stack.enter_async_context(lock)
+            yield
+
+    def _invalidate_ranking_cache(self) -> None:
+        """管理员修改金币后丢弃缓存的排行数据与排行榜图片。"""
+        self._leaderboard_cache = (0.0, None)
+        self._ranking_cache = (None, 0.0, None)
+
+    @staticmethod
+    def _parse_int_args(event: AstrMessageEvent, specs: tuple, usage: str):
+        """
+        解析命令后的整数参数，参数之间允许有多个空格。
+        specs: 依次为每个参数的 (参数名, 格式错误提示, 是否必须为正数, 缺省值)，缺省值为 None 表示必填
+        usage: 缺少必填参数时的提示
+        返回 (参数字典, None) 或 (None, 错误提示)
+        """
+        tokens = event.message_str.split()[1:]
+        values = {}
+        for index, (name, invalid_msg, positive, default) in enumerate(specs):
+            if index >= len(tokens):
+                if default is None:
+                    return None, usage
+                values[name] = default
+                continue
+            # 直接用 int() 解析，负数同样视为格式错误（ID 可以为 0，正数参数必须大于 0）
+            try:
+                value = int(tokens[index])
+            except ValueError:
+                return None, invalid_msg
+            if value < (1 if positive else 0):
+                return None, invalid_msg
+            values[name] = value
+        return values, None
+
+    @staticmethod
+    def _parse_coin_args(event: AstrMessageEvent, usage: str):
+        """
+        解析管理员金币命令的「用户ID 金币数量」参数，格式正确时只需一次预编译正则匹配。
+        返回 (用户 ID, 金币数量, None) 或 (None, None, 错误提示)
+        """
+        match = _COIN_CMD_RE.match(event.message_str)
+        if match:
+            return match.group(1), int(match.group(2)), None
+        # 匹配失败时再逐项检查，给出具体的错误提示
+        tokens = event.message_str.split()
+        if len(tokens) < 3:
+            return None, None, usage
+        if not tokens[1].isdigit():
+            return None, None, "❌ 用户 ID 必须是数字，请检查后重试。"
+        return None, None, "❌ 金币数量必须是数字，请检查后重试。"
+
+    @staticmethod
+    def _parse_pool_id(event: AstrMessageEvent, usage):
+        """
+        解析抽卡命令后的抽奖池 ID，只找第一个分隔符，不切分整条消息。
+        usage: 缺少 ID 时的提示，为 None 时缺少 ID 不视为错误
+        返回 (抽奖池 ID, None)、(None, 错误提示) 或缺少 ID 且 usage 为 None 时的 (None, None)
+        """
+        _, _, rest = event.message_str.partition(" ")
+        arg = rest.strip().partition(" ")[0]
+        if not arg:
+            return None, usage
+        # 直接用 int() 解析，负数同样视为格式错误
+        try:
+            pool_id = int(arg)
+        except ValueError:
+            return None, _POOL_ID_INVALID_MSG
+        if pool_id < 0:
+            return None, _POOL_ID_INVALID_MSG
+        return pool_id, None
+
+    def _invalidate_market_cache(self) -> None:
+        """市场商品发生变动后使市场列表缓存失效。"""
+        self._market_cache = (0.0, None)
+        self._market_cache_generation += 1
+
     async def initialize(self):
         """可选择实现异步的插件初始化方法，当实例化该插件类之后会自动调用该方法。"""
         logger.info("""
@@ -172,6 +669,15 @@ class FishingPlugin(Star):
     |_|   |_|___/_| |_|_|_| |_|\\__, |
                                |___/
                                """)
+        # --- 初始化核心游戏数据（涉及数据库读写，放到线程中执行） ---
+        data_setup_service = DataSetupService(self.item_template_repo, self.gacha_repo)
+        await asyncio.to_thread(data_setup_service.setup_initial_data)
+        await asyncio.to_thread(self.fishing_service.on_load, area2num=self.area2num, area3num=self.area3num)
+
+        # --- 启动后台任务：须在核心数据就绪后再启动 ---
+        self.fishing_service.start_auto_fishing_task()
+        self.achievement_service.start_achievement_check_task()
+
 
     # ===========基础与核心玩法==========
     async def _send_long_message(self, event, message: str, title: str):
@@ -182,27 +688,23 @@ class FishingPlugin(Star):
 
         text_chunk_size = 1000  # 每个Plain文本块的最大字数
         node_chunk_size = 4  # 每个Node中最多包含的Plain文本块数量
-        text_chunks = [message[i:i + text_chunk_size] for i in
-                    range(0, len(message), text_chunk_size)]
-
-        if not text_chunks:
-            yield event.plain_result("❌ 内容为空，无法发送。")
-            return
-
-        grouped_chunks = [text_chunks[i:i + node_chunk_size] for i in
-                        range(0, len(text_chunks), node_chunk_size)]
 
         from astrbot.api.message_components import Node, Plain
-        nodes_to_send = []
-        for i, group in enumerate(grouped_chunks):
-            plain_components = [Plain(text=chunk) for chunk in group]
-
-            node = Node(
-                uin=event.get_self_id(),
-                name=f"{title} - 第 {i + 1} 页",
-                content=plain_components
+        # 按节点跨度一次遍历消息，直接切出每个Plain块，不构造中间的分块列表
+        self_id = event.get_self_id()
+        node_span = text_chunk_size * node_chunk_size
+        message_len = len(message)
+        nodes_to_send = [
+            Node(
+                uin=self_id,
+                name=f"{title} - 第 {page} 页",
+                content=[
+                    Plain(text=message[i:i + text_chunk_size])
+                    for i in range(start, min(start + node_span, message_len), text_chunk_size)
+                ]
             )
-            nodes_to_send.append(node)
+            for page, start in enumerate(range(0, message_len, node_span), start=1)
+        ]
 
         try:
             yield event.chain_result(nodes_to_send)
@@ -213,7 +715,8 @@ class FishingPlugin(Star):
     async def register_user(self, event: AstrMessageEvent):
         """注册用户命令"""
         user_id = event.get_sender_id()
-        nickname = event.get_sender_name() if event.get_sender_name() is not None else event.get_sender_id()
+        sender_name = event.get_sender_name()
+        nickname = sender_name if sender_name is not None else user_id
         result = self.user_service.register(user_id, nickname)
         if result:
             yield event.plain_result(result["message"])
@@ -224,40 +727,43 @@ class FishingPlugin(Star):
     async def fish(self, event: AstrMessageEvent):
         """钓鱼"""
         user_id = event.get_sender_id()
-        user = self.user_repo.get_by_id(user_id)
+        user = self._get_user_cached(user_id)
         if not user:
             yield event.plain_result("❌ 您还没有注册，请先使用 /注册 命令注册。")
             return
         # 检查用户钓鱼CD
         lst_time = user.last_fishing_time
-        # 检查是否装备了海洋之心饰品
-        info = self.user_service.get_user_current_accessory(user_id)
-        if info["success"] is False:
-            yield event.plain_result(f"❌ 获取用户饰品信息失败：{info['message']}")
-            return
-        equipped_accessory = info.get("accessory")
-        cooldown_seconds = self.game_config["fishing"]["cooldown_seconds"]
-        if equipped_accessory and equipped_accessory.get("name") == "海洋之心":
+        # 检查是否装备了海洋之心饰品（已取得用户对象，直接查装备实例，模板走模板仓储的缓存）
+        equipped_accessory = self.inventory_repo.get_user_equipped_accessory(user_id)
+        accessory_template = (self.item_template_repo.get_accessory_by_id(equipped_accessory.accessory_id)
+                              if equipped_accessory else None)
+        if equipped_accessory and not accessory_template:
+            yield event.plain_result("❌ 获取用户饰品信息失败：配件不存在")
+            return
+        fishing_config = self.game_config["fishing"]
+        if accessory_template and accessory_template.name == "海洋之心":
             # 如果装备了海洋之心，CD时间减半
-            cooldown_seconds = self.game_config["fishing"]["cooldown_seconds"] / 2
+            cooldown_seconds = fishing_config["cooldown_seconds_half"]
             # logger.info(f"用户 {user_id} 装备了海洋之心，钓鱼CD时间减半。")
-        # 修复时区问题
-        now = get_now()
-        if lst_time and lst_time.tzinfo is None and now.tzinfo is not None:
-            # 如果 lst_time 没有时区而 now 有时区，移除 now 的时区信息
-            now = now.replace(tzinfo=None)
-        elif lst_time and lst_time.tzinfo is not None and now.tzinfo is None:
-            # 如果 lst_time 有时区而 now 没有时区，将 now 转换为有时区
-            now = now.replace(tzinfo=lst_time.tzinfo)
-        if lst_time and (now - lst_time).total_seconds() < cooldown_seconds:
-            wait_time = cooldown_seconds - (now - lst_time).total_seconds()
+        else:
+            cooldown_seconds = fishing_config["cooldown_seconds"]
+        elapsed = self.fishing_service.seconds_since_last_fish(user_id)
+        if elapsed is None and lst_time:
+            # 本进程内没有钓鱼记录（如插件重启后），回退到数据库中的上次钓鱼时间
+            elapsed = (get_now() - lst_time).total_seconds()
+        if elapsed is not None and elapsed < cooldown_seconds:
+            wait_time = cooldown_seconds - elapsed
             yield event.plain_result(f"⏳ 您还需要等待 {int(wait_time)} 秒才能再次钓鱼。")
             return
-        result = self.fishing_service.go_fish(user_id)
+        async with self._lock_users(user_id):
+            result = self.fishing_service.go_fish(user_id)
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
-                yield event.plain_result(
-                    f"🎣 恭喜你钓到了：{result['fish']['name']}\n✨品质：{'★' * result['fish']['rarity']} \n⚖️重量：{result['fish']['weight']} 克\n💰价值：{result['fish']['value']} 金币")
+                caught = result["fish"]
+                yield event.plain_result(_FISH_FMT.format(
+                    name=caught["name"], stars=white_stars(caught["rarity"]),
+                    weight=caught["weight"], value=caught["value"]))
             else:
                 yield event.plain_result(result["message"])
         else:
@@ -267,7 +773,9 @@ class FishingPlugin(Star):
     async def sign_in(self, event: AstrMessageEvent):
         """签到"""
         user_id = event.get_sender_id()
-        result = self.user_service.daily_sign_in(user_id)
+        async with self._lock_users(user_id):
+            result = self.user_service.daily_sign_in(user_id)
+        self._invalidate_user_cache(user_id)
         if result["success"]:
             message = f"✅ 签到成功！获得 {result['coins_reward']} 金币。"
             if result["bonus_coins"] > 0:
@@ -280,7 +788,8 @@ class FishingPlugin(Star):
     async def auto_fish(self, event: AstrMessageEvent):
         """自动钓鱼"""
         user_id = event.get_sender_id()
-        result = self.fishing_service.toggle_auto_fishing(user_id)
+        async with self._lock_users(user_id):
+            result = self.fishing_service.toggle_auto_fishing(user_id)
         yield event.plain_result(result["message"])
 
     @filter.command("钓鱼记录", alias={"钓鱼日志", "钓鱼历史"})
@@ -294,13 +803,15 @@ class FishingPlugin(Star):
                 if not records:
                     yield event.plain_result("❌ 您还没有钓鱼记录。")
                     return
-                message = "【📜 钓鱼记录】：\n"
+                parts = ["【📜 钓鱼记录】：\n"]
+                record_fmt = _FISHING_LOG_RECORD_FMT.format
                 for record in records:
-                    message += (f" - {record['fish_name']} ({'★' * record['fish_rarity']})\n"
-                                f" - ⚖️重量: {record['fish_weight']} 克 - 💰价值: {record['fish_value']} 金币\n"
-                                f" - 🔧装备： {record['accessory']} & {record['rod']} | 🎣鱼饵: {record['bait']}\n"
-                                f" - 钓鱼时间: {safe_datetime_handler(record['timestamp'])}\n")
-                yield event.plain_result(message)
+                    parts.append(record_fmt(
+                        fish_name=record["fish_name"], stars=white_stars(record["fish_rarity"]),
+                        fish_weight=record["fish_weight"], fish_value=record["fish_value"],
+                        accessory=record["accessory"], rod=record["rod"], bait=record["bait"],
+                        timestamp=safe_datetime_handler(record["timestamp"])))
+                yield event.plain_result("".join(parts))
             else:
                 yield event.plain_result(f"❌ 获取钓鱼记录失败：{result['message']}")
         else:
@@ -315,7 +826,7 @@ class FishingPlugin(Star):
         user = self.user_repo.get_by_id(user_id)
         if user:
             # 导入绘制函数
-            from .draw.state import draw_state_image, get_user_state_data
+            from .draw.state import get_user_state_data
             
             # 获取用户状态数据
             user_data = get_user_state_data(
@@ -328,42 +839,53 @@ class FishingPlugin(Star):
             )
             
             if user_data:
-                # 生成状态图像
-                image = draw_state_image(user_data)
-                # 保存图像到临时文件
-                image_path = "user_status.png"
-                image.save(image_path)
-                yield event.image_result(image_path)
+                from astrbot.api.message_components import Image
+                # 状态数据完全相同时直接复用已生成的图像
+                cache_key = repr(user_data)
+                png_bytes = self._state_image_cache.get(cache_key)
+                if png_bytes is None:
+                    # 绘图与编码在线程中执行，避免阻塞事件循环
+                    async with self._draw_semaphore:
+                        png_bytes = await asyncio.to_thread(self._render_state_png, user_data)
+                    self._state_image_cache[cache_key] = png_bytes
+                    if len(self._state_image_cache) > self._state_image_cache_size:
+                        self._state_image_cache.popitem(last=False)
+                else:
+                    self._state_image_cache.move_to_end(cache_key)
+                yield event.chain_result([Image.fromBytes(png_bytes)])
             else:
                 yield event.plain_result("❌ 获取用户状态数据失败。")
         else:
             yield event.plain_result("❌ 您还没有注册，请先使用 /注册 命令注册。")
             
+    @staticmethod
+    def _render_state_png(user_data: dict) -> bytes:
+        """绘制状态图像并直接编码到内存中，避免多个用户同时写同一个文件"""
+        from .draw.state import draw_state_image
+        image = draw_state_image(user_data)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", compress_level=1)
+        return buffer.getvalue()
+
     @filter.command("鱼塘")
     async def pond(self, event: AstrMessageEvent):
         """查看用户鱼塘内的鱼"""
         user_id = event.get_sender_id()
         pond_fish = self.inventory_service.get_user_fish_pond(user_id)
         if pond_fish:
-            fishes = pond_fish["fishes"]
-            # 把fishes按稀有度分组
-            fished_by_rarity = {}
-            for fish in fishes:
-                rarity = fish.get("rarity", "未知")
-                if rarity not in fished_by_rarity:
-                    fished_by_rarity[rarity] = []
-                fished_by_rarity[rarity].append(fish)
-            # 构造输出信息
-            message = "【🐠 鱼塘】：\n"
-            for rarity in sorted(fished_by_rarity.keys(), reverse=True):
-                fish_list = fished_by_rarity[rarity]
-                if fish_list:
-                    message += f"\n {'⭐' * rarity } 稀有度 {rarity}：\n"
-                    for fish in fish_list:
-                        message += f"  - {fish['name']} x  {fish['quantity']} （{fish['base_value']}金币 / 个） \n"
-            message += f"\n🐟 总鱼数：{pond_fish['stats']['total_count']} 条\n"
-            message += f"💰 总价值：{pond_fish['stats']['total_value']} 金币\n"
-            yield event.plain_result(message)
+            # 鱼塘数据已按稀有度降序排列，稀有度变化时输出新的分组标题即可
+            parts = ["【🐠 鱼塘】：\n"]
+            append = parts.append
+            current_rarity = None
+            for fish in pond_fish["fishes"]:
+                rarity = fish["rarity"]
+                if rarity != current_rarity:
+                    current_rarity = rarity
+                    append(f"\n {yellow_stars(rarity)} 稀有度 {rarity}：\n")
+                append(f"  - {fish['name']} x  {fish['quantity']} （{fish['base_value']}金币 / 个） \n")
+            append(f"\n🐟 总鱼数：{pond_fish['stats']['total_count']} 条\n")
+            append(f"💰 总价值：{pond_fish['stats']['total_value']} 金币\n")
+            yield event.plain_result("".join(parts))
         else:
             yield event.plain_result("🐟 您的鱼塘是空的，快去钓鱼吧！")
 
@@ -382,7 +904,9 @@ class FishingPlugin(Star):
     async def upgrade_pond(self, event: AstrMessageEvent):
         """升级鱼塘容量"""
         user_id = event.get_sender_id()
-        result = self.inventory_service.upgrade_fish_pond(user_id)
+        async with self._lock_users(user_id):
+            result = self.inventory_service.upgrade_fish_pond(user_id)
+        self._invalidate_user_cache(user_id)
         if result["success"]:
             yield event.plain_result(f"🐠 鱼塘升级成功！新容量为 {result['new_capacity']} 条鱼。")
         else:
@@ -395,15 +919,15 @@ class FishingPlugin(Star):
         rod_info = self.inventory_service.get_user_rod_inventory(user_id)
         if rod_info and rod_info["rods"]:
             # 构造输出信息,附带emoji
-            message = "【🎣 鱼竿】：\n"
+            parts = ["【🎣 鱼竿】：\n"]
             for rod in rod_info["rods"]:
-                message += format_accessory_or_rod(rod)
+                parts.append(format_accessory_or_rod(rod))
                 if rod.get("bonus_rare_fish_chance", 1) != 1 and rod.get("bonus_fish_weight", 1.0) != 1.0:
-                    message += f"   - 钓上鱼鱼类几率加成: {to_percentage(rod['bonus_rare_fish_chance'])}\n"
-                message += f"   -精炼等级: {rod.get('refine_level', 1)}\n"
+                    parts.append(f"   - 钓上鱼鱼类几率加成: {to_percentage(rod['bonus_rare_fish_chance'])}\n")
+                parts.append(f"   -精炼等级: {rod.get('refine_level', 1)}\n")
             
             # 使用通用的长消息处理方法
-            async for result in self._send_long_message(event, message, "鱼竿信息"):
+            async for result in self._send_long_message(event, "".join(parts), "鱼竿信息"):
                 yield result
         else:
             yield event.plain_result("🎣 您还没有鱼竿，快去商店购买或抽奖获得吧！")
@@ -416,15 +940,17 @@ class FishingPlugin(Star):
         if not rod_info or not rod_info["rods"]:
             yield event.plain_result("❌ 您还没有鱼竿，请先购买或抽奖获得。")
             return
-        args = event.message_str.split(" ")
-        if len(args) < 2:
+        rod_instance_id = get_first_arg(event.message_str)
+        if not rod_instance_id:
             yield event.plain_result("❌ 请指定要精炼的鱼竿 ID，例如：/精炼鱼竿 12")
             return
-        rod_instance_id = args[1]
-        if not rod_instance_id.isdigit():
+        rod_instance_id = parse_non_negative_int(rod_instance_id)
+        if rod_instance_id is None:
             yield event.plain_result("❌ 鱼竿 ID 必须是数字，请检查后重试。")
             return
-        result = self.inventory_service.refine(user_id, int(rod_instance_id), "rod")
+        async with self._lock_users(user_id):
+            result = self.inventory_service.refine(user_id, rod_instance_id, "rod")
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -440,16 +966,17 @@ class FishingPlugin(Star):
         bait_info = self.inventory_service.get_user_bait_inventory(user_id)
         if bait_info and bait_info["baits"]:
             # 构造输出信息,附带emoji
-            message = "【🐟 鱼饵】：\n"
+            parts = ["【🐟 鱼饵】：\n"]
+            append = parts.append
             for bait in bait_info["baits"]:
-                message += f" - {bait['name']} x {bait['quantity']} (稀有度: {'⭐' * bait['rarity']})\n"
-                message += f"   - ID: {bait['bait_id']}\n"
+                append(f" - {bait['name']} x {bait['quantity']} (稀有度: {yellow_stars(bait['rarity'])})\n")
+                append(f"   - ID: {bait['bait_id']}\n")
                 if bait["duration_minutes"] > 0:
-                    message += f"   - 持续时间: {bait['duration_minutes']} 分钟\n"
+                    append(f"   - 持续时间: {bait['duration_minutes']} 分钟\n")
                 if bait["effect_description"]:
-                    message += f"   - 效果: {bait['effect_description']}\n"
-                message += "\n"
-            yield event.plain_result(message)
+                    append(f"   - 效果: {bait['effect_description']}\n")
+                append("\n")
+            yield event.plain_result("".join(parts))
         else:
             yield event.plain_result("🐟 您还没有鱼饵，快去商店购买或抽奖获得吧！")
 
@@ -460,13 +987,13 @@ class FishingPlugin(Star):
         accessories_info = self.inventory_service.get_user_accessory_inventory(user_id)
         if accessories_info and accessories_info["accessories"]:
             # 构造输出信息,附带emoji
-            message = "【💍 饰品】：\n"
+            parts = ["【💍 饰品】：\n"]
             for accessory in accessories_info["accessories"]:
-                message += format_accessory_or_rod(accessory)
-                message += f"   -精炼等级: {accessory.get('refine_level', 1)}\n"
+                parts.append(format_accessory_or_rod(accessory))
+                parts.append(f"   -精炼等级: {accessory.get('refine_level', 1)}\n")
             
             # 使用通用的长消息处理方法
-            async for result in self._send_long_message(event, message, "饰品信息"):
+            async for result in self._send_long_message(event, "".join(parts), "饰品信息"):
                 yield result
         else:
             yield event.plain_result("💍 您还没有饰品，快去商店购买或抽奖获得吧！")
@@ -479,15 +1006,17 @@ class FishingPlugin(Star):
         if not accessories_info or not accessories_info["accessories"]:
             yield event.plain_result("❌ 您还没有饰品，请先购买或抽奖获得。")
             return
-        args = event.message_str.split(" ")
-        if len(args) < 2:
+        accessory_instance_id = get_first_arg(event.message_str)
+        if not accessory_instance_id:
             yield event.plain_result("❌ 请指定要精炼的饰品 ID，例如：/精炼饰品 15")
             return
-        accessory_instance_id = args[1]
-        if not accessory_instance_id.isdigit():
+        accessory_instance_id = parse_non_negative_int(accessory_instance_id)
+        if accessory_instance_id is None:
             yield event.plain_result("❌ 饰品 ID 必须是数字，请检查后重试。")
             return
-        result = self.inventory_service.refine(user_id, int(accessory_instance_id), "accessory")
+        async with self._lock_users(user_id):
+            result = self.inventory_service.refine(user_id, accessory_instance_id, "accessory")
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -504,16 +1033,17 @@ class FishingPlugin(Star):
         if not rod_info or not rod_info["rods"]:
             yield event.plain_result("❌ 您还没有鱼竿，请先购买或抽奖获得。")
             return
-        args = event.message_str.split(" ")
-        if len(args) < 2:
+        rod_instance_id = get_first_arg(event.message_str)
+        if not rod_instance_id:
             yield event.plain_result("❌ 请指定要使用的鱼竿 ID，例如：/使用鱼竿 12")
             return
-
-        rod_instance_id = args[1]
-        if not rod_instance_id.isdigit():
+        rod_instance_id = parse_non_negative_int(rod_instance_id)
+        if rod_instance_id is None:
             yield event.plain_result("❌ 鱼竿 ID 必须是数字，请检查后重试。")
             return
-        result = self.inventory_service.equip_item(user_id, int(rod_instance_id), "rod")
+        async with self._lock_users(user_id):
+            result = self.inventory_service.equip_item(user_id, rod_instance_id, "rod")
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -530,15 +1060,17 @@ class FishingPlugin(Star):
         if not bait_info or not bait_info["baits"]:
             yield event.plain_result("❌ 您还没有鱼饵，请先购买或抽奖获得。")
             return
-        args = event.message_str.split(" ")
-        if len(args) < 2:
+        bait_instance_id = get_first_arg(event.message_str)
+        if not bait_instance_id:
             yield event.plain_result("❌ 请指定要使用的鱼饵 ID，例如：/使用鱼饵 13")
             return
-        bait_instance_id = args[1]
-        if not bait_instance_id.isdigit():
+        bait_instance_id = parse_non_negative_int(bait_instance_id)
+        if bait_instance_id is None:
             yield event.plain_result("❌ 鱼饵 ID 必须是数字，请检查后重试。")
             return
-        result = self.inventory_service.use_bait(user_id, int(bait_instance_id))
+        async with self._lock_users(user_id):
+            result = self.inventory_service.use_bait(user_id, bait_instance_id)
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -555,15 +1087,17 @@ class FishingPlugin(Star):
         if not accessories_info or not accessories_info["accessories"]:
             yield event.plain_result("❌ 您还没有饰品，请先购买或抽奖获得。")
             return
-        args = event.message_str.split(" ")
-        if len(args) < 2:
+        accessory_instance_id = get_first_arg(event.message_str)
+        if not accessory_instance_id:
             yield event.plain_result("❌ 请指定要使用的饰品 ID，例如：/使用饰品 15")
             return
-        accessory_instance_id = args[1]
-        if not accessory_instance_id.isdigit():
+        accessory_instance_id = parse_non_negative_int(accessory_instance_id)
+        if accessory_instance_id is None:
             yield event.plain_result("❌ 饰品 ID 必须是数字，请检查后重试。")
             return
-        result = self.inventory_service.equip_item(user_id, int(accessory_instance_id), "accessory")
+        async with self._lock_users(user_id):
+            result = self.inventory_service.equip_item(user_id, accessory_instance_id, "accessory")
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -576,7 +1110,7 @@ class FishingPlugin(Star):
     async def coins(self, event: AstrMessageEvent):
         """查看用户金币信息"""
         user_id = event.get_sender_id()
-        user = self.user_repo.get_by_id(user_id)
+        user = self._get_user_cached(user_id)
         if user:
             yield event.plain_result(f"💰 您的金币余额：{user.coins} 金币")
         else:
@@ -588,7 +1122,9 @@ class FishingPlugin(Star):
     async def sell_all(self, event: AstrMessageEvent):
         """卖出用户所有鱼"""
         user_id = event.get_sender_id()
-        result = self.inventory_service.sell_all_fish(user_id)
+        async with self._lock_users(user_id):
+            result = self.inventory_service.sell_all_fish(user_id)
+        self._invalidate_user_cache(user_id)
         if result:
             yield event.plain_result(result["message"])
         else:
@@ -598,7 +1134,9 @@ class FishingPlugin(Star):
     async def sell_keep(self, event: AstrMessageEvent):
         """卖出用户鱼，但保留每种鱼一条"""
         user_id = event.get_sender_id()
-        result = self.inventory_service.sell_all_fish(user_id, keep_one=True)
+        async with self._lock_users(user_id):
+            result = self.inventory_service.sell_all_fish(user_id, keep_one=True)
+        self._invalidate_user_cache(user_id)
         if result:
             yield event.plain_result(result["message"])
         else:
@@ -608,15 +1146,17 @@ class FishingPlugin(Star):
     async def sell_by_rarity(self, event: AstrMessageEvent):
         """按稀有度出售鱼"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
+        rarity = get_first_arg(event.message_str)
+        if not rarity:
             yield event.plain_result("❌ 请指定要出售的稀有度，例如：/出售稀有度 3")
             return
-        rarity = args[1]
-        if not rarity.isdigit() or int(rarity) < 1 or int(rarity) > 5:
+        rarity = parse_non_negative_int(rarity)
+        if rarity is None or not 1 <= rarity <= 5:
             yield event.plain_result("❌ 稀有度必须是1到5之间的数字，请检查后重试。")
             return
-        result = self.inventory_service.sell_fish_by_rarity(user_id, int(rarity))
+        async with self._lock_users(user_id):
+            result = self.inventory_service.sell_fish_by_rarity(user_id, rarity)
+        self._invalidate_user_cache(user_id)
         if result:
             yield event.plain_result(result["message"])
         else:
@@ -626,15 +1166,17 @@ class FishingPlugin(Star):
     async def sell_rod(self, event: AstrMessageEvent):
         """出售鱼竿"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
+        rod_instance_id = get_first_arg(event.message_str)
+        if not rod_instance_id:
             yield event.plain_result("❌ 请指定要出售的鱼竿 ID，例如：/出售鱼竿 12")
             return
-        rod_instance_id = args[1]
-        if not rod_instance_id.isdigit():
+        rod_instance_id = parse_non_negative_int(rod_instance_id)
+        if rod_instance_id is None:
             yield event.plain_result("❌ 鱼竿 ID 必须是数字，请检查后重试。")
             return
-        result = self.inventory_service.sell_rod(user_id, int(rod_instance_id))
+        async with self._lock_users(user_id):
+            result = self.inventory_service.sell_rod(user_id, rod_instance_id)
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -648,7 +1190,9 @@ class FishingPlugin(Star):
     async def sell_all_rods(self, event: AstrMessageEvent):
         """出售用户所有鱼竿"""
         user_id = event.get_sender_id()
-        result = self.inventory_service.sell_all_rods(user_id)
+        async with self._lock_users(user_id):
+            result = self.inventory_service.sell_all_rods(user_id)
+        self._invalidate_user_cache(user_id)
         if result:
             yield event.plain_result(result["message"])
         else:
@@ -658,15 +1202,17 @@ class FishingPlugin(Star):
     async def sell_accessories(self, event: AstrMessageEvent):
         """出售饰品"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
+        accessory_instance_id = get_first_arg(event.message_str)
+        if not accessory_instance_id:
             yield event.plain_result("❌ 请指定要出售的饰品 ID，例如：/出售饰品 15")
             return
-        accessory_instance_id = args[1]
-        if not accessory_instance_id.isdigit():
+        accessory_instance_id = parse_non_negative_int(accessory_instance_id)
+        if accessory_instance_id is None:
             yield event.plain_result("❌ 饰品 ID 必须是数字，请检查后重试。")
             return
-        result = self.inventory_service.sell_accessory(user_id, int(accessory_instance_id))
+        async with self._lock_users(user_id):
+            result = self.inventory_service.sell_accessory(user_id, accessory_instance_id)
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -679,7 +1225,9 @@ class FishingPlugin(Star):
     async def sell_all_accessories(self, event: AstrMessageEvent):
         """出售用户所有饰品"""
         user_id = event.get_sender_id()
-        result = self.inventory_service.sell_all_accessories(user_id)
+        async with self._lock_users(user_id):
+            result = self.inventory_service.sell_all_accessories(user_id)
+        self._invalidate_user_cache(user_id)
         if result:
             yield event.plain_result(result["message"])
         else:
@@ -688,28 +1236,37 @@ class FishingPlugin(Star):
     @filter.command("商店")
     async def shop(self, event: AstrMessageEvent):
         """查看商店"""
+        # 商店商品只随模板变化，模板版本号未变时直接复用上次渲染的文本
+        version = self.shop_service.get_shop_version()
+        cached_version, cached_message = self._shop_render_cache
+        if cached_message is not None and cached_version == version:
+            yield event.plain_result(cached_message)
+            return
         result = self.shop_service.get_shop_listings()
         if result:
-            message = "【🛒 商店】\n\n"
+            parts = ["【🛒 商店】\n\n"]
+            append = parts.append
             if result["baits"]:
-                message += "【🐟 鱼饵】:\n"
+                append("【🐟 鱼饵】:\n")
                 for bait in result["baits"]:
-                    message += f" - {bait.name} (ID: {bait.bait_id}) - 价格: {bait.cost} 金币\n - 描述：{bait.description}\n\n"
+                    append(f" - {bait.name} (ID: {bait.bait_id}) - 价格: {bait.cost} 金币\n - 描述：{bait.description}\n\n")
             else:
-                message += "🐟 商店中没有鱼饵可供购买。\n\n"
+                append("🐟 商店中没有鱼饵可供购买。\n\n")
             if result["rods"]:
-                message += "\n【🎣 鱼竿】:\n"
+                append("\n【🎣 鱼竿】:\n")
                 for rod in result["rods"]:
-                    message += f" - {rod.name} (ID: {rod.rod_id}) - 价格: {rod.purchase_cost} 金币\n"
+                    append(f" - {rod.name} (ID: {rod.rod_id}) - 价格: {rod.purchase_cost} 金币\n")
                     if rod.bonus_fish_quality_modifier != 1.0:
-                        message += f"   - 质量加成⬆️: {to_percentage(rod.bonus_fish_quality_modifier)}\n"
+                        append(f"   - 质量加成⬆️: {to_percentage(rod.bonus_fish_quality_modifier)}\n")
                     if rod.bonus_fish_quantity_modifier != 1.0:
-                        message += f"   - 数量加成⬆️: {to_percentage(rod.bonus_fish_quantity_modifier)}\n"
+                        append(f"   - 数量加成⬆️: {to_percentage(rod.bonus_fish_quantity_modifier)}\n")
                     if rod.bonus_rare_fish_chance != 0.0:
-                        message += f"   - 钓鱼加成⬆️: {to_percentage(rod.bonus_rare_fish_chance)}\n"
-                    message += "\n"
+                        append(f"   - 钓鱼加成⬆️: {to_percentage(rod.bonus_rare_fish_chance)}\n")
+                    append("\n")
             else:
-                message += "🎣 商店中没有鱼竿可供购买。\n"
+                append("🎣 商店中没有鱼竿可供购买。\n")
+            message = "".join(parts)
+            self._shop_render_cache = (version, message)
             yield event.plain_result(message)
         else:
             yield event.plain_result("❌ 出错啦！请稍后再试。")
@@ -718,21 +1275,13 @@ class FishingPlugin(Star):
     async def buy_rod(self, event: AstrMessageEvent):
         """购买鱼竿"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
-            yield event.plain_result("⚠ 请指定要购买的鱼竿 ID，例如：/购买鱼竿 12")
-            return
-        rod_instance_id = args[1]
-        if not rod_instance_id.isdigit():
-            yield event.plain_result("⚠ 鱼竿 ID 必须是数字，请检查后重试。")
+        args, error = self._parse_int_args(event, *_BUY_ROD_ARGS)
+        if error:
+            yield event.plain_result(error)
             return
-        quantity = 1  # 默认购买数量为1
-        if len(args) == 3:
-            quantity = args[2]
-            if not quantity.isdigit() or int(quantity) <= 0:
-                yield event.plain_result("⚠ 购买数量必须是正整数，请检查后重试。")
-                return
-        result = self.shop_service.buy_item(user_id, "rod", int(rod_instance_id), int(quantity))
+        async with self._lock_users(user_id), self._trade_lock:
+            result = await asyncio.to_thread(self.shop_service.buy_item, user_id, "rod", args["rod_id"], args["quantity"])
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -745,21 +1294,13 @@ class FishingPlugin(Star):
     async def buy_bait(self, event: AstrMessageEvent):
         """购买鱼饵"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
-            yield event.plain_result("❌ 请指定要购买的鱼饵 ID，例如：/购买鱼饵 13")
-            return
-        bait_instance_id = args[1]
-        if not bait_instance_id.isdigit():
-            yield event.plain_result("❌ 鱼饵 ID 必须是数字，请检查后重试。")
+        args, error = self._parse_int_args(event, *_BUY_BAIT_ARGS)
+        if error:
+            yield event.plain_result(error)
             return
-        quantity = 1  # 默认购买数量为1
-        if len(args) == 3:
-            quantity = args[2]
-            if not quantity.isdigit() or int(quantity) <= 0:
-                yield event.plain_result("❌ 购买数量必须是正整数，请检查后重试。")
-                return
-        result = self.shop_service.buy_item(user_id, "bait", int(bait_instance_id), int(quantity))
+        async with self._lock_users(user_id), self._trade_lock:
+            result = await asyncio.to_thread(self.shop_service.buy_item, user_id, "bait", args["bait_id"], args["quantity"])
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -771,23 +1312,32 @@ class FishingPlugin(Star):
     @filter.command("市场")
     async def market(self, event: AstrMessageEvent):
         """查看市场"""
-        result = self.market_service.get_market_listings()
+        cached_at, cached_message = self._market_cache
+        if cached_message is not None and time.monotonic() - cached_at < self._market_cache_ttl:
+            yield event.plain_result(cached_message)
+            return
+        generation = self._market_cache_generation
+        result = await asyncio.to_thread(self.market_service.get_market_listings)
         if result["success"]:
-            message = "【🛒 市场】\n\n"
+            parts = ["【🛒 市场】\n\n"]
+            append = parts.append
             if result["rods"]:
-                message += "【🎣 鱼竿】:\n"
+                append("【🎣 鱼竿】:\n")
                 for rod in result["rods"]:
-                    message += f" - {rod['item_name']} 精{rod['refine_level']} (ID: {rod['market_id']}) - 价格: {rod['price']} 金币\n"
-                    message += f" - 售卖人： {rod['seller_nickname']}\n\n"
+                    append(f" - {rod['item_name']} 精{rod['refine_level']} (ID: {rod['market_id']}) - 价格: {rod['price']} 金币\n"
+                           f" - 售卖人： {rod['seller_nickname']}\n\n")
             else:
-                message += "🎣 市场中没有鱼竿可供购买。\n\n"
+                append("🎣 市场中没有鱼竿可供购买。\n\n")
             if result["accessories"]:
-                message += "【💍 饰品】:\n"
+                append("【💍 饰品】:\n")
                 for accessory in result["accessories"]:
-                    message += f" - {accessory['item_name']} 精{accessory['refine_level']} (ID: {accessory['market_id']}) - 价格: {accessory['price']} 金币\n"
-                    message += f" - 售卖人： {accessory['seller_nickname']}\n\n"
+                    append(f" - {accessory['item_name']} 精{accessory['refine_level']} (ID: {accessory['market_id']}) - 价格: {accessory['price']} 金币\n"
+                           f" - 售卖人： {accessory['seller_nickname']}\n\n")
             else:
-                message += "💍 市场中没有饰品可供购买。\n"
+                append("💍 市场中没有饰品可供购买。\n")
+            message = "".join(parts)
+            if generation == self._market_cache_generation:
+                self._market_cache = (time.monotonic(), message)
             yield event.plain_result(message)
         else:
             yield event.plain_result(f"❌ 出错啦！{result['message']}")
@@ -797,19 +1347,15 @@ class FishingPlugin(Star):
     async def list_rod(self, event: AstrMessageEvent):
         """上架鱼竿到市场"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 3:
-            yield event.plain_result("❌ 请指定要上架的鱼竿 ID和价格，例如：/上架鱼竿 12 1000")
-            return
-        rod_instance_id = args[1]
-        if not rod_instance_id.isdigit():
-            yield event.plain_result("❌ 鱼竿 ID 必须是数字，请检查后重试。")
-            return
-        price = args[2]
-        if not price.isdigit() or int(price) <= 0:
-            yield event.plain_result("❌ 上架价格必须是正整数，请检查后重试。")
-            return
-        result = self.market_service.put_item_on_sale(user_id, "rod", int(rod_instance_id), int(price))
+        args, error = self._parse_int_args(event, *_LIST_ROD_ARGS)
+        if error:
+            yield event.plain_result(error)
+            return
+        async with self._lock_users(user_id), self._trade_lock:
+            result = await asyncio.to_thread(self.market_service.put_item_on_sale, user_id, "rod",
+                                             args["rod_instance_id"], args["price"])
+        self._invalidate_user_cache(user_id)
+        self._invalidate_market_cache()
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -822,19 +1368,15 @@ class FishingPlugin(Star):
     async def list_accessories(self, event: AstrMessageEvent):
         """上架饰品到市场"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 3:
-            yield event.plain_result("❌ 请指定要上架的饰品 ID和价格，例如：/上架饰品 15 1000")
-            return
-        accessory_instance_id = args[1]
-        if not accessory_instance_id.isdigit():
-            yield event.plain_result("❌ 饰品 ID 必须是数字，请检查后重试。")
-            return
-        price = args[2]
-        if not price.isdigit() or int(price) <= 0:
-            yield event.plain_result("❌ 上架价格必须是正整数，请检查后重试。")
-            return
-        result = self.market_service.put_item_on_sale(user_id, "accessory", int(accessory_instance_id), int(price))
+        args, error = self._parse_int_args(event, *_LIST_ACCESSORY_ARGS)
+        if error:
+            yield event.plain_result(error)
+            return
+        async with self._lock_users(user_id), self._trade_lock:
+            result = await asyncio.to_thread(self.market_service.put_item_on_sale, user_id, "accessory",
+                                             args["accessory_instance_id"], args["price"])
+        self._invalidate_user_cache(user_id)
+        self._invalidate_market_cache()
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -847,17 +1389,15 @@ class FishingPlugin(Star):
     async def remove_market_item(self, event: AstrMessageEvent):
         """下架市场上的物品"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
-            yield event.plain_result("❌ 请指定要下架的物品 ID，例如：/下架 12")
+        args, error = self._parse_int_args(event, *_REMOVE_MARKET_ITEM_ARGS)
+        if error:
+            yield event.plain_result(error)
             return
         
-        item_instance_id = args[1]
-        if not item_instance_id.isdigit():
-            yield event.plain_result("❌ 物品 ID 必须是数字，请检查后重试。")
-            return
-        
-        result = self.market_service.remove_item_from_market(user_id, int(item_instance_id))
+        async with self._lock_users(user_id), self._trade_lock:
+            result = await asyncio.to_thread(self.market_service.remove_item_from_market, user_id, args["market_id"])
+        self._invalidate_user_cache(user_id)
+        self._invalidate_market_cache()
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -871,53 +1411,63 @@ class FishingPlugin(Star):
         """查看自己上架的商品"""
         user_id = event.get_sender_id()
         
-        # 获取所有市场商品，然后筛选出用户自己的
-        result = self.market_service.get_market_listings()
+        # 只查询用户自己上架的商品
+        result = await asyncio.to_thread(self.market_service.get_my_listings, user_id)
         if not result["success"]:
             yield event.plain_result(f"❌ 获取市场信息失败：{result.get('message', '未知错误')}")
             return
         
-        # 筛选出用户自己的商品
-        my_rods = [item for item in result["rods"] if item['user_id'] == user_id]
-        my_accessories = [item for item in result["accessories"] if item['user_id'] == user_id]
+        my_rods = result["rods"]
+        my_accessories = result["accessories"]
         
         if not my_rods and not my_accessories:
             yield event.plain_result("📦 您还没有上架任何商品。")
             return
         
-        message = "【🛒 我的上架商品】\n\n"
+        parts = ["【🛒 我的上架商品】\n\n"]
+        append = parts.append
+        format_time = _listed_at_formatter(my_rods or my_accessories)
         
         if my_rods:
-            message += "【🎣 鱼竿】:\n"
+            append("【🎣 鱼竿】:\n")
             for rod in my_rods:
-                message += f" - {rod['item_name']} 精{rod['refine_level']} (ID: {rod['market_id']})\n"
-                message += f"   价格: {rod['price']} 金币\n"
-                message += f"   上架时间: {rod['listed_at'].strftime('%Y-%m-%d %H:%M:%S') if hasattr(rod['listed_at'], 'strftime') else rod['listed_at']}\n\n"
+                append(f" - {rod['item_name']} 精{rod['refine_level']} (ID: {rod['market_id']})\n"
+                       f"   价格: {rod['price']} 金币\n"
+                       f"   上架时间: {format_time(rod['listed_at'])}\n\n")
         
         if my_accessories:
-            message += "【💍 饰品】:\n"
+            append("【💍 饰品】:\n")
             for accessory in my_accessories:
-                message += f" - {accessory['item_name']} 精{accessory['refine_level']} (ID: {accessory['market_id']})\n"
-                message += f"   价格: {accessory['price']} 金币\n"
-                message += f"   上架时间: {accessory['listed_at'].strftime('%Y-%m-%d %H:%M:%S') if hasattr(accessory['listed_at'], 'strftime') else accessory['listed_at']}\n\n"
+                append(f" - {accessory['item_name']} 精{accessory['refine_level']} (ID: {accessory['market_id']})\n"
+                       f"   价格: {accessory['price']} 金币\n"
+                       f"   上架时间: {format_time(accessory['listed_at'])}\n\n")
         
-        message += "💡 使用 `/下架 ID` 命令可以下架指定商品"
+        append("💡 使用 `/下架 ID` 命令可以下架指定商品")
         
-        yield event.plain_result(message)
+        yield event.plain_result("".join(parts))
 
     @filter.command("购买")
     async def buy_item(self, event: AstrMessageEvent):
         """购买市场上的物品"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
-            yield event.plain_result("❌ 请指定要购买的物品 ID，例如：/购买 12")
-            return
-        item_instance_id = args[1]
-        if not item_instance_id.isdigit():
-            yield event.plain_result("❌ 物品 ID 必须是数字，请检查后重试。")
-            return
-        result = self.market_service.buy_market_item(user_id, int(item_instance_id))
+        args, error = self._parse_int_args(event, *_BUY_MARKET_ITEM_ARGS)
+        if error:
+            yield event.plain_result(error)
+            return
+        # 买卖双方的金币都会被修改：先查出卖家并锁住双方，再取交易锁，与其他交易命令的加锁顺序一致，
+        # 避免持有交易锁时等待用户锁而阻塞所有交易
+        while True:
+            listing = await asyncio.to_thread(self.market_repo.get_listing_by_id, args["market_id"])
+            seller_ids = (listing.user_id,) if listing else ()
+            async with self._lock_users(user_id, *seller_ids), self._trade_lock:
+                # 交易锁内商品不会再变化；加锁前商品若已被下架并由他人重新上架，卖家不同则重新加锁
+                current = await asyncio.to_thread(self.market_repo.get_listing_by_id, args["market_id"])
+                if ((current.user_id,) if current else ()) != seller_ids:
+                    continue
+                result = await asyncio.to_thread(self.market_service.buy_market_item, user_id, args["market_id"])
+                break
+        self._invalidate_user_cache(user_id)
+        self._invalidate_market_cache()
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -931,40 +1481,40 @@ class FishingPlugin(Star):
     async def gacha(self, event: AstrMessageEvent):
         """抽卡"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
+        pool_id, error = self._parse_pool_id(event, None)
+        if error:
+            yield event.plain_result(error)
+            return
+        if pool_id is None:
             # 展示所有的抽奖池信息并显示帮助
             pools = self.gacha_service.get_all_pools()
             if not pools:
                 yield event.plain_result("❌ 当前没有可用的抽奖池。")
                 return
-            message = "【🎰 抽奖池列表】\n\n"
+            parts = ["【🎰 抽奖池列表】\n\n"]
+            append = parts.append
             for pool in pools.get("pools", []):
-                message += f"ID: {pool['gacha_pool_id']} - {pool['name']} - {pool['description']}\n 💰 花费：{pool['cost_coins']} 金币 / 次\n\n"
+                append(f"ID: {pool['gacha_pool_id']} - {pool['name']} - {pool['description']}\n 💰 花费：{pool['cost_coins']} 金币 / 次\n\n")
             # 添加卡池详细信息
-            message += "【📋 卡池详情】使用「查看卡池 ID」命令查看详细物品概率\n"
-            message += "【🎲 抽卡命令】使用「抽卡 ID」命令选择抽卡池进行单次抽卡\n"
-            message += "【🎯 十连命令】使用「十连 ID」命令进行十连抽卡\n"
-            message += "【🚀 百连命令】使用「百连 ID」命令进行百连抽卡"
-            yield event.plain_result(message)
-            return
-        pool_id = args[1]
-        if not pool_id.isdigit():
-            yield event.plain_result("❌ 抽奖池 ID 必须是数字，请检查后重试。")
-            return
-        pool_id = int(pool_id)
-        result = self.gacha_service.perform_draw(user_id, pool_id, num_draws=1)
+            append("【📋 卡池详情】使用「查看卡池 ID」命令查看详细物品概率\n"
+                   "【🎲 抽卡命令】使用「抽卡 ID」命令选择抽卡池进行单次抽卡\n"
+                   "【🎯 十连命令】使用「十连 ID」命令进行十连抽卡\n"
+                   "【🚀 百连命令】使用「百连 ID」命令进行百连抽卡")
+            yield event.plain_result("".join(parts))
+            return
+        async with self._lock_users(user_id):
+            result = self.gacha_service.perform_single_draw(user_id, pool_id)
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
-                items = result.get("results", [])
-                message = f"🎉 抽卡成功！您抽到了 {len(items)} 件物品：\n"
-                for item in items:
-                    # 构造输出信息
-                    if item.get("type") == "coins":
-                        # 金币类型的物品
-                        message += f"⭐ {item['quantity']} 金币！\n"
-                    else:
-                        message += f"{'⭐' * item.get('rarity', 1)} {item['name']}\n"
+                item = result["item"]
+                if item is None:
+                    message = "🎉 抽卡成功！您抽到了 0 件物品：\n"
+                elif item.t == REWARD_COINS:
+                    # 金币类型的物品
+                    message = f"🎉 抽卡成功！您抽到了 1 件物品：\n⭐ {item.quantity} 金币！\n"
+                else:
+                    message = f"🎉 抽卡成功！您抽到了 1 件物品：\n{yellow_stars(item.rarity)} {item.name}\n"
                 yield event.plain_result(message)
             else:
                 yield event.plain_result(f"❌ 抽卡失败：{result['message']}")
@@ -976,49 +1526,39 @@ class FishingPlugin(Star):
     async def ten_gacha(self, event: AstrMessageEvent):
         """十连抽卡"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
-            yield event.plain_result("❌ 请指定要进行十连抽卡的抽奖池 ID，例如：/十连 1")
-            return
-        pool_id = args[1]
-        if not pool_id.isdigit():
-            yield event.plain_result("❌ 抽奖池 ID 必须是数字，请检查后重试。")
+        pool_id, error = self._parse_pool_id(event, "❌ 请指定要进行十连抽卡的抽奖池 ID，例如：/十连 1")
+        if error:
+            yield event.plain_result(error)
             return
-        pool_id = int(pool_id)
-        result = self.gacha_service.perform_draw(user_id, pool_id, num_draws=10)
+        async with self._lock_users(user_id):
+            result = self.gacha_service.perform_ten_draw(user_id, pool_id)
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
-                items = result.get("results", [])
-                message = f"🎉 十连抽卡成功！您抽到了 {len(items)} 件物品：\n"
-                
-                # 统计和分类显示
-                kept_items = []
-                sold_items_summary = None
+                # 卖出的物品已由抽卡服务汇总，这里只需展示保留的奖励
+                kept_items = result["kept"]
+                sold_items_summary = result["sold_summary"]
+                parts = [f"🎉 十连抽卡成功！您抽到了 {len(kept_items)} 件物品：\n"]
+                append = parts.append
                 
-                for item in items:
-                    if item.get("type") == "coins":
-                        message += f"⭐ {item['quantity']} 金币！\n"
-                    elif item.get("type") == "sold_coins_summary":
-                        sold_items_summary = item
-                    elif item.get("type", "").startswith("sold_"):
-                        # 跳过单个卖出物品的显示，只在汇总中显示
-                        continue
+                for item in kept_items:
+                    if item.t == REWARD_COINS:
+                        append(f"⭐ {item.quantity} 金币！\n")
                     else:
-                        kept_items.append(item)
-                        message += f"{'⭐' * item.get('rarity', 1)} {item['name']}\n"
+                        append(f"{yellow_stars(item.rarity)} {item.name}\n")
                 
                 # 显示自动卖出汇总
                 if sold_items_summary:
-                    message += f"\n💰 自动卖出物品汇总：\n"
-                    message += f"   卖出数量：{sold_items_summary['sold_items_count']} 件\n"
+                    append("\n💰 自动卖出物品汇总：\n")
+                    append(f"   卖出数量：{sold_items_summary['sold_items_count']} 件\n")
                     sold_by_rarity = sold_items_summary['sold_by_rarity']
                     for rarity in [1, 2, 3]:
                         if sold_by_rarity.get(rarity, 0) > 0:
-                            message += f"   {'⭐' * rarity}：{sold_by_rarity[rarity]} 件\n"
-                    message += f"   获得金币：{sold_items_summary['quantity']} 💰\n"
-                    message += f"\n📝 四星以下物品已自动卖出换取金币"
+                            append(f"   {yellow_stars(rarity)}：{sold_by_rarity[rarity]} 件\n")
+                    append(f"   获得金币：{sold_items_summary['quantity']} 💰\n")
+                    append("\n📝 四星以下物品已自动卖出换取金币")
                 
-                yield event.plain_result(message)
+                yield event.plain_result("".join(parts))
             else:
                 yield event.plain_result(f"❌ 抽卡失败：{result['message']}")
         else:
@@ -1030,19 +1570,13 @@ class FishingPlugin(Star):
     async def hundred_gacha(self, event: AstrMessageEvent):
         """百连抽卡 - 使用内存聚合优化，支持大批量抽奖，自动卖出四星以下物品"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
-            yield event.plain_result("❌ 请指定要进行百连抽卡的抽奖池 ID，例如：/百连 1")
-            return
-        pool_id = args[1]
-        if not pool_id.isdigit():
-            yield event.plain_result("❌ 抽奖池 ID 必须是数字，请检查后重试。")
+        pool_id, error = self._parse_pool_id(event, "❌ 请指定要进行百连抽卡的抽奖池 ID，例如：/百连 1")
+        if error:
+            yield event.plain_result(error)
             return
         
-        pool_id = int(pool_id)
-        
         # 添加确认提示，因为百连成本较高
-        pool_info = self.gacha_service.gacha_repo.get_pool_by_id(pool_id)
+        pool_info = self.gacha_service.get_pool(pool_id)
         if not pool_info:
             yield event.plain_result("❌ 指定的抽奖池不存在。")
             return
@@ -1060,73 +1594,56 @@ class FishingPlugin(Star):
         # 提示用户即将进行的操作
         yield event.plain_result(f"🚀 正在进行百连抽卡，预计花费 {total_cost} 金币...\n⏳ 请稍等，正在处理...\n📝 四星以下物品将自动卖出换取金币")
         
-        result = self.gacha_service.perform_draw(user_id, pool_id, num_draws=100)
+        async with self._lock_users(user_id):
+            result = self.gacha_service.perform_draw(user_id, pool_id, num_draws=100)
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
-                items = result.get("results", [])
+                # 统计结果
+                summary = _DrawSummary()
+                summary.add(result, 100)
+                rarity_count = summary.rarity_count
                 
-                # 统计结果 - 使用 defaultdict 自动处理任何稀有度
-                rarity_count = defaultdict(int)
-                coins_total = 0
-                special_items = []
-                sold_items_summary = None
-                
-                for item in items:
-                    if item.get("type") == "coins":
-                        coins_total += item['quantity']
-                    elif item.get("type") == "sold_coins_summary":
-                        sold_items_summary = item
-                    elif item.get("type", "").startswith("sold_"):
-                        # 自动卖出的物品不显示在特殊物品中
-                        continue
-                    else:
-                        rarity = item.get('rarity', 1)
-                        rarity_count[rarity] += 1
-                        
-                        # 收集4星及以上的特殊物品
-                        if rarity >= 4:
-                            special_items.append(f"{'⭐' * rarity} {item['name']}")
+                # 4星及以上的特殊物品最多显示10个，其余只计数
+                special_count = len(summary.rare_rewards)
+                special_items = [f"{yellow_stars(rarity)} {name}" for rarity, name in summary.rare_rewards[:10]]
                 
                 # 构建消息
-                message = f"🎊 百连抽卡完成！\n\n"
+                parts = ["🎊 百连抽卡完成！\n\n"]
+                append = parts.append
                 
                 # 稀有度统计（只显示保留的物品）
-                message += "📊 【保留物品统计】\n"
+                append("📊 【保留物品统计】\n")
                 kept_items_count = 0
                 for rarity in sorted(rarity_count.keys(), reverse=True):
                     if rarity_count[rarity] > 0:
-                        message += f"{'⭐' * rarity}：{rarity_count[rarity]} 件\n"
+                        append(f"{yellow_stars(rarity)}：{rarity_count[rarity]} 件\n")
                         kept_items_count += rarity_count[rarity]
                 
-                if coins_total > 0:
-                    normal_coins = coins_total
-                    if sold_items_summary:
-                        normal_coins = coins_total - sold_items_summary['quantity']
-                    if normal_coins > 0:
-                        message += f"💰 直接金币：{normal_coins}\n"
+                if summary.coins > 0:
+                    append(f"💰 直接金币：{summary.coins}\n")
                 
                 # 显示自动卖出汇总
-                if sold_items_summary:
-                    message += f"\n💸 【自动卖出汇总】\n"
-                    message += f"卖出数量：{sold_items_summary['sold_items_count']} 件\n"
-                    sold_by_rarity = sold_items_summary['sold_by_rarity']
+                if summary.sold_items_count:
+                    append("\n💸 【自动卖出汇总】\n")
+                    append(f"卖出数量：{summary.sold_items_count} 件\n")
+                    sold_by_rarity = summary.sold_by_rarity
                     for rarity in [1, 2, 3]:
-                        if sold_by_rarity.get(rarity, 0) > 0:
-                            message += f"{'⭐' * rarity}：{sold_by_rarity[rarity]} 件\n"
-                    message += f"获得金币：{sold_items_summary['quantity']} 💰\n"
+                        if sold_by_rarity[rarity] > 0:
+                            append(f"{yellow_stars(rarity)}：{sold_by_rarity[rarity]} 件\n")
+                    append(f"获得金币：{summary.sold_coins} 💰\n")
                 
                 # 显示4星及以上物品
                 if special_items:
-                    message += f"\n🌟 【珍稀物品】\n"
-                    for item in special_items[:10]:  # 最多显示10个
-                        message += f"{item}\n"
-                    if len(special_items) > 10:
-                        message += f"...还有{len(special_items)-10}件珍稀物品\n"
+                    append("\n🌟 【珍稀物品】\n")
+                    for item in special_items:  # 最多显示10个
+                        append(f"{item}\n")
+                    if special_count > 10:
+                        append(f"...还有{special_count-10}件珍稀物品\n")
                 
-                total_items = kept_items_count + (sold_items_summary['sold_items_count'] if sold_items_summary else 0)
-                message += f"\n📋 总计：保留 {kept_items_count} 件，卖出 {sold_items_summary['sold_items_count'] if sold_items_summary else 0} 件"
+                append(f"\n📋 总计：保留 {kept_items_count} 件，卖出 {summary.sold_items_count} 件")
                 
-                yield event.plain_result(message)
+                yield event.plain_result("".join(parts))
             else:
                 yield event.plain_result(f"❌ 抽卡失败：{result['message']}")
         else:
@@ -1137,19 +1654,13 @@ class FishingPlugin(Star):
     async def thousand_gacha(self, event: AstrMessageEvent):
         """千连抽卡 - 大批量抽奖，自动卖出四星以下物品"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
-            yield event.plain_result("❌ 请指定要进行千连抽卡的抽奖池 ID，例如：/千连 1")
-            return
-        pool_id = args[1]
-        if not pool_id.isdigit():
-            yield event.plain_result("❌ 抽奖池 ID 必须是数字，请检查后重试。")
+        pool_id, error = self._parse_pool_id(event, "❌ 请指定要进行千连抽卡的抽奖池 ID，例如：/千连 1")
+        if error:
+            yield event.plain_result(error)
             return
         
-        pool_id = int(pool_id)
-        
         # 获取抽奖池信息并验证费用
-        pool_info = self.gacha_service.gacha_repo.get_pool_by_id(pool_id)
+        pool_info = self.gacha_service.get_pool(pool_id)
         if not pool_info:
             yield event.plain_result("❌ 指定的抽奖池不存在。")
             return
@@ -1167,92 +1678,82 @@ class FishingPlugin(Star):
         # 提示用户即将进行的操作
         yield event.plain_result(f"🚀 正在进行千连抽卡，预计花费 {total_cost:,} 金币...\n⏳ 请稍等，正在处理...\n📝 四星以下物品将自动卖出换取金币")
         
-        result = self.gacha_service.perform_draw(user_id, pool_id, num_draws=1000)
+        async with self._lock_users(user_id):
+            result = self.gacha_service.perform_draw(user_id, pool_id, num_draws=1000)
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
-                items = result.get("results", [])
+                # 统计结果
+                summary = _DrawSummary()
+                summary.add(result, 1000)
+                rarity_count = summary.rarity_count
+                # 只保留要显示的物品，超出显示数量的只计数
+                special_items = []  # 4星物品，不超过15件时全部显示
+                special_count = 0
+                ultra_rare_items = []  # 5星以上物品，最多显示10个
+                ultra_rare_count = 0
                 
-                # 统计结果 - 使用 defaultdict 自动处理任何稀有度
-                rarity_count = defaultdict(int)
-                coins_total = 0
-                special_items = []  # 4星物品
-                ultra_rare_items = []  # 5星以上物品
-                sold_items_summary = None
-                
-                for item in items:
-                    if item.get("type") == "coins":
-                        coins_total += item['quantity']
-                    elif item.get("type") == "sold_coins_summary":
-                        sold_items_summary = item
-                    elif item.get("type", "").startswith("sold_"):
-                        # 自动卖出的物品不显示在特殊物品中
-                        continue
+                for rarity, name in summary.rare_rewards:
+                    # 收集特殊物品
+                    if rarity >= 5:
+                        ultra_rare_count += 1
+                        if ultra_rare_count <= 10:
+                            ultra_rare_items.append(f"{yellow_stars(rarity)} {name}")
                     else:
-                        rarity = item.get('rarity', 1)
-                        rarity_count[rarity] += 1
-                        
-                        # 收集特殊物品
-                        if rarity >= 5:
-                            ultra_rare_items.append(f"{'⭐' * rarity} {item['name']}")
-                        elif rarity == 4:
-                            special_items.append(f"⭐⭐⭐⭐ {item['name']}")
+                        special_count += 1
+                        if special_count <= 15:
+                            special_items.append(_RARE_PREFIX + name)
                 
                 # 构建消息
-                message = f"🎊 千连抽卡完成！\n\n"
+                parts = ["🎊 千连抽卡完成！\n\n"]
+                append = parts.append
                 
                 # 稀有度统计（只显示保留的物品）
-                message += "📊 【保留物品统计】\n"
+                append("📊 【保留物品统计】\n")
                 kept_items_count = 0
+                percent_scale = 100 / 1000  # 件数换算为百分比的系数，只计算一次
                 for rarity in sorted(rarity_count.keys(), reverse=True):
                     if rarity_count[rarity] > 0:
-                        percentage = (rarity_count[rarity] / 1000) * 100
-                        message += f"{'⭐' * rarity}：{rarity_count[rarity]:,} 件 ({percentage:.1f}%)\n"
+                        append(f"{yellow_stars(rarity)}：{rarity_count[rarity]:,} 件 ({rarity_count[rarity] * percent_scale:.1f}%)\n")
                         kept_items_count += rarity_count[rarity]
                 
-                if coins_total > 0:
-                    normal_coins = coins_total
-                    if sold_items_summary:
-                        normal_coins = coins_total - sold_items_summary['quantity']
-                    if normal_coins > 0:
-                        message += f"💰 直接金币：{normal_coins:,}\n"
+                if summary.coins > 0:
+                    append(f"💰 直接金币：{summary.coins:,}\n")
                 
                 # 显示自动卖出汇总
-                if sold_items_summary:
-                    message += f"\n💸 【自动卖出汇总】\n"
-                    message += f"卖出数量：{sold_items_summary['sold_items_count']:,} 件\n"
-                    sold_by_rarity = sold_items_summary['sold_by_rarity']
+                if summary.sold_items_count:
+                    append("\n💸 【自动卖出汇总】\n")
+                    append(f"卖出数量：{summary.sold_items_count:,} 件\n")
+                    sold_by_rarity = summary.sold_by_rarity
                     for rarity in [1, 2, 3]:
-                        if sold_by_rarity.get(rarity, 0) > 0:
-                            percentage = (sold_by_rarity[rarity] / 1000) * 100
-                            message += f"{'⭐' * rarity}：{sold_by_rarity[rarity]:,} 件 ({percentage:.1f}%)\n"
-                    message += f"获得金币：{sold_items_summary['quantity']:,} 💰\n"
+                        if sold_by_rarity[rarity] > 0:
+                            append(f"{yellow_stars(rarity)}：{sold_by_rarity[rarity]:,} 件 ({sold_by_rarity[rarity] * percent_scale:.1f}%)\n")
+                    append(f"获得金币：{summary.sold_coins:,} 💰\n")
                 
                 # 显示5星以上物品（最珍贵的）
                 if ultra_rare_items:
-                    message += f"\n🌟 【传说物品 ({len(ultra_rare_items)}件)】\n"
-                    for item in ultra_rare_items[:10]:  # 最多显示10个5星以上
-                        message += f"{item}\n"
-                    if len(ultra_rare_items) > 10:
-                        message += f"...还有{len(ultra_rare_items)-10}件传说物品\n"
+                    append(f"\n🌟 【传说物品 ({ultra_rare_count}件)】\n")
+                    for item in ultra_rare_items:  # 最多显示10个5星以上
+                        append(f"{item}\n")
+                    if ultra_rare_count > 10:
+                        append(f"...还有{ultra_rare_count-10}件传说物品\n")
                 
                 # 显示4星物品
                 if special_items:
-                    message += f"\n⭐⭐⭐⭐ 【稀有物品 ({len(special_items)}件)】\n"
-                    if len(special_items) <= 15:  # 少于15件时详细显示
+                    append(f"\n{_RARE_PREFIX}【稀有物品 ({special_count}件)】\n")
+                    if special_count <= 15:  # 少于15件时详细显示
                         for item in special_items:
-                            message += f"{item}\n"
+                            append(f"{item}\n")
                     else:
                         # 只显示前10件
                         for item in special_items[:10]:
-                            message += f"{item}\n"
-                        message += f"...还有{len(special_items)-10}件稀有物品\n"
+                            append(f"{item}\n")
+                        append(f"...还有{special_count-10}件稀有物品\n")
                 
                 # 总结
-                total_kept = kept_items_count
-                total_sold = sold_items_summary['sold_items_count'] if sold_items_summary else 0
-                message += f"\n📋 总计：保留 {total_kept:,} 件，卖出 {total_sold:,} 件"
+                append(f"\n📋 总计：保留 {kept_items_count:,} 件，卖出 {summary.sold_items_count:,} 件")
                 
-                yield event.plain_result(message)
+                yield event.plain_result("".join(parts))
                 
             else:
                 yield event.plain_result(f"❌ 抽卡失败：{result['message']}")
@@ -1264,9 +1765,9 @@ class FishingPlugin(Star):
         """万连抽卡 - 终极批量抽奖，全面测试系统性能"""
         user_id = event.get_sender_id()
         
-        # 检查万连锁
-        if self.ten_thousand_gacha_lock:
-            current_user = self.ten_thousand_gacha_user
+        # 检查万连锁：检查与加锁之间没有 await，不会有两个万连同时通过检查
+        if self._ten_thousand_lock.locked():
+            current_user = self._ten_thousand_user
             if current_user == user_id:
                 yield event.plain_result("❌ 您已经在进行万连，请等待当前万连完成")
             else:
@@ -1277,21 +1778,25 @@ class FishingPlugin(Star):
                                     f"请稍后再试")
             return
         
-        args = event.message_str.split(" ")
-        user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 2:
-            yield event.plain_result("❌ 请指定要进行万连抽卡的抽奖池 ID，例如：/万连 1")
-            return
-        pool_id = args[1]
-        if not pool_id.isdigit():
-            yield event.plain_result("❌ 抽奖池 ID 必须是数字，请检查后重试。")
+        async with self._ten_thousand_lock:
+            self._ten_thousand_user = user_id
+            logger.info(f"用户 {user_id} 开始万连，已设置系统锁")
+            try:
+                async for result in self._run_ten_thousand_gacha(event, user_id):
+                    yield result
+            finally:
+                self._ten_thousand_user = None
+                logger.info(f"用户 {user_id} 万连结束，已释放系统锁")
+
+    async def _run_ten_thousand_gacha(self, event: AstrMessageEvent, user_id: str):
+        """万连的实际流程，由 ten_thousand_gacha 在持有万连锁时调用"""
+        pool_id, error = self._parse_pool_id(event, "❌ 请指定要进行万连抽卡的抽奖池 ID，例如：/万连 1")
+        if error:
+            yield event.plain_result(error)
             return
         
-        pool_id = int(pool_id)
-        
         # 获取抽奖池信息
-        pool_info = self.gacha_service.gacha_repo.get_pool_by_id(pool_id)
+        pool_info = self.gacha_service.get_pool(pool_id)
         if not pool_info:
             yield event.plain_result("❌ 指定的抽奖池不存在。")
             return
@@ -1322,38 +1827,43 @@ class FishingPlugin(Star):
         start_time = time.time()
         
         # 分批处理以避免内存问题（可选，如果单次10000有问题的话）
-        batch_size = 2000  # 每批2000次
-        total_results = []
+        batch_size = 2000  # 每批2000次，每批结束后才考虑发送进度
+        # 每批再拆成每次200抽的 perform_draw，各自单独提交，缩短每个写事务持有数据库写锁的时间，
+        # 其他用户的写入可在子批次之间完成，不会因等满 busy_timeout 而报 database is locked
+        sub_batch_size = 200
         processed = 0
         
+        # 统计逐批累加，每批结果统计完即丢弃，不保留全部抽奖结果
+        # 4星物品只按稀有度计数展示，只需逐件记录5星及以上物品
+        summary = _DrawSummary(rare_rarity=5)
+        
         try:
-            # 设置万连锁
-            self.ten_thousand_gacha_lock = True
-            self.ten_thousand_gacha_user = user_id
-            logger.info(f"用户 {user_id} 开始万连，已设置系统锁")
-            
-            
-            # 分5批处理
+            # 分5批处理，每批在线程中依次执行，避免阻塞事件循环
             failed_at_batch = -1
+            last_progress_ts = time.monotonic()
             for batch in range(5):
-                batch_result = self.gacha_service.perform_draw(user_id, pool_id, num_draws=batch_size)
-                if batch_result and batch_result["success"]:
-                    total_results.extend(batch_result.get("results", []))
-                    processed += batch_size
-                    
-                    # 进度提示
-                    if batch < 4:  # 不在最后一批显示进度
+                batch_ok = True
+                for _ in range(batch_size // sub_batch_size):
+                    # 每个子批次持有该用户的锁，其他修改该用户的命令在子批次之间执行，不会覆盖本次的扣费
+                    async with self._lock_users(user_id):
+                        batch_result = await asyncio.to_thread(self.gacha_service.perform_draw, user_id, pool_id,
+                                                               num_draws=sub_batch_size)
+                    self._invalidate_user_cache(user_id)
+                    if not (batch_result and batch_result["success"]):
+                        batch_ok = False
+                        break
+                    # 本次已扣费并提交，先计入已完成的抽数，再统计结果
+                    processed += sub_batch_size
+                    summary.add(batch_result, sub_batch_size)
+                if batch_ok:
+                    # 进度提示：不在最后一批显示进度，且距上次提示超过2秒才发送，消息频率与批次大小无关
+                    if batch < 4 and time.monotonic() - last_progress_ts > 2.0:
                         progress = ((batch + 1) / 5) * 100
                         yield event.plain_result(f"🔄 处理进度：{progress:.0f}% ({processed:,}/10,000)")
+                        last_progress_ts = time.monotonic()
                 else:
-                    # 记录失败的批次
+                    # 记录失败的批次；perform_draw 只在成功时扣费，已成功的子批次都已计入 processed，失败的那次及之后都不会扣费，无需退还
                     failed_at_batch = batch + 1
-                    # 如果某批失败，退还剩余费用
-                    remaining_batches = 5 - batch
-                    remaining_cost = remaining_batches * batch_size * pool_info.cost_coins
-                    if remaining_cost > 0:
-                        user.coins += remaining_cost
-                        self.user_repo.update(user)
                     break  # 跳出循环，但继续处理已完成的结果
             
             # 处理完成，统计结果
@@ -1364,131 +1874,121 @@ class FishingPlugin(Star):
             is_partial = failed_at_batch > 0
             actual_draws = processed
             actual_cost = actual_draws * pool_info.cost_coins
-            refunded_cost = total_cost - actual_cost if is_partial else 0
+            unspent_cost = total_cost - actual_cost if is_partial else 0
             
-            # 详细统计 - 使用defaultdict处理任意稀有度
-            rarity_count = defaultdict(int)
-            coins_from_draws = 0
-            special_items = []        # 4星物品
-            five_star_items = []      # 5星物品  
+            # 详细统计
+            rarity_count = summary.rarity_count
+            sold_items_total = summary.sold_items_count
+            sold_coins_total = summary.sold_coins
+            sold_by_rarity = summary.sold_by_rarity
+            # 特殊物品最多逐件格式化 _MAX_DETAIL_ITEMS 件，其余只计数
+            five_star_items = []      # 5星物品，数量较多时会单独发送完整列表
+            five_star_count = 0
             ultra_rare_items = []     # 6星以上物品
-            sold_items_total = 0
-            sold_coins_total = 0
-            sold_by_rarity = {1: 0, 2: 0, 3: 0}
-            
-            for item in total_results:
-                if item.get("type") == "coins":
-                    coins_from_draws += item['quantity']
-                elif item.get("type") == "sold_coins_summary":
-                    sold_items_total += item['sold_items_count']
-                    sold_coins_total += item['quantity']
-                    for rarity in [1, 2, 3]:
-                        sold_by_rarity[rarity] += item['sold_by_rarity'].get(rarity, 0)
-                elif item.get("type", "").startswith("sold_"):
-                    continue
-                else:
-                    rarity = item.get('rarity', 1)
-                    rarity_count[rarity] += 1
-                    
-                    # 收集特殊物品
-                    if rarity >= 6:  # 6星以上为终极稀有
-                        ultra_rare_items.append(f"{'⭐' * rarity} {item['name']}")
-                    elif rarity == 5:  # 5星为传说物品
-                        five_star_items.append(f"⭐⭐⭐⭐⭐ {item['name']}")
-                    elif rarity == 4:  # 4星为稀有物品
-                        special_items.append(f"⭐⭐⭐⭐ {item['name']}")
+            ultra_rare_count = 0
+            for rarity, name in summary.rare_rewards:
+                # 收集特殊物品
+                if rarity >= 6:  # 6星以上为终极稀有
+                    ultra_rare_count += 1
+                    if ultra_rare_count <= _MAX_DETAIL_ITEMS:
+                        ultra_rare_items.append(f"{yellow_stars(rarity)} {name}")
+                else:  # 5星为传说物品
+                    five_star_count += 1
+                    if five_star_count <= _MAX_DETAIL_ITEMS:
+                        five_star_items.append(_LEGEND_PREFIX + name)
             
             # 构建详细结果消息
             if is_partial:
-                message = f"⚠️ 万连部分完成（第{failed_at_batch}批出错）\n"
-                message += f"✅ 已完成：{actual_draws:,}/10,000 抽\n"
-                message += f"💰 已退还：{refunded_cost:,} 金币\n"
+                parts = [
+                    f"⚠️ 万连部分完成（第{failed_at_batch}批出错）\n",
+                    f"✅ 已完成：{actual_draws:,}/10,000 抽\n",
+                    f"💰 未扣费：{unspent_cost:,} 金币\n",
+                ]
             else:
-                message = f"🎊 万连抽卡完成！\n"
+                parts = ["🎊 万连抽卡完成！\n"]
+            append = parts.append
             
-            message += f"⏱️ 处理时间：{process_time:.1f}秒\n\n"
+            append(f"⏱️ 处理时间：{process_time:.1f}秒\n\n")
             
             # 核心统计
-            kept_items = sum(rarity_count.values())
-            message += f"📊 【核心统计】\n"
-            message += f"🎯 实际抽数：{actual_draws:,} 抽\n"
-            message += f"💎 保留物品：{kept_items:,} 件\n"
-            message += f"💸 卖出物品：{sold_items_total:,} 件\n"
-            message += f"💰 总获得金币：{coins_from_draws + sold_coins_total:,}\n"
+            kept_items = summary.kept_count
+            append("📊 【核心统计】\n")
+            append(f"🎯 实际抽数：{actual_draws:,} 抽\n")
+            append(f"💎 保留物品：{kept_items:,} 件\n")
+            append(f"💸 卖出物品：{sold_items_total:,} 件\n")
+            append(f"💰 总获得金币：{summary.coins + sold_coins_total:,}\n")
             if is_partial:
-                message += f"💵 实际花费：{actual_cost:,} 金币\n"
-            message += "\n"
+                append(f"💵 实际花费：{actual_cost:,} 金币\n")
+            append("\n")
             
-            # 保留物品详情（基于实际抽奖数计算百分比）
+            # 保留物品详情（基于实际抽奖数计算百分比，换算系数只计算一次）
+            percent_scale = 100 / actual_draws if actual_draws else 0
             if kept_items > 0:
-                message += f"🏆 【保留物品详情】\n"
+                append("🏆 【保留物品详情】\n")
                 for rarity in sorted(rarity_count.keys(), reverse=True):
                     if rarity_count[rarity] > 0:
-                        percentage = (rarity_count[rarity] / actual_draws) * 100
-                        message += f"{'⭐' * rarity}：{rarity_count[rarity]:,} 件 ({percentage:.2f}%)\n"
+                        append(f"{yellow_stars(rarity)}：{rarity_count[rarity]:,} 件 ({rarity_count[rarity] * percent_scale:.2f}%)\n")
             
             # 卖出汇总
             if sold_items_total > 0:
-                message += f"\n💸 【自动卖出详情】\n"
-                total_sold_percentage = (sold_items_total / actual_draws) * 100
-                message += f"卖出总数：{sold_items_total:,} 件 ({total_sold_percentage:.1f}%)\n"
+                append("\n💸 【自动卖出详情】\n")
+                append(f"卖出总数：{sold_items_total:,} 件 ({sold_items_total * percent_scale:.1f}%)\n")
                 for rarity in [1, 2, 3]:
                     if sold_by_rarity[rarity] > 0:
-                        percentage = (sold_by_rarity[rarity] / actual_draws) * 100
-                        message += f"{'⭐' * rarity}：{sold_by_rarity[rarity]:,} 件 ({percentage:.2f}%)\n"
-                message += f"获得金币：{sold_coins_total:,} 💰\n"
+                        append(f"{yellow_stars(rarity)}：{sold_by_rarity[rarity]:,} 件 ({sold_by_rarity[rarity] * percent_scale:.2f}%)\n")
+                append(f"获得金币：{sold_coins_total:,} 💰\n")
             
             # 6星以上物品展示（最珍贵的）
             if ultra_rare_items:
-                message += f"\n🎆🌟💎✨【！！！传！说！降！临！！！】✨💎🌟🎆\n"
-                message += f"🔥🔥🔥 恭喜您获得 {len(ultra_rare_items)} 件神话级传说物品！🔥🔥🔥\n"
-                message += f"💫━━━━━━━ 众神的馈赠 ━━━━━━━💫\n"
-                for i, item in enumerate(ultra_rare_items, 1):  # 6星以上全部显示
-                    message += f"⚡️👑✨ 第{i}神器：{item} ✨👑⚡️\n"
-                message += f"🎊🎊🎊 传说见证者，您已踏入神之领域！🎊🎊🎊\n"
+                append("\n🎆🌟💎✨【！！！传！说！降！临！！！】✨💎🌟🎆\n")
+                append(f"🔥🔥🔥 恭喜您获得 {ultra_rare_count} 件神话级传说物品！🔥🔥🔥\n")
+                append("💫━━━━━━━ 众神的馈赠 ━━━━━━━💫\n")
+                for i, item in enumerate(ultra_rare_items, 1):  # 6星以上全部显示（最多 _MAX_DETAIL_ITEMS 件）
+                    append(f"⚡️👑✨ 第{i}神器：{item} ✨👑⚡️\n")
+                if ultra_rare_count > _MAX_DETAIL_ITEMS:
+                    append(f"...还有{ultra_rare_count - _MAX_DETAIL_ITEMS}件神器\n")
+                append("🎊🎊🎊 传说见证者，您已踏入神之领域！🎊🎊🎊\n")
 
             # 5星物品展示
             if five_star_items:
-                message += f"\n🌟 【传说物品 ({len(five_star_items)}件)】\n"
+                append(f"\n🌟 【传说物品 ({five_star_count}件)】\n")
                 for item in five_star_items[:15]:  # 最多显示15个5星
-                    message += f"{item}\n"
-                if len(five_star_items) > 15:
-                    message += f"...还有{len(five_star_items)-15}件传说物品\n"
+                    append(f"{item}\n")
+                if five_star_count > 15:
+                    append(f"...还有{five_star_count-15}件传说物品\n")
             
             # 4星物品概览（数量较多时只显示总数）
             # four_star_count = rarity_count.get(4, 0)
             # if four_star_count > 0:
-            #     message += f"\n⭐⭐⭐⭐ 【稀有物品】：{four_star_count:,} 件\n"
+            #     append(f"\n⭐⭐⭐⭐ 【稀有物品】：{four_star_count:,} 件\n")
             #     if four_star_count <= 20:  # 少于20件时详细显示
             #         for item in special_items:
-            #             message += f"{item}\n"
+            #             append(f"{item}\n")
             #     else:
             #         # 只显示前20件
             #         for item in special_items[:20]:
-            #             message += f"{item}\n"
-            #         message += f"...还有{len(special_items)-20}件稀有物品\n"
+            #             append(f"{item}\n")
+            #         append(f"...还有{len(special_items)-20}件稀有物品\n")
             
             # 如果是部分完成，添加提醒信息
             if is_partial:
-                message += f"\n⚠️ 【重要提醒】\n"
-                message += f"由于第{failed_at_batch}批处理出错，万连提前结束\n"
-                message += f"已退还剩余 {refunded_cost:,} 金币到您的账户\n"
-                message += f"您可以稍后重试或联系管理员查看问题\n"
-            
-            yield event.plain_result(message)
+                append("\n⚠️ 【重要提醒】\n")
+                append(f"由于第{failed_at_batch}批处理出错，万连提前结束\n")
+                append(f"未完成的 {10000 - actual_draws:,} 抽没有扣费，剩余 {unspent_cost:,} 金币仍在您的账户中\n")
+                append("您可以稍后重试或联系管理员查看问题\n")
             
-            # 释放万连锁
-            self.ten_thousand_gacha_lock = False
-            self.ten_thousand_gacha_user = None
-            logger.info(f"用户 {user_id} 万连完成，已释放系统锁")
+            yield event.plain_result("".join(parts))
             
             # 如果有很多5星物品，单独发送详细列表
-            if len(five_star_items) > 15:
-                detail_message = f"🌟 【完整传说物品列表】({len(five_star_items)}件)\n"
+            if five_star_count > 15:
+                detail_parts = [f"🌟 【完整传说物品列表】({five_star_count}件)\n"]
                 for i, item in enumerate(five_star_items, 1):
-                    detail_message += f"{i}. {item}\n"
+                    detail_parts.append(f"{i}. {item}\n")
                     if i % 20 == 0 and i < len(five_star_items):
-                        detail_message += f"\n--- 第{i//20}批 ---\n"
+                        detail_parts.append(f"\n--- 第{i//20}批 ---\n")
+                if five_star_count > _MAX_DETAIL_ITEMS:
+                    detail_parts.append(f"...还有{five_star_count - _MAX_DETAIL_ITEMS}件传说物品\n")
+                detail_message = "".join(detail_parts)
                 
                 # 如果列表太长，使用转发消息
                 if len(detail_message) > 1000:
@@ -1498,71 +1998,43 @@ class FishingPlugin(Star):
                     yield event.plain_result(detail_message)
 
             # 如果有6星以上物品，也单独发送详细列表
-            if len(ultra_rare_items) > 0:
-                ultra_detail_message = f"🌟💎🎆【神话传说完整圣典】🎆💎🌟\n"
-                ultra_detail_message += f"🔮✨ 见证奇迹！您获得了{len(ultra_rare_items)}件传说中的神器！✨🔮\n"
-                ultra_detail_message += f"🏆👑 每一件都足以改变命运！👑🏆\n\n"
+            if ultra_rare_items:
+                ultra_parts = [
+                    "🌟💎🎆【神话传说完整圣典】🎆💎🌟\n",
+                    f"🔮✨ 见证奇迹！您获得了{ultra_rare_count}件传说中的神器！✨🔮\n",
+                    "🏆👑 每一件都足以改变命运！👑🏆\n\n",
+                ]
                 for i, item in enumerate(ultra_rare_items, 1):
-                    ultra_detail_message += f"🎇🔥 【神器 #{i}】🔥🎇\n"
-                    ultra_detail_message += f"⚡️💫 {item} 💫⚡️\n"
-                    ultra_detail_message += f"🌈━━━━━━━━━━━━━━━━━━━🌈\n"
-                ultra_detail_message += f"\n🎊🎉 恭喜传说钓鱼大师！您已成为神话的一部分！🎉🎊"
+                    ultra_parts.append(
+                        f"🎇🔥 【神器 #{i}】🔥🎇\n"
+                        f"⚡️💫 {item} 💫⚡️\n"
+                        "🌈━━━━━━━━━━━━━━━━━━━🌈\n"
+                    )
+                if ultra_rare_count > _MAX_DETAIL_ITEMS:
+                    ultra_parts.append(f"...还有{ultra_rare_count - _MAX_DETAIL_ITEMS}件神器\n")
+                ultra_parts.append("\n🎊🎉 恭喜传说钓鱼大师！您已成为神话的一部分！🎉🎊")
                 
-                yield event.plain_result(ultra_detail_message)
+                yield event.plain_result("".join(ultra_parts))
             
         except Exception as e:
             logger.error(f"万连抽卡出错: {e}", exc_info=True)
-            # 出错时尝试退还费用，但要考虑可能已经处理了部分批次
-            try:
-                # 如果还没开始处理或者在第一批就出错，全额退还
-                if processed == 0:
-                    user = self.user_repo.get_by_id(user_id)
-                    user.coins += total_cost  # 全额退还
-                    self.user_repo.update(user)
-                    yield event.plain_result(f"❌ 万连启动失败，已全额退还 {total_cost:,} 金币：{str(e)}")
+            # 每批抽奖在各自的事务中扣费，出错的批次已整体回滚，未完成的抽奖不会扣费，无需退款
+            unspent_cost = total_cost - processed * pool_info.cost_coins
+            if processed == 0:
+                yield event.plain_result(f"❌ 万连启动失败，未扣除任何金币：{str(e)}")
+            else:
+                # 显示部分完成的统计（简化版），直接使用逐批累加的统计
+                kept_count = summary.kept_count
+                if kept_count or summary.sold_items_count:
+                    yield event.plain_result(f"⚠️ 万连异常中止，但已完成 {processed:,} 抽\n"
+                                        f"📦 获得物品：{kept_count} 件保留，{summary.sold_items_count} 件卖出\n"
+                                        f"💰 获得金币：{summary.sold_coins:,}\n"
+                                        f"💵 未扣除剩余费用：{unspent_cost:,} 金币\n"
+                                        f"❌ 错误信息：{str(e)}")
                 else:
-                    # 如果已经处理了部分，只退还剩余部分
-                    actual_cost = processed * pool_info.cost_coins
-                    remaining_cost = total_cost - actual_cost
-                    
-                    if remaining_cost > 0:
-                        user = self.user_repo.get_by_id(user_id)
-                        user.coins += remaining_cost
-                        self.user_repo.update(user)
-                    
-                    # 显示部分完成的统计（简化版）
-                    if total_results:
-                        kept_count = 0
-                        sold_count = 0
-                        sold_coins = 0
-                        for item in total_results:
-                            if item.get("type") == "sold_coins_summary":
-                                sold_count += item['sold_items_count']
-                                sold_coins += item['quantity']
-                            elif not item.get("type", "").startswith("sold_"):
-                                kept_count += 1
-                        
-                        yield event.plain_result(f"⚠️ 万连异常中止，但已完成 {processed:,} 抽\n"
-                                            f"📦 获得物品：{kept_count} 件保留，{sold_count} 件卖出\n"
-                                            f"💰 获得金币：{sold_coins:,}\n"
-                                            f"💵 已退还剩余费用：{remaining_cost:,} 金币\n"
-                                            f"❌ 错误信息：{str(e)}")
-                    else:
-                        yield event.plain_result(f"❌ 万连在处理 {processed:,} 抽后出错\n"
-                                            f"💵 已退还剩余 {remaining_cost:,} 金币\n"
-                                            f"请联系管理员：{str(e)}")
-            
-            except Exception as refund_error:
-                yield event.plain_result(f"❌ 万连处理出错且退款失败！\n"
-                                    f"已处理：{processed:,} 抽\n"
-                                    f"原错误：{str(e)}\n"
-                                    f"退款错误：{str(refund_error)}\n"
-                                    f"请立即联系管理员处理")
-        finally:
-            # 确保无论如何都释放锁
-            self.ten_thousand_gacha_lock = False
-            self.ten_thousand_gacha_user = None
-            logger.info(f"用户 {user_id} 万连异常结束，已释放系统锁")
+                    yield event.plain_result(f"❌ 万连在处理 {processed:,} 抽后出错\n"
+                                        f"💵 剩余 {unspent_cost:,} 金币未扣除\n"
+                                        f"请联系管理员：{str(e)}")
 
     @filter.command("查看卡池")
     async def view_gacha_pool(self, event: AstrMessageEvent):
@@ -1572,21 +2044,23 @@ class FishingPlugin(Star):
             yield event.plain_result("❌ 请指定要查看的卡池 ID，例如：/查看卡池 1")
             return
         pool_id = args[1]
-        if not pool_id.isdigit():
+        pool_id = parse_non_negative_int(pool_id)
+        if pool_id is None:
             yield event.plain_result("❌ 卡池 ID 必须是数字，请检查后重试。")
             return
-        pool_id = int(pool_id)
         result = self.gacha_service.get_pool_details(pool_id)
         if result:
             if result["success"]:
                 pool = result.get("pool", {})
-                message = "【🎰 卡池详情】\n\n"
-                message += f"ID: {pool['gacha_pool_id']} - {pool['name']}\n"
-                message += f"描述: {pool['description']}\n"
-                message += f"花费: {pool['cost_coins']} 金币 / 次\n"
-                message += f"十连花费: {pool['cost_coins'] * 10} 金币\n"
-                message += f"百连花费: {pool['cost_coins'] * 100} 金币\n\n"
-                message += "【📋 物品概率】\n"
+                parts = [
+                    "【🎰 卡池详情】\n\n",
+                    f"ID: {pool['gacha_pool_id']} - {pool['name']}\n",
+                    f"描述: {pool['description']}\n",
+                    f"花费: {pool['cost_coins']} 金币 / 次\n",
+                    f"十连花费: {pool['cost_coins'] * 10} 金币\n",
+                    f"百连花费: {pool['cost_coins'] * 100} 金币\n\n",
+                    "【📋 物品概率】\n",
+                ]
 
                 if result["probabilities"]:
                     for item in result["probabilities"]:
@@ -1598,8 +2072,8 @@ class FishingPlugin(Star):
                             percentage = probability * 100
                         probability_str = f"{percentage:.8f}%"
                         
-                        message += f" - {'⭐' * item.get('item_rarity', 0)} {item['item_name']} (概率: {probability_str})\n"
-                yield event.plain_result(message)
+                        parts.append(f" - {yellow_stars(item.get('item_rarity', 0))} {item['item_name']} (概率: {probability_str})\n")
+                yield event.plain_result("".join(parts))
             else:
                 yield event.plain_result(f"❌ 查看卡池失败：{result['message']}")
         else:
@@ -1616,11 +2090,11 @@ class FishingPlugin(Star):
                 if not history:
                     yield event.plain_result("📜 您还没有抽卡记录。")
                     return
-                message = "【📜 抽卡记录】\n\n"
+                parts = ["【📜 抽卡记录】\n\n"]
                 for record in history:
-                    message += f"物品名称: {record['item_name']} (稀有度: {'⭐' * record['rarity']})\n"
-                    message += f"时间: {safe_datetime_handler(record['timestamp'])}\n\n"
-                yield event.plain_result(message)
+                    parts.append(f"物品名称: {record['item_name']} (稀有度: {yellow_stars(record['rarity'])})\n"
+                                 f"时间: {safe_datetime_handler(record['timestamp'])}\n\n")
+                yield event.plain_result("".join(parts))
             else:
                 yield event.plain_result(f"❌ 查看抽卡记录失败：{result['message']}")
         else:
@@ -1635,24 +2109,19 @@ class FishingPlugin(Star):
             yield event.plain_result("💸 请指定要擦弹的数量 ID，例如：/擦弹 123456789")
             return
         contribution_amount = args[1]
-        if contribution_amount in ['allin', 'halfin', '梭哈', '梭一半']:
-            # 查询用户当前金币数量
-            user = self.user_repo.get_by_id(user_id)
-            if user:
-                coins = user.coins
-            else:
-                yield event.plain_result("❌ 您还没有注册，请先使用 /注册 命令注册。")
+        # 梭哈/梭一半的金额由服务在读取用户时按当前金币计算，无需在此额外查询一次
+        mode = _WIPE_BOMB_MODES.get(contribution_amount)
+        if mode is not None:
+            contribution_amount = 0
+        # 判断是否为非负整数
+        else:
+            contribution_amount = parse_non_negative_int(contribution_amount)
+            if contribution_amount is None:
+                yield event.plain_result("❌ 擦弹数量必须是数字，请检查后重试。")
                 return
-            if contribution_amount == 'allin' or contribution_amount == '梭哈':
-                contribution_amount = coins
-            elif contribution_amount == 'halfin' or contribution_amount == '梭一半':
-                contribution_amount = coins // 2
-            contribution_amount = str(contribution_amount)
-        # 判断是否为int或数字字符串
-        if not contribution_amount.isdigit():
-            yield event.plain_result("❌ 擦弹数量必须是数字，请检查后重试。")
-            return
-        result = self.game_mechanics_service.perform_wipe_bomb(user_id, int(contribution_amount))
+        async with self._lock_users(user_id):
+            result = self.game_mechanics_service.perform_wipe_bomb(user_id, contribution_amount, mode=mode)
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
                 message = ""
@@ -1693,23 +2162,23 @@ class FishingPlugin(Star):
                 if not history:
                     yield event.plain_result("📜 您还没有擦弹记录。")
                     return
-                message = "【📜 擦弹记录】\n\n"
+                parts = ["【📜 擦弹记录】\n\n"]
+                append = parts.append
+                fmt_ts = safe_datetime_handler
                 for record in history:
-                    # 添加一点emoji
-                    message += f"⏱️ 时间: {safe_datetime_handler(record['timestamp'])}\n"
-                    message += f"💸 投入: {record['contribution']} 金币, 🎁 奖励: {record['reward']} 金币\n"
+                    contribution, reward, multiplier = record["contribution"], record["reward"], record["multiplier"]
                     # 计算盈亏
-                    profit = record["reward"] - record["contribution"]
-                    profit_text = f"盈利: +{profit}" if profit >= 0 else f"亏损: {profit}"
-                    profit_emoji = "📈" if profit >= 0 else "📉"
-
-                    if record["multiplier"] >= 3:
-                        message += f"🔥 倍率: {record['multiplier']} ({profit_emoji} {profit_text})\n\n"
-                    elif record["multiplier"] >= 1:
-                        message += f"✨ 倍率: {record['multiplier']} ({profit_emoji} {profit_text})\n\n"
+                    profit = reward - contribution
+                    if profit >= 0:
+                        profit_emoji, profit_text = "📈", f"盈利: +{profit}"
                     else:
-                        message += f"💔 倍率: {record['multiplier']} ({profit_emoji} {profit_text})\n\n"
-                yield event.plain_result(message)
+                        profit_emoji, profit_text = "📉", f"亏损: {profit}"
+                    # 添加一点emoji
+                    icon = "🔥" if multiplier >= 3 else "✨" if multiplier >= 1 else "💔"
+                    append(f"⏱️ 时间: {fmt_ts(record['timestamp'])}\n"
+                           f"💸 投入: {contribution} 金币, 🎁 奖励: {reward} 金币\n"
+                           f"{icon} 倍率: {multiplier} ({profit_emoji} {profit_text})\n\n")
+                yield event.plain_result("".join(parts))
             else:
                 yield event.plain_result(f"❌ 查看擦弹记录失败：{result['message']}")
         else:
@@ -1719,40 +2188,49 @@ class FishingPlugin(Star):
     @filter.command("排行榜", alias={"phb"})
     async def ranking(self, event: AstrMessageEvent):
         """查看排行榜"""
-        user_data = self.user_service.get_leaderboard_data().get("leaderboard", [])
+        # 排行数据的查询涉及多表聚合，短时间内的重复请求直接复用
+        cached_at, user_data = self._leaderboard_cache
+        if user_data is None or time.monotonic() - cached_at >= self._ranking_cache_ttl:
+            user_data = self.user_service.get_leaderboard_data().get("leaderboard", [])
+            self._leaderboard_cache = (time.monotonic(), user_data)
         if not user_data:
             yield event.plain_result("❌ 当前没有排行榜数据。")
             return
-        for user in user_data:
-            if user["title"] is None:
-                user["title"] = "无称号"
-            if user["accessory"] is None:
-                user["accessory"] = "无饰品"
-            if user["fishing_rod"] is None:
-                user["fishing_rod"] = "无鱼竿"
         # logger.info(f"用户数据: {user_data}")
-        draw_fishing_ranking(user_data, output_path="fishing_ranking.png")
-        yield event.image_result("fishing_ranking.png")
+        from astrbot.api.message_components import Image
+        # 排行数据未变化且图片仍在有效期内时，直接复用上次绘制的图片
+        cache_key = hashlib.blake2b(repr(user_data).encode(), digest_size=16).digest()
+        async with self._ranking_draw_lock:
+            cached_key, drawn_at, png_bytes = self._ranking_cache
+            if cache_key != cached_key or time.monotonic() - drawn_at >= self._ranking_cache_ttl:
+                # 绘制到内存中，不再写共享的 fishing_ranking.png，发送时不会读到写了一半的文件
+                async with self._draw_semaphore:
+                    png_bytes = await asyncio.to_thread(self._render_ranking_png, user_data)
+                self._ranking_cache = (cache_key, time.monotonic(), png_bytes)
+        yield event.chain_result([Image.fromBytes(png_bytes)])
+
+    @staticmethod
+    def _render_ranking_png(user_data: list) -> bytes:
+        """绘制排行榜图片并直接编码到内存中"""
+        buffer = io.BytesIO()
+        draw_fishing_ranking(user_data, output_path=buffer)
+        return buffer.getvalue()
 
     @filter.command("偷鱼")
     async def steal_fish(self, event: AstrMessageEvent):
         """偷鱼功能"""
         user_id = event.get_sender_id()
-        message_obj = event.message_obj
-        target_id = None
-        if hasattr(message_obj, "message"):
-            # 检查消息中是否有At对象
-            for comp in message_obj.message:
-                if isinstance(comp, At):
-                    target_id = comp.qq
-                    break
+        # 取消息中第一个At对象作为偷鱼目标
+        target_id = next((comp.qq for comp in getattr(event.message_obj, "message", ()) if isinstance(comp, At)), None)
         if target_id is None:
             yield event.plain_result("请在消息中@要偷鱼的用户")
             return
         if int(target_id) == int(user_id):
             yield event.plain_result("不能偷自己的鱼哦！")
             return
-        result = self.game_mechanics_service.steal_fish(user_id, target_id)
+        async with self._lock_users(user_id, target_id):
+            result = self.game_mechanics_service.steal_fish(user_id, target_id)
+        self._invalidate_user_cache(user_id, str(target_id))
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -1767,10 +2245,11 @@ class FishingPlugin(Star):
         user_id = event.get_sender_id()
         titles = self.user_service.get_user_titles(user_id).get("titles", [])
         if titles:
-            message = "【🏅 您的称号】\n"
+            parts = ["【🏅 您的称号】\n"]
+            append = parts.append
             for title in titles:
-                message += f"- {title['name']} (ID: {title['title_id']})\n- 描述: {title['description']}\n\n"
-            yield event.plain_result(message)
+                append(f"- {title['name']} (ID: {title['title_id']})\n- 描述: {title['description']}\n\n")
+            yield event.plain_result("".join(parts))
         else:
             yield event.plain_result("❌ 您还没有任何称号，快去完成成就或参与活动获取吧！")
 
@@ -1784,10 +2263,13 @@ class FishingPlugin(Star):
             yield event.plain_result("❌ 请指定要使用的称号 ID，例如：/使用称号 1")
             return
         title_id = args[1]
-        if not title_id.isdigit():
+        title_id = parse_non_negative_int(title_id)
+        if title_id is None:
             yield event.plain_result("❌ 称号 ID 必须是数字，请检查后重试。")
             return
-        result = self.user_service.use_title(user_id, int(title_id))
+        async with self._lock_users(user_id):
+            result = self.user_service.use_title(user_id, title_id)
+        self._invalidate_user_cache(user_id)
         if result:
             if result["success"]:
                 yield event.plain_result(result["message"])
@@ -1802,16 +2284,19 @@ class FishingPlugin(Star):
         user_id = event.get_sender_id()
         achievements = self.achievement_service.get_user_achievements(user_id).get("achievements", [])
         if achievements:
-            message = "【🏆 您的成就】\n"
+            parts = ["【🏆 您的成就】\n"]
+            append = parts.append
+            fmt_ts = safe_datetime_handler
             for achievement in achievements:
-                message += f"- {achievement['name']} (ID: {achievement['id']})\n"
-                message += f"  描述: {achievement['description']}\n"
-                if achievement.get("completed_at"):
-                    message += f"  完成时间: {safe_datetime_handler(achievement['completed_at'])}\n"
+                completed_at = achievement.get("completed_at")
+                if completed_at:
+                    status = f"  完成时间: {fmt_ts(completed_at)}\n"
                 else:
-                    message += "  进度: {}/{}\n".format(achievement["progress"], achievement["target"])
-            message += "请继续努力完成更多成就！"
-            yield event.plain_result(message)
+                    status = f"  进度: {achievement['progress']}/{achievement['target']}\n"
+                append(f"- {achievement['name']} (ID: {achievement['id']})\n"
+                       f"  描述: {achievement['description']}\n{status}")
+            append("请继续努力完成更多成就！")
+            yield event.plain_result("".join(parts))
         else:
             yield event.plain_result("❌ 您还没有任何成就，快去完成任务或参与活动获取吧！")
 
@@ -1826,12 +2311,14 @@ class FishingPlugin(Star):
                 if not records:
                     yield event.plain_result("📜 您还没有税收记录。")
                     return
-                message = "【📜 税收记录】\n\n"
+                parts = ["【📜 税收记录】\n\n"]
+                append = parts.append
+                fmt_ts = safe_datetime_handler
                 for record in records:
-                    message += f"⏱️ 时间: {safe_datetime_handler(record['timestamp'])}\n"
-                    message += f"💰 金额: {record['amount']} 金币\n"
-                    message += f"📊 描述: {record['tax_type']}\n\n"
-                yield event.plain_result(message)
+                    append(f"⏱️ 时间: {fmt_ts(record['timestamp'])}\n"
+                           f"💰 金额: {record['amount']} 金币\n"
+                           f"📊 描述: {record['tax_type']}\n\n")
+                yield event.plain_result("".join(parts))
             else:
                 yield event.plain_result(f"❌ 查看税收记录失败：{result['message']}")
         else:
@@ -1847,36 +2334,41 @@ class FishingPlugin(Star):
             if result:
                 if result["success"]:
                     zones = result.get("zones", [])
-                    message = f"【🌊 钓鱼区域】\n"
+                    parts = ["【🌊 钓鱼区域】\n"]
+                    append = parts.append
                     for zone in zones:
-                        message += f"区域名称: {zone['name']} (ID: {zone['zone_id']}) {'✅' if zone['whether_in_use'] else ''}\n"
-                        message += f"描述: {zone['description']}\n"
+                        append(f"区域名称: {zone['name']} (ID: {zone['zone_id']}) {'✅' if zone['whether_in_use'] else ''}\n")
+                        append(f"描述: {zone['description']}\n")
                         if zone['zone_id'] >= 2:
-                            message += f"剩余稀有鱼类数量: {zone['daily_rare_fish_quota'] - zone['rare_fish_caught_today']}）\n"
-                    message += "使用「/钓鱼区域 ID」命令切换钓鱼区域。\n"
-                    yield event.plain_result(message)
+                            append(f"剩余稀有鱼类数量: {zone['daily_rare_fish_quota'] - zone['rare_fish_caught_today']}）\n")
+                    append("使用「/钓鱼区域 ID」命令切换钓鱼区域。\n")
+                    yield event.plain_result("".join(parts))
                 else:
                     yield event.plain_result(f"❌ 查看钓鱼区域失败：{result['message']}")
             else:
                 yield event.plain_result("❌ 出错啦！请稍后再试。")
             return
         zone_id = args[1]
-        if not zone_id.isdigit():
+        zone_id = parse_non_negative_int(zone_id)
+        if zone_id is None:
             yield event.plain_result("❌ 钓鱼区域 ID 必须是数字，请检查后重试。")
             return
-        zone_id = int(zone_id)
         if zone_id not in [1, 2, 3]:
             yield event.plain_result("❌ 钓鱼区域 ID 必须是 1、2 或 3，请检查后重试。")
             return
         # 切换用户的钓鱼区域
-        result = self.fishing_service.set_user_fishing_zone(user_id, zone_id)
+        async with self._lock_users(user_id):
+            result = self.fishing_service.set_user_fishing_zone(user_id, zone_id)
+        self._invalidate_user_cache(user_id)
         yield event.plain_result(result["message"] if result else "❌ 出错啦！请稍后再试。")
 
     @filter.command("钓鱼帮助", alias={"钓鱼菜单", "菜单"})
     async def fishing_help(self, event: AstrMessageEvent):
         """显示钓鱼插件帮助信息"""
-        image = draw_help_image()
-        yield event.image_result(image)
+        if self._help_image_path is None or not os.path.exists(self._help_image_path):
+            async with self._draw_semaphore:
+                self._help_image_path = await asyncio.to_thread(draw_help_image)
+        yield event.image_result(self._help_image_path)
 
     @filter.command("鱼类图鉴")
     async def fish_pokedex(self, event: AstrMessageEvent):
@@ -1891,29 +2383,37 @@ class FishingPlugin(Star):
                     yield event.plain_result("❌ 您还没有捕捉到任何鱼类，快去钓鱼吧！")
                     return
 
-                message = "【🐟 🌊 鱼类图鉴 📖 🎣】\n"
-                message += f"🏆 解锁进度：{to_percentage(1.0 + result['unlocked_percentage'])}\n"
-                message += f"📊 收集情况：{result['unlocked_fish_count']} / {result['total_fish_count']} 种\n"
-
-                for fish in pokedex:
-                    rarity = fish["rarity"]
-
-                    message += f" - {fish['name']} ({'✨' * rarity})\n"
-                    message += f"💎 价值：{fish['value']} 金币\n"
-                    message += f"🕰️ 首次捕获：{safe_datetime_handler(fish['first_caught_time'])}\n"
-                    message += f"📜 描述：{fish['description']}\n"
-
-                if len(message) <= 500:
-                    yield event.plain_result(message)
-                    return
+                header = (
+                    "【🐟 🌊 鱼类图鉴 📖 🎣】\n"
+                    f"🏆 解锁进度：{to_percentage(1.0 + result['unlocked_percentage'])}\n"
+                    f"📊 收集情况：{result['unlocked_fish_count']} / {result['total_fish_count']} 种\n"
+                )
 
                 text_chunk_size = 1000  # 每个Plain文本块的最大字数
                 node_chunk_size = 4  # 每个Node中最多包含的Plain文本块数量
-                text_chunks = [message[i:i + text_chunk_size] for i in
-                               range(0, len(message), text_chunk_size)]
+                # 逐条生成图鉴条目并直接装入文本块，条目不会被拆到两个文本块中
+                text_chunks = []
+                chunk = [header]
+                chunk_len = len(header)
+                fmt_ts = safe_datetime_handler
+                for fish in pokedex:
+                    entry = (f" - {fish['name']} ({'✨' * fish['rarity']})\n"
+                             f"💎 价值：{fish['value']} 金币\n"
+                             f"🕰️ 首次捕获：{fmt_ts(fish['first_caught_time'])}\n"
+                             f"📜 描述：{fish['description']}\n")
+                    entry_len = len(entry)
+                    if chunk_len + entry_len > text_chunk_size:
+                        text_chunks.append("".join(chunk))
+                        chunk = [entry]
+                        chunk_len = entry_len
+                    else:
+                        chunk.append(entry)
+                        chunk_len += entry_len
+                text_chunks.append("".join(chunk))
 
-                if not text_chunks:
-                    yield event.plain_result("❌ 内容为空，无法发送。")
+                # 一个文本块就能放下时直接发送普通消息，无需构造转发节点
+                if len(text_chunks) == 1:
+                    yield event.plain_result(text_chunks[0])
                     return
 
                 grouped_chunks = [text_chunks[i:i + node_chunk_size] for i in
@@ -1947,19 +2447,14 @@ class FishingPlugin(Star):
     async def modify_coins(self, event: AstrMessageEvent):
         """修改用户金币"""
         user_id = event.get_sender_id()
-        args = event.message_str.split(" ")
-        if len(args) < 3:
-            yield event.plain_result("❌ 请指定要修改的用户 ID 和金币数量，例如：/修改金币 123456789 1000")
-            return
-        target_user_id = args[1]
-        if not target_user_id.isdigit():
-            yield event.plain_result("❌ 用户 ID 必须是数字，请检查后重试。")
-            return
-        coins = args[2]
-        if not coins.isdigit():
-            yield event.plain_result("❌ 金币数量必须是数字，请检查后重试。")
-            return
-        result = self.user_service.modify_user_coins(target_user_id, int(coins))
+        target_user_id, coins, error = self._parse_coin_args(
+            event, "❌ 请指定要修改的用户 ID 和金币数量，例如：/修改金币 123456789 1000")
+        if error:
+            yield event.plain_result(error)
+            return
+        result = self.user_service.modify_user_coins(target_user_id, coins)
+        self._invalidate_user_cache(target_user_id)
+        self._invalidate_ranking_cache()
         if result:
             yield event.plain_result(f"✅ 成功修改用户 {target_user_id} 的金币数量为 {coins} 金币")
         else:
@@ -1969,56 +2464,36 @@ class FishingPlugin(Star):
     @filter.command("奖励金币")
     async def reward_coins(self, event: AstrMessageEvent):
         """奖励用户金币"""
-        args = event.message_str.split(" ")
-        if len(args) < 3:
-            yield event.plain_result("❌ 请指定要奖励的用户 ID 和金币数量，例如：/奖励金币 123456789 1000")
-            return
-        target_user_id = args[1]
-        if not target_user_id.isdigit():
-            yield event.plain_result("❌ 用户 ID 必须是数字，请检查后重试。")
-            return
-        coins = args[2]
-        if not coins.isdigit():
-            yield event.plain_result("❌ 金币数量必须是数字，请检查后重试。")
-            return
-        current_coins = self.user_service.get_user_currency(target_user_id)
-        if current_coins is None:
-            yield event.plain_result("❌ 用户不存在或未注册，请检查后重试。")
-            return
-        result = self.user_service.modify_user_coins(target_user_id, int(current_coins.get('coins') + int(coins)))
-        if result:
+        target_user_id, coins, error = self._parse_coin_args(
+            event, "❌ 请指定要奖励的用户 ID 和金币数量，例如：/奖励金币 123456789 1000")
+        if error:
+            yield event.plain_result(error)
+            return
+        result = self.user_service.adjust_user_coins(target_user_id, coins)
+        self._invalidate_user_cache(target_user_id)
+        self._invalidate_ranking_cache()
+        if result["success"]:
             yield event.plain_result(f"✅ 成功给用户 {target_user_id} 奖励 {coins} 金币")
         else:
-            yield event.plain_result("❌ 出错啦！请稍后再试。")
+            yield event.plain_result(f"❌ {result['message']}")
 
     @filter.permission_type(PermissionType.ADMIN)
     @filter.command("扣除金币")
     async def deduct_coins(self, event: AstrMessageEvent):
         """扣除用户金币"""
-        args = event.message_str.split(" ")
-        if len(args) < 3:
-            yield event.plain_result("❌ 请指定要扣除的用户 ID 和金币数量，例如：/扣除金币 123456789 1000")
-            return
-        target_user_id = args[1]
-        if not target_user_id.isdigit():
-            yield event.plain_result("❌ 用户 ID 必须是数字，请检查后重试。")
-            return
-        coins = args[2]
-        if not coins.isdigit():
-            yield event.plain_result("❌ 金币数量必须是数字，请检查后重试。")
-            return
-        current_coins = self.user_service.get_user_currency(target_user_id)
-        if current_coins is None:
-            yield event.plain_result("❌ 用户不存在或未注册，请检查后重试。")
-            return
-        if int(coins) > current_coins.get('coins'):
-            yield event.plain_result("❌ 扣除的金币数量不能超过用户当前拥有的金币数量")
-            return
-        result = self.user_service.modify_user_coins(target_user_id, int(current_coins.get('coins') - int(coins)))
-        if result:
+        target_user_id, coins, error = self._parse_coin_args(
+            event, "❌ 请指定要扣除的用户 ID 和金币数量，例如：/扣除金币 123456789 1000")
+        if error:
+            yield event.plain_result(error)
+            return
+        # 金币不足时不会扣除，由一次原子更新完成检查与扣除
+        result = self.user_service.adjust_user_coins(target_user_id, -coins)
+        self._invalidate_user_cache(target_user_id)
+        self._invalidate_ranking_cache()
+        if result["success"]:
             yield event.plain_result(f"✅ 成功扣除用户 {target_user_id} 的 {coins} 金币")
         else:
-            yield event.plain_result("❌ 出错啦！请稍后再试。")
+            yield event.plain_result(f"❌ {result['message']}")
 
     @filter.permission_type(PermissionType.ADMIN)
     @filter.command("开启钓鱼后台管理")
@@ -2040,22 +2515,35 @@ class FishingPlugin(Star):
                 secret_key=self.secret_key,
                 services=services_to_inject
             )
+            # 应用完成启动（lifespan startup）时置位，无需反复连接端口探测
+            ready = asyncio.Event()
+
+            async def _mark_ready():
+                ready.set()
+
+            app.before_serving(_mark_ready)
             config = Config()
             config.bind = [f"0.0.0.0:{self.port}"]
             self.web_admin_task = asyncio.create_task(serve(app, config))
+            # 获取公网IP与服务启动互不依赖，同时进行
+            ip_task = asyncio.create_task(get_public_ip())
 
-            # 等待服务启动并获取公网IP
-            for i in range(10):
-                if await self._check_port_active():
-                    break
-                await asyncio.sleep(1)
-            else:
+            # 等待服务启动，服务任务提前结束说明启动失败
+            ready_task = asyncio.create_task(ready.wait())
+            done, _ = await asyncio.wait(
+                {ready_task, self.web_admin_task}, timeout=10, return_when=asyncio.FIRST_COMPLETED
+            )
+            if ready_task not in done:
+                ready_task.cancel()
+                ip_task.cancel()
+                if self.web_admin_task in done:
+                    raise Exception(f"服务启动失败：{self.web_admin_task.exception()}")
+                self.web_admin_task.cancel()
                 raise Exception("⌛ 启动超时，请检查防火墙设置")
 
-            public_ip = await get_public_ip()
-            await asyncio.sleep(1)  # 等待服务启动
-            if public_ip is None:
-                public_ip = "localhost"
+            public_ip = await ip_task or "localhost"
+            if self.web_admin_task.done():
+                raise Exception(f"服务启动失败：{self.web_admin_task.exception()}")
 
             yield event.plain_result(f"✅ 钓鱼后台已启动！\n🔗请访问 http://{public_ip}:{self.port}/admin\n🔑 密钥请到配置文件中查看")
         except Exception as e:
@@ -2084,459 +2572,223 @@ class FishingPlugin(Star):
             logger.error(f"关闭钓鱼后台管理时发生意外错误: {e}", exc_info=True)
             yield event.plain_result(f"❌ 关闭钓鱼后台管理失败: {e}")
 
-    async def _check_port_active(self):
-        """验证端口是否实际已激活"""
-        try:
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_connection("127.0.0.1", self.port),
-                timeout=1
-            )
-            writer.close()
-            return True
-        except:  # noqa: E722
-            return False
-
     async def terminate(self):
         """插件被卸载/停用时调用"""
         logger.info("钓鱼插件正在终止...")
         self.fishing_service.stop_auto_fishing_task()
         self.achievement_service.stop_achievement_check_task()
-        if self.web_admin_task:
+        if self.web_admin_task and not self.web_admin_task.done():
             self.web_admin_task.cancel()
+            # 等待后台服务真正退出并释放端口，避免下次启动时端口仍被占用
+            await asyncio.gather(self.web_admin_task, return_exceptions=True)
         logger.info("钓鱼插件已成功终止。")
 
 
-    @filter.permission_type(PermissionType.ADMIN)
-    @filter.command("批量添加鱼类")
-    async def batch_add_fish(self, event: AstrMessageEvent):
-        """批量添加鱼类"""
-        message_lines = event.message_str.split('\n')
-        if len(message_lines) < 2:
-            help_text = """📋 批量添加鱼类格式说明：
-    /批量添加鱼类
-    名称|描述|稀有度|基础价值|最小重量|最大重量|图标URL
-    小鲫鱼|一条非常常见的小鱼。|1|10|100|500|None
-    泥鳅|滑溜溜的小家伙。|1|15|50|200|None
+    @staticmethod
+    def _batch_add_result(item_name: str, added_count: int, errors: _BatchErrors) -> str:
+        """构建批量添加命令的结果消息，最多列出前5个错误"""
+        parts = [f"✅ 批量添加完成！\n📈 成功添加: {added_count} 个{item_name}"]
+        error_count = errors.count
+        if error_count > 0:
+            parts.append(f"\n❌ 失败: {error_count} 个")
+            if error_count <= errors.limit:
+                parts.append("\n错误详情:\n")
+                parts.append("\n".join(errors.messages))
+            else:
+                parts.append(f"\n错误详情(显示前{errors.limit}个):\n")
+                parts.append("\n".join(errors.messages))
+                parts.append(f"\n...还有{error_count - errors.limit}个错误")
+        return "".join(parts)
+
+    @staticmethod
+    def _parse_batch_rows(text: str) -> list:
+        """
+        用 csv 模块一次解析批量添加的全部数据，字段以"|"分隔且不处理引号。
+        每个字段只去除一次首尾空白，空行解析为空列表，返回结果与原文本行一一对应。
+        """
+        reader = csv.reader(io.StringIO(text), delimiter='|', quoting=csv.QUOTE_NONE)
+        rows = []
+        for row in reader:
+            fields = [field.strip() for field in row]
+            rows.append(fields if fields != [""] else [])
+        return rows
+
+    @staticmethod
+    def _bulk_add_templates(rows: list, add_bulk, errors: _BatchErrors) -> int:
+        """
+        在一个事务中写入所有校验通过的模板，返回成功添加的数量。
+        写入失败时（如名称重复）整批回滚，不会留下只添加了一部分的数据。
+        """
+        if not rows:
+            return 0
+        try:
+            add_bulk([data for _, data in rows])
+        except Exception as e:
+            errors.add("写入失败，已回滚本批{}条数据 - {}", len(rows), e)
+            return 0
+        return len(rows)
+
+    @staticmethod
+    def _check_batch_size(text: str) -> Optional[str]:
+        """在解析前检查批量数据的行数与单行长度，超出上限时返回错误消息"""
+        if text.rstrip().count("\n") >= _MAX_BATCH_ROWS:
+            return f"❌ 一次最多添加 {_MAX_BATCH_ROWS} 行数据，请分批添加"
+        if len(text) > _MAX_BATCH_LINE_LENGTH and max(map(len, text.splitlines())) > _MAX_BATCH_LINE_LENGTH:
+            return f"❌ 单行数据不能超过 {_MAX_BATCH_LINE_LENGTH} 个字符，请检查数据格式"
+        return None
+
+    def _add_batch_rows(self, text: str, first_line: int, schema: _BatchSchema) -> str:
+        """
+        解析 text 中的全部数据并按数据格式逐行校验（不访问数据库），全部校验完成后在一个事务中一次写入，返回结果消息。
+        first_line 为 text 第一行在原文中的行号，用于错误信息。整个过程是同步的，由调用方放到线程中执行。
+        """
+        errors = _BatchErrors()
+        validated_rows = []  # (行号, 模板数据)，全部校验完成后统一写入
+        name_lines = {}  # 名称 -> 首次出现的行号，同一批数据中的重名行在写入前排除
+        columns = schema.columns
+        field_count = len(columns)
+        check = schema.check
+
+        for i, parts in enumerate(self._parse_batch_rows(text), first_line):
+            if not parts:
+                continue
+            if len(parts) != field_count:
+                errors.add("第{}行: 字段数量不正确，需要{}个字段", i, field_count)
+                continue
+            try:
+                data = {key: convert(value) for (key, convert), value in zip(columns, parts)}
+                if check is not None:
+                    check(data)
+            except _BatchRowError as e:
+                errors.add("第{}行: {}", i, e)
+            except ValueError as e:
+                errors.add("第{}行: 数据格式错误 - {}", i, e)
+            except Exception as e:
+                errors.add("第{}行: 添加失败 - {}", i, e)
+            else:
+                first_line_of_name = name_lines.setdefault(data["name"], i)
+                if first_line_of_name != i:
+                    errors.add("第{}行: 名称与第{}行重复", i, first_line_of_name)
+                else:
+                    validated_rows.append((i, data))
 
-    注意：
-    - 每行一个鱼类数据
-    - 字段之间用"|"分隔
-    - 稀有度必须是1-5的整数
-    - 重量、价值必须是正整数
-    - 图标URL可以填None"""
-            yield event.plain_result(help_text)
+        # 一次查询排除数据库中已存在的名称，避免整批写入因唯一约束失败而回滚
+        if validated_rows:
+            existing = self.item_template_service.get_existing_template_names(schema.item_type, list(name_lines))
+            if existing:
+                for i, data in validated_rows:
+                    if data["name"] in existing:
+                        errors.add("第{}行: {}「{}」已存在", i, schema.item_name, data["name"])
+                validated_rows = [(i, data) for i, data in validated_rows if data["name"] not in existing]
+
+        added_count = self._bulk_add_templates(
+            validated_rows,
+            getattr(self.item_template_service, schema.add_bulk),
+            errors,
+        )
+        return self._batch_add_result(schema.item_name, added_count, errors)
+
+    async def _run_batch_add(self, event: AstrMessageEvent, schema: _BatchSchema):
+        """批量添加命令：消息第2行起每行一条数据"""
+        _, _, text = event.message_str.partition('\n')
+        if not text:
+            yield event.plain_result(schema.help_text)
             return
-        
+
+        size_error = self._check_batch_size(text)
+        if size_error is not None:
+            yield event.plain_result(size_error)
+            return
+
         try:
-            added_count = 0
-            error_count = 0
-            errors = []
-            
-            for i, line in enumerate(message_lines[1:], 2):  # 从第2行开始
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                try:
-                    parts = line.split('|')
-                    if len(parts) != 7:
-                        errors.append(f"第{i}行: 字段数量不正确，需要7个字段")
-                        error_count += 1
-                        continue
-                    
-                    name, description, rarity, base_value, min_weight, max_weight, icon_url = parts
-                    
-                    # 数据验证
-                    if not name.strip():
-                        errors.append(f"第{i}行: 鱼类名称不能为空")
-                        error_count += 1
-                        continue
-                    
-                    rarity = int(rarity.strip())
-                    if not (1 <= rarity <= 5):
-                        errors.append(f"第{i}行: 稀有度必须是1-5之间的整数")
-                        error_count += 1
-                        continue
-                    
-                    base_value = int(base_value.strip())
-                    min_weight = int(min_weight.strip())
-                    max_weight = int(max_weight.strip())
-                    
-                    if base_value < 0:
-                        errors.append(f"第{i}行: 基础价值不能为负数")
-                        error_count += 1
-                        continue
-                        
-                    if min_weight >= max_weight:
-                        errors.append(f"第{i}行: 最小重量必须小于最大重量")
-                        error_count += 1
-                        continue
-                    
-                    icon_url = icon_url.strip() if icon_url.strip() != 'None' else None
-                    
-                    # 添加到数据库
-                    fish_data = {
-                        "name": name.strip(),
-                        "description": description.strip(),
-                        "rarity": rarity,
-                        "base_value": base_value,
-                        "min_weight": min_weight,
-                        "max_weight": max_weight,
-                        "icon_url": icon_url
-                    }
-                    
-                    self.item_template_service.add_fish_template(fish_data)
-                    added_count += 1
-                    
-                except ValueError as e:
-                    errors.append(f"第{i}行: 数据格式错误 - {str(e)}")
-                    error_count += 1
-                except Exception as e:
-                    errors.append(f"第{i}行: 添加失败 - {str(e)}")
-                    error_count += 1
-            
-            # 构建结果消息
-            result_msg = f"✅ 批量添加完成！\n📈 成功添加: {added_count} 个鱼类"
-            if error_count > 0:
-                result_msg += f"\n❌ 失败: {error_count} 个"
-                if len(errors) <= 5:  # 只显示前5个错误
-                    result_msg += "\n错误详情:\n" + "\n".join(errors)
-                else:
-                    result_msg += f"\n错误详情(显示前5个):\n" + "\n".join(errors[:5])
-                    result_msg += f"\n...还有{len(errors)-5}个错误"
-            
-            yield event.plain_result(result_msg)
-            
+            # 大批量数据的解析与写入放到线程中，避免阻塞事件循环
+            result = await asyncio.to_thread(self._add_batch_rows, text, 2, schema)  # 从第2行开始
+            yield event.plain_result(result)
         except Exception as e:
-            logger.error(f"批量添加鱼类出错: {e}", exc_info=True)
+            logger.error(f"批量添加{schema.item_name}出错: {e}", exc_info=True)
             yield event.plain_result(f"❌ 批量添加过程中出现错误: {str(e)}")
 
+    async def _run_batch_add_file(self, event: AstrMessageEvent, command: str, schema: _BatchSchema):
+        """
+        从文件批量添加：数据来自消息中的文件附件，或命令后跟的文件 URL。
+        文件每行一条数据，格式与对应的批量添加命令相同，不受单条聊天消息的长度限制。
+        """
+        attachment = next((comp for comp in getattr(event.message_obj, "message", ()) if isinstance(comp, File)), None)
+        args = event.message_str.split(maxsplit=1)
+        url = args[1].strip() if len(args) > 1 else ""
+        if attachment is None and not url.startswith(("http://", "https://")):
+            yield event.plain_result(
+                f"❌ 请附带数据文件，或使用：/{command} <文件URL>\n"
+                f"文件中每行一条{schema.item_name}数据，格式与 /批量添加{schema.item_name} 相同"
+            )
+            return
+
+        try:
+            if attachment is not None:
+                path = await attachment.get_file()
+                text = await asyncio.to_thread(_read_text_file, path)
+            else:
+                text = await fetch_text(url, _MAX_BATCH_FILE_BYTES)
+            text = text.lstrip("\ufeff")
+            size_error = self._check_batch_size(text)
+            if size_error is not None:
+                yield event.plain_result(size_error)
+                return
+            result = await asyncio.to_thread(self._add_batch_rows, text, 1, schema)
+            yield event.plain_result(result)
+        except Exception as e:
+            logger.error(f"从文件批量添加{schema.item_name}出错: {e}", exc_info=True)
+            yield event.plain_result(f"❌ 从文件批量添加过程中出现错误: {str(e)}")
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("批量添加鱼类")
+    async def batch_add_fish(self, event: AstrMessageEvent):
+        """批量添加鱼类"""
+        async for result in self._run_batch_add(event, _BATCH_FISH_SCHEMA):
+            yield result
+
     @filter.permission_type(PermissionType.ADMIN)
     @filter.command("批量添加鱼饵")
     async def batch_add_baits(self, event: AstrMessageEvent):
         """批量添加鱼饵"""
-        message_lines = event.message_str.split('\n')
-        if len(message_lines) < 2:
-            help_text = """📋 批量添加鱼饵格式说明：
-    /批量添加鱼饵
-    名称|描述|稀有度|效果描述|持续时间(分钟)|成本|所需鱼竿稀有度|成功率加成|稀有鱼几率加成|垃圾减少率|价值加成|数量加成|是否消耗品
-    普通蚯蚓|最基础的鱼饵，随处可见。|1|无特殊效果|0|5|0|0.0|0.0|0.0|1.0|1.0|True
-    红虫|营养丰富的鱼饵，很多鱼都爱吃。|2|提高中小型鱼上钩率|0|20|0|0.05|0.0|0.0|1.0|1.0|True
-
-    注意：
-    - 每行一个鱼饵数据
-    - 字段之间用"|"分隔  
-    - 稀有度必须是1-5的整数
-    - 加成值为小数(如0.05表示5%加成)
-    - 是否消耗品填True或False"""
-            yield event.plain_result(help_text)
-            return
-        
-        try:
-            added_count = 0
-            error_count = 0
-            errors = []
-            
-            for i, line in enumerate(message_lines[1:], 2):
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                try:
-                    parts = line.split('|')
-                    if len(parts) != 13:
-                        errors.append(f"第{i}行: 字段数量不正确，需要13个字段")
-                        error_count += 1
-                        continue
-                    
-                    (name, description, rarity, effect_description, duration_minutes, 
-                    cost, required_rod_rarity, success_rate_modifier, rare_chance_modifier,
-                    garbage_reduction_modifier, value_modifier, quantity_modifier, is_consumable) = parts
-                    
-                    # 数据验证和转换
-                    if not name.strip():
-                        errors.append(f"第{i}行: 鱼饵名称不能为空")
-                        error_count += 1
-                        continue
-                    
-                    rarity = int(rarity.strip())
-                    if not (1 <= rarity <= 5):
-                        errors.append(f"第{i}行: 稀有度必须是1-5之间的整数")
-                        error_count += 1
-                        continue
-                    
-                    bait_data = {
-                        "name": name.strip(),
-                        "description": description.strip(),
-                        "rarity": rarity,
-                        "effect_description": effect_description.strip(),
-                        "duration_minutes": int(duration_minutes.strip()),
-                        "cost": int(cost.strip()),
-                        "required_rod_rarity": int(required_rod_rarity.strip()),
-                        "success_rate_modifier": float(success_rate_modifier.strip()),
-                        "rare_chance_modifier": float(rare_chance_modifier.strip()),
-                        "garbage_reduction_modifier": float(garbage_reduction_modifier.strip()),
-                        "value_modifier": float(value_modifier.strip()),
-                        "quantity_modifier": float(quantity_modifier.strip()),
-                        "is_consumable": is_consumable.strip().lower() == 'true'
-                    }
-                    
-                    self.item_template_service.add_bait_template(bait_data)
-                    added_count += 1
-                    
-                except ValueError as e:
-                    errors.append(f"第{i}行: 数据格式错误 - {str(e)}")
-                    error_count += 1
-                except Exception as e:
-                    errors.append(f"第{i}行: 添加失败 - {str(e)}")
-                    error_count += 1
-            
-            # 构建结果消息
-            result_msg = f"✅ 批量添加完成！\n📈 成功添加: {added_count} 个鱼饵"
-            if error_count > 0:
-                result_msg += f"\n❌ 失败: {error_count} 个"
-                if len(errors) <= 5:
-                    result_msg += "\n错误详情:\n" + "\n".join(errors)
-                else:
-                    result_msg += f"\n错误详情(显示前5个):\n" + "\n".join(errors[:5])
-                    result_msg += f"\n...还有{len(errors)-5}个错误"
-            
-            yield event.plain_result(result_msg)
-            
-        except Exception as e:
-            logger.error(f"批量添加鱼饵出错: {e}", exc_info=True)
-            yield event.plain_result(f"❌ 批量添加过程中出现错误: {str(e)}")
+        async for result in self._run_batch_add(event, _BATCH_BAIT_SCHEMA):
+            yield result
 
     @filter.permission_type(PermissionType.ADMIN)
     @filter.command("批量添加鱼竿")
     async def batch_add_rods(self, event: AstrMessageEvent):
         """批量添加鱼竿"""
-        message_lines = event.message_str.split('\n')
-        if len(message_lines) < 2:
-            help_text = """📋 批量添加鱼竿格式说明：
-    /批量添加鱼竿
-    名称|描述|稀有度|来源|购买价格|质量加成|数量加成|稀有鱼几率加成|耐久度|图标URL
-    新手木竿|刚入门时的可靠伙伴|1|shop|50|1.0|1.0|0.0|None|None
-    竹制鱼竿|轻巧耐用|2|shop|500|1.0|1.0|0.01|None|None
+        async for result in self._run_batch_add(event, _BATCH_ROD_SCHEMA):
+            yield result
 
-    注意：
-    - 每行一个鱼竿数据
-    - 字段之间用"|"分隔
-    - 稀有度必须是1-5的整数  
-    - 来源必须是shop、gacha或event
-    - 加成值为小数(如1.05表示5%加成)
-    - 购买价格、耐久度、图标URL可以填None"""
-            yield event.plain_result(help_text)
-            return
-        
-        try:
-            added_count = 0
-            error_count = 0
-            errors = []
-            
-            for i, line in enumerate(message_lines[1:], 2):
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                try:
-                    parts = line.split('|')
-                    if len(parts) != 10:
-                        errors.append(f"第{i}行: 字段数量不正确，需要10个字段")
-                        error_count += 1
-                        continue
-                    
-                    (name, description, rarity, source, purchase_cost, quality_mod, 
-                    quantity_mod, rare_mod, durability, icon_url) = parts
-                    
-                    # 数据验证和转换
-                    if not name.strip():
-                        errors.append(f"第{i}行: 鱼竿名称不能为空")
-                        error_count += 1
-                        continue
-                    
-                    rarity = int(rarity.strip())
-                    if not (1 <= rarity <= 5):
-                        errors.append(f"第{i}行: 稀有度必须是1-5之间的整数")
-                        error_count += 1
-                        continue
-                    
-                    source = source.strip()
-                    if source not in ['shop', 'gacha', 'event']:
-                        errors.append(f"第{i}行: 来源必须是shop、gacha或event")
-                        error_count += 1
-                        continue
-                    
-                    rod_data = {
-                        "name": name.strip(),
-                        "description": description.strip(),
-                        "rarity": rarity,
-                        "source": source,
-                        "purchase_cost": int(purchase_cost.strip()) if purchase_cost.strip() != 'None' else None,
-                        "bonus_fish_quality_modifier": float(quality_mod.strip()),
-                        "bonus_fish_quantity_modifier": float(quantity_mod.strip()),
-                        "bonus_rare_fish_chance": float(rare_mod.strip()),
-                        "durability": int(durability.strip()) if durability.strip() != 'None' else None,
-                        "icon_url": icon_url.strip() if icon_url.strip() != 'None' else None
-                    }
-                    
-                    self.item_template_service.add_rod_template(rod_data)
-                    added_count += 1
-                    
-                except ValueError as e:
-                    errors.append(f"第{i}行: 数据格式错误 - {str(e)}")
-                    error_count += 1
-                except Exception as e:
-                    errors.append(f"第{i}行: 添加失败 - {str(e)}")
-                    error_count += 1
-            
-            # 构建结果消息
-            result_msg = f"✅ 批量添加完成！\n📈 成功添加: {added_count} 个鱼竿"
-            if error_count > 0:
-                result_msg += f"\n❌ 失败: {error_count} 个"
-                if len(errors) <= 5:
-                    result_msg += "\n错误详情:\n" + "\n".join(errors)
-                else:
-                    result_msg += f"\n错误详情(显示前5个):\n" + "\n".join(errors[:5])
-                    result_msg += f"\n...还有{len(errors)-5}个错误"
-            
-            yield event.plain_result(result_msg)
-            
-        except Exception as e:
-            logger.error(f"批量添加鱼竿出错: {e}", exc_info=True)
-            yield event.plain_result(f"❌ 批量添加过程中出现错误: {str(e)}")
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("批量添加鱼竿文件")
+    async def batch_add_rods_file(self, event: AstrMessageEvent):
+        """从文件附件或 URL 批量添加鱼竿"""
+        async for result in self._run_batch_add_file(event, "批量添加鱼竿文件", _BATCH_ROD_SCHEMA):
+            yield result
 
     @filter.permission_type(PermissionType.ADMIN)
     @filter.command("批量添加饰品")
     async def batch_add_accessories(self, event: AstrMessageEvent):
         """批量添加饰品"""
-        message_lines = event.message_str.split('\n')
-        if len(message_lines) < 2:
-            help_text = """📋 批量添加饰品格式说明：
-    /批量添加饰品
-    名称|描述|稀有度|槽位类型|质量加成|数量加成|稀有鱼几率加成|金币加成|其他加成描述|图标URL
-    幸运四叶草|带来好运的小饰品|2|general|1.05|1.0|0.01|1.02|None|None
-    渔夫的戒指|刻有古老符文的戒指|3|general|1.0|1.0|0.0|1.10|None|None
-
-    注意：
-    - 每行一个饰品数据
-    - 字段之间用"|"分隔
-    - 稀有度必须是1-5的整数
-    - 槽位类型一般填general
-    - 加成值为小数(如1.05表示5%加成)
-    - 其他加成描述、图标URL可以填None"""
-            yield event.plain_result(help_text)
-            return
-        
-        try:
-            added_count = 0
-            error_count = 0
-            errors = []
-            
-            for i, line in enumerate(message_lines[1:], 2):
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                try:
-                    parts = line.split('|')
-                    if len(parts) != 10:
-                        errors.append(f"第{i}行: 字段数量不正确，需要10个字段")
-                        error_count += 1
-                        continue
-                    
-                    (name, description, rarity, slot_type, quality_mod, quantity_mod, 
-                    rare_mod, coin_mod, other_desc, icon_url) = parts
-                    
-                    # 数据验证和转换
-                    if not name.strip():
-                        errors.append(f"第{i}行: 饰品名称不能为空")
-                        error_count += 1
-                        continue
-                    
-                    rarity = int(rarity.strip())
-                    if not (1 <= rarity <= 5):
-                        errors.append(f"第{i}行: 稀有度必须是1-5之间的整数")
-                        error_count += 1
-                        continue
-                    
-                    accessory_data = {
-                        "name": name.strip(),
-                        "description": description.strip(),
-                        "rarity": rarity,
-                        "slot_type": slot_type.strip(),
-                        "bonus_fish_quality_modifier": float(quality_mod.strip()),
-                        "bonus_fish_quantity_modifier": float(quantity_mod.strip()),
-                        "bonus_rare_fish_chance": float(rare_mod.strip()),
-                        "bonus_coin_modifier": float(coin_mod.strip()),
-                        "other_bonus_description": other_desc.strip() if other_desc.strip() != 'None' else None,
-                        "icon_url": icon_url.strip() if icon_url.strip() != 'None' else None
-                    }
-                    
-                    self.item_template_service.add_accessory_template(accessory_data)
-                    added_count += 1
-                    
-                except ValueError as e:
-                    errors.append(f"第{i}行: 数据格式错误 - {str(e)}")
-                    error_count += 1
-                except Exception as e:
-                    errors.append(f"第{i}行: 添加失败 - {str(e)}")
-                    error_count += 1
-            
-            # 构建结果消息
-            result_msg = f"✅ 批量添加完成！\n📈 成功添加: {added_count} 个饰品"
-            if error_count > 0:
-                result_msg += f"\n❌ 失败: {error_count} 个"
-                if len(errors) <= 5:
-                    result_msg += "\n错误详情:\n" + "\n".join(errors)
-                else:
-                    result_msg += f"\n错误详情(显示前5个):\n" + "\n".join(errors[:5])
-                    result_msg += f"\n...还有{len(errors)-5}个错误"
-            
-            yield event.plain_result(result_msg)
-            
-        except Exception as e:
-            logger.error(f"批量添加饰品出错: {e}", exc_info=True)
-            yield event.plain_result(f"❌ 批量添加过程中出现错误: {str(e)}")
+        async for result in self._run_batch_add(event, _BATCH_ACCESSORY_SCHEMA):
+            yield result
 
     @filter.permission_type(PermissionType.ADMIN)
     @filter.command("批量添加帮助")
     async def batch_add_help(self, event: AstrMessageEvent):
         """显示批量添加的帮助信息"""
-        help_text = """📋 批量添加功能帮助
-
-    🐟 **批量添加鱼类**
-    /批量添加鱼类
-    名称|描述|稀有度|基础价值|最小重量|最大重量|图标URL
-
-    🎣 **批量添加鱼竿** 
-    /批量添加鱼竿
-    名称|描述|稀有度|来源|购买价格|质量加成|数量加成|稀有鱼几率加成|耐久度|图标URL
-
-    🐛 **批量添加鱼饵**
-    /批量添加鱼饵
-    名称|描述|稀有度|效果描述|持续时间|成本|所需鱼竿稀有度|成功率加成|稀有鱼几率加成|垃圾减少率|价值加成|数量加成|是否消耗品
-
-    💍 **批量添加饰品**
-    /批量添加饰品  
-    名称|描述|稀有度|槽位类型|质量加成|数量加成|稀有鱼几率加成|金币加成|其他加成描述|图标URL
-
-    **注意事项：**
-    - 每行一个物品数据
-    - 字段之间用"|"分隔
-    - 稀有度必须是1-5的整数
-    - None值填写None
-    - 小数值如1.05表示5%加成
-    - 错误数据会被跳过并显示错误信息"""
-        
-        yield event.plain_result(help_text)
+        yield event.plain_result(_BATCH_ADD_HELP)
         
         
     @filter.command("出售所有五星鱼竿", alias={"出售全部五星鱼竿", "出售五星鱼竿"})
     async def sell_all_five_star_rods(self, event: AstrMessageEvent):
         """出售用户所有五星鱼竿"""
         user_id = event.get_sender_id()
-        result = self.inventory_service.sell_all_five_star_rods(user_id)
+        async with self._lock_users(user_id):
+            result = self.inventory_service.sell_all_five_star_rods(user_id)
+        self._invalidate_user_cache(user_id)
         if result:
             yield event.plain_result(result["message"])
         else:
@@ -2546,7 +2798,9 @@ class FishingPlugin(Star):
     async def sell_all_five_star_accessories(self, event: AstrMessageEvent):
         """出售用户所有五星饰品"""
         user_id = event.get_sender_id()
-        result = self.inventory_service.sell_all_five_star_accessories(user_id)
+        async with self._lock_users(user_id):
+            result = self.inventory_service.sell_all_five_star_accessories(user_id)
+        self._invalidate_user_cache(user_id)
         if result:
             yield event.plain_result(result["message"])
         else:
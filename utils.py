@@ -1,5 +1,7 @@
 import re
 import socket
+from functools import lru_cache
+from typing import Union, Optional
 
 import aiohttp
 
@@ -30,6 +32,24 @@ async def get_public_ip():
 
     return None
 
+async def fetch_text(url: str, max_bytes: int, timeout: float = 30) -> str:
+    """
+    异步下载文本内容，响应状态码不是 2xx 或内容超过 max_bytes 字节时抛出异常。
+    先检查 Content-Length，再分块读取响应体，超出上限立即停止，不会把过大的响应整个读入内存。
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            response.raise_for_status()
+            too_large = f"文件过大，不能超过 {max_bytes} 字节"
+            if response.content_length is not None and response.content_length > max_bytes:
+                raise ValueError(too_large)
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(65536):
+                data += chunk
+                if len(data) > max_bytes:
+                    raise ValueError(too_large)
+            return data.decode(response.charset or "utf-8")
+
 async def _is_port_available(port):
     """检查端口是否可用"""
     try:
@@ -42,7 +62,36 @@ async def _is_port_available(port):
     except:
         return False
 
+# 取出命令后的第一个参数
+def get_first_arg(message_str: str) -> str:
+    """等价于 message_str.split(" ")[1]，参数不存在时返回空字符串，无需构造整个参数列表"""
+    _, _, rest = message_str.partition(" ")
+    arg, _, _ = rest.partition(" ")
+    return arg
+
+def parse_non_negative_int(arg: str) -> Optional[int]:
+    """将命令参数解析为非负整数，一次 int() 完成校验与转换；格式错误或为负数时返回 None"""
+    try:
+        value = int(arg)
+    except ValueError:
+        return None
+    return value if value >= 0 else None
+
+# 常见稀有度的星级字符串查找表，避免每次重复拼接
+STARS_WHITE = tuple("★" * i for i in range(11))
+STARS_YELLOW = tuple("⭐" * i for i in range(11))
+
+def white_stars(rarity: int) -> str:
+    """返回 rarity 个 ★，超出查找表范围时再现场拼接"""
+    return STARS_WHITE[rarity] if 0 <= rarity < len(STARS_WHITE) else "★" * rarity
+
+def yellow_stars(rarity: int) -> str:
+    """返回 rarity 个 ⭐，超出查找表范围时再现场拼接"""
+    return STARS_YELLOW[rarity] if 0 <= rarity < len(STARS_YELLOW) else "⭐" * rarity
+
 # 将1.2等数字转换成百分数
+# 加成数值种类很少（如 1.1、1.2），纯函数的结果可直接缓存
+@lru_cache(maxsize=256)
 def to_percentage(value: float) -> str:
     """将小数转换为百分比字符串"""
     if value is None:
@@ -55,7 +104,7 @@ def to_percentage(value: float) -> str:
 def format_accessory_or_rod(accessory_or_rod: dict) -> str:
     """格式化配件信息"""
     message =  f" - ID: {accessory_or_rod['instance_id']}\n"
-    message += f" - {accessory_or_rod['name']} (稀有度: {'⭐' * accessory_or_rod['rarity']})\n"
+    message += f" - {accessory_or_rod['name']} (稀有度: {yellow_stars(accessory_or_rod['rarity'])})\n"
     if accessory_or_rod.get("is_equipped", False):
         message += f"   - {'✅ 已装备'}\n"
     if accessory_or_rod.get("bonus_fish_quality_modifier", 1.0) != 1.0 and accessory_or_rod.get("bonus_fish_quality_modifier", 1) != 1 and accessory_or_rod.get("bonus_fish_quality_modifier", 1) > 0:
@@ -69,8 +118,7 @@ def format_accessory_or_rod(accessory_or_rod: dict) -> str:
     message += "\n"
     return message
 
-from datetime import datetime, timezone, timedelta  # noqa: E402
-from typing import Union, Optional  # noqa: E402
+from datetime import datetime, timezone, timedelta, tzinfo  # noqa: E402
 
 def safe_datetime_handler(
     time_input: Union[str, datetime, None],
@@ -91,12 +139,35 @@ def safe_datetime_handler(
         - 如果输入是datetime: 返回格式化后的字符串
         - 出错或None: 返回None
     """
+    # 不同时区下表示同一时刻的 aware datetime 相等且哈希相同，缓存键需带上 tzinfo，否则会返回另一时区的格式化结果
+    input_tzinfo = time_input.tzinfo if isinstance(time_input, datetime) else None
+    return _safe_datetime_handler(time_input, input_tzinfo, output_format, default_timezone)
+
+
+# 记录列表中的时间大量重复，且字符串与 datetime 均可哈希，格式化结果直接缓存
+@lru_cache(maxsize=4096)
+def _safe_datetime_handler(
+    time_input: Union[str, datetime, None],
+    input_tzinfo: Optional[tzinfo],
+    output_format: str,
+    default_timezone: Optional[timezone]
+) -> Union[str, datetime, None]:
+    """safe_datetime_handler 的实际实现，input_tzinfo 仅作为缓存键的一部分"""
     # 处理空输入
     # logger.info(f"Processing time input: {time_input}")
     if time_input is None:
         logger.warning("Received None as time input, returning None.")
         return None
 
+    # 已是默认输出格式的字符串（如 "2024-01-01 12:00:00"）解析再格式化后不变，确认是合法时间后直接返回
+    if (isinstance(time_input, str) and output_format == "%Y-%m-%d %H:%M:%S" and len(time_input) == 19
+            and time_input[4] == "-" and time_input[10] == " " and time_input[13] == ":" and time_input[16] == ":"):
+        try:
+            datetime.fromisoformat(time_input)
+            return time_input
+        except ValueError:
+            pass  # 如 "2024-13-45 99:99:99"，交给下面的完整解析，最终返回 None
+
     # 获取默认时区
     if default_timezone is None:
         default_timezone = timezone(timedelta(hours=8))  # 默认东八区